@@ -0,0 +1,334 @@
+#!/usr/bin/env python
+"""
+End-to-end throughput benchmark for xEvolve
+
+Drives ``xEvolve.run`` with an in-process fake LLM that answers every prompt
+with a valid SEARCH/REPLACE diff, and with a synthetic evaluator of
+configurable latency. Before the timed iterations, the program database is
+seeded with a population of the requested size, so the numbers show how the
+controller and ``ProgramDatabase`` behave as the population grows.
+
+For every population size it reports:
+
+- the time taken to seed the population
+- iterations per second
+- peak RSS
+- per-phase timings from the iteration telemetry
+
+Each population size runs in a fresh subprocess, so peak RSS is measured
+per size.
+
+Usage::
+
+    python benchmarks/throughput.py --populations 1000 10000 100000 --iterations 200
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from typing import Any, Dict, List
+
+# Allow running from a checkout without installing the package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+from xEvolve.config import Config
+from xEvolve.controller import xEvolve
+from xEvolve.database import Program
+from xEvolve.llm.base import LLMInterface
+
+INITIAL_PROGRAM = """# EVOLVE-BLOCK-START
+VARIANT = 0
+
+
+def value():
+    return VARIANT % 97
+# EVOLVE-BLOCK-END
+"""
+
+EVALUATOR_TEMPLATE = """import hashlib
+import time
+
+LATENCY = {latency}
+
+
+def evaluate(program_path):
+    if LATENCY:
+        time.sleep(LATENCY)
+    with open(program_path) as f:
+        digest = hashlib.sha256(f.read().encode("utf-8")).digest()
+    return {{"score": digest[0] / 255.0, "speed": digest[1] / 255.0}}
+"""
+
+CURRENT_PROGRAM_PATTERN = re.compile(r"VARIANT = (\d+)")
+
+
+class FakeLLM(LLMInterface):
+    """Answers every prompt with a diff that changes the current program's VARIANT"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.total_tokens = 0
+
+    async def generate(self, prompt: str, **kwargs) -> str:
+        return await self.generate_with_context("", [{"role": "user", "content": prompt}])
+
+    async def generate_with_context(
+        self, system_message: str, messages: List[Dict[str, str]], **kwargs
+    ) -> str:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        # The current program is the last code block of the prompt that holds a VARIANT
+        prompt = messages[-1]["content"].split("# Current Program")[-1]
+        match = CURRENT_PROGRAM_PATTERN.search(prompt)
+        current = match.group(1) if match else "0"
+
+        return (
+            "<<<<<<< SEARCH\n"
+            f"VARIANT = {current}\n"
+            "=======\n"
+            f"VARIANT = {random.randrange(10**9)}\n"
+            ">>>>>>> REPLACE\n"
+        )
+
+
+def seed_population(controller: xEvolve, size: int) -> float:
+    """
+    Fill the database with synthetic programs
+
+    Args:
+        controller: Controller whose database is filled
+        size: Number of programs to add
+
+    Returns:
+        Seconds taken
+    """
+    start = time.perf_counter()
+    batch: List[Program] = []
+    for i in range(size):
+        variant = random.randrange(10**9)
+        batch.append(
+            Program(
+                id=str(uuid.uuid4()),
+                code=INITIAL_PROGRAM.replace("VARIANT = 0", f"VARIANT = {variant}"),
+                metrics={"score": random.random(), "speed": random.random()},
+                iteration_found=0,
+            )
+        )
+        if len(batch) == 1000:
+            controller.database.add_many(batch)
+            batch = []
+    if batch:
+        controller.database.add_many(batch)
+    return time.perf_counter() - start
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    if sys.platform == "darwin":
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+def run_single(args: argparse.Namespace, population: int) -> Dict[str, Any]:
+    """
+    Benchmark one population size in this process
+
+    Args:
+        args: Parsed command-line arguments
+        population: Number of programs to seed the database with
+
+    Returns:
+        Benchmark results
+    """
+    random.seed(args.seed)
+    work_dir = tempfile.mkdtemp(prefix="xevolve-bench-")
+
+    try:
+        program_path = os.path.join(work_dir, "initial_program.py")
+        with open(program_path, "w") as f:
+            f.write(INITIAL_PROGRAM)
+
+        evaluator_path = os.path.join(work_dir, "evaluator.py")
+        with open(evaluator_path, "w") as f:
+            f.write(EVALUATOR_TEMPLATE.format(latency=args.eval_latency))
+
+        config = Config()
+        config.log_level = "WARNING"
+        config.random_seed = args.seed
+        config.checkpoint_interval = args.checkpoint_interval or 10**9
+        config.parallel_iterations = args.parallel_iterations
+        config.evolution_mode = args.mode
+        config.evaluator.cascade_evaluation = False
+        config.evaluator.parallel_evaluations = args.parallel_evaluations
+        config.llm.parallel_requests = args.parallel_iterations
+        config.database.population_size = max(config.database.population_size, population * 2)
+
+        controller = xEvolve(
+            initial_program_path=program_path,
+            evaluation_file=evaluator_path,
+            config=config,
+            output_dir=work_dir,
+        )
+        logging.getLogger().setLevel(logging.WARNING)
+
+        fake_llm = FakeLLM(latency=args.llm_latency)
+        controller.llm_ensemble.primary_model = fake_llm
+        controller.llm_ensemble.secondary_model = fake_llm
+
+        seed_seconds = seed_population(controller, population)
+
+        start = time.perf_counter()
+        asyncio.run(controller.run(iterations=args.iterations))
+        run_seconds = time.perf_counter() - start
+
+        phases = {
+            phase: {key: round(value, 6) for key, value in stats.items()}
+            for phase, stats in controller.telemetry.percentiles().items()
+        }
+
+        return {
+            "population": population,
+            "final_population": len(controller.database.programs),
+            "iterations": args.iterations,
+            "seed_seconds": round(seed_seconds, 3),
+            "run_seconds": round(run_seconds, 3),
+            "iterations_per_second": round(args.iterations / run_seconds, 2),
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+            "phases": phases,
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def format_results(results: List[Dict[str, Any]]) -> str:
+    """Format benchmark results as a text table"""
+    lines = [
+        f"{'population':>10} {'seed s':>8} {'iter/s':>8} {'peak MB':>8}  slowest phases (mean ms)",
+    ]
+    for result in results:
+        phases = sorted(
+            ((phase, s["mean"]) for phase, s in result["phases"].items() if phase != "total"),
+            key=lambda item: item[1],
+            reverse=True,
+        )[:4]
+        phase_str = ", ".join(f"{phase}={mean * 1000:.1f}" for phase, mean in phases)
+        lines.append(
+            f"{result['population']:>10} {result['seed_seconds']:>8.2f} "
+            f"{result['iterations_per_second']:>8.2f} {result['peak_rss_mb']:>8.1f}  {phase_str}"
+        )
+    return "\n".join(lines)
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command-line arguments"""
+    parser = argparse.ArgumentParser(description="xEvolve end-to-end throughput benchmark")
+
+    parser.add_argument(
+        "--populations",
+        type=int,
+        nargs="+",
+        default=[1000, 10000, 100000],
+        help="Population sizes to benchmark",
+    )
+    parser.add_argument(
+        "--iterations", type=int, default=200, help="Timed iterations per population size"
+    )
+    parser.add_argument(
+        "--llm-latency", type=float, default=0.0, help="Seconds the fake LLM takes per request"
+    )
+    parser.add_argument(
+        "--eval-latency", type=float, default=0.0, help="Seconds each evaluation takes"
+    )
+    parser.add_argument(
+        "--parallel-iterations", type=int, default=1, help="Iterations kept in flight"
+    )
+    parser.add_argument(
+        "--parallel-evaluations", type=int, default=4, help="Concurrent evaluations"
+    )
+    parser.add_argument(
+        "--mode",
+        choices=["steady_state", "generational"],
+        default="steady_state",
+        help="Evolution mode",
+    )
+    parser.add_argument(
+        "--checkpoint-interval",
+        type=int,
+        default=None,
+        help="Checkpoint interval (default: no checkpoints)",
+    )
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    parser.add_argument("--output", "-o", help="Write results as JSON to this file")
+    parser.add_argument(
+        "--single", action="store_true", help="Run the first population size in this process"
+    )
+
+    return parser.parse_args()
+
+
+def main() -> int:
+    """
+    Main entry point
+
+    Returns:
+        Exit code
+    """
+    args = parse_args()
+
+    if args.single:
+        print(json.dumps(run_single(args, args.populations[0])))
+        return 0
+
+    # Run every population size in a fresh process so peak RSS is per size
+    results = []
+    for population in args.populations:
+        command = [sys.executable, os.path.abspath(__file__), "--single"]
+        command += ["--populations", str(population)]
+        for name in (
+            "iterations",
+            "llm_latency",
+            "eval_latency",
+            "parallel_iterations",
+            "parallel_evaluations",
+            "mode",
+            "checkpoint_interval",
+            "seed",
+        ):
+            value = getattr(args, name)
+            if value is not None:
+                command += [f"--{name.replace('_', '-')}", str(value)]
+
+        print(f"Benchmarking population {population}...", file=sys.stderr)
+        completed = subprocess.run(command, capture_output=True, text=True)
+        if completed.returncode != 0:
+            print(completed.stderr, file=sys.stderr)
+            return completed.returncode
+
+        results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+
+    print(format_results(results))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -17,7 +17,13 @@ declare -A split_problem_dir_prefixes=(
 
 base_problems_dir="./problems"
 
-echo "Starting all experiments..."
+# Limits for the shared batch process (all problems share one LLM client and evaluation pool)
+max_concurrent_problems=${MAX_CONCURRENT_PROBLEMS:-32}
+per_problem_concurrency=${PER_PROBLEM_CONCURRENCY:-1}
+
+echo "Collecting problems..."
+
+problem_dirs=()
 
 for split_name in "${!split_counts[@]}"; do
     count=${split_counts[$split_name]}
@@ -66,17 +72,20 @@ for split_name in "${!split_counts[@]}"; do
         fi
         # --- End Sanity checks ---
 
-        echo "  Launching $split_name - Problem $i ($initial_program_path)"
-        # Run the experiment in the background
-        cmd="python ../../openevolve-run.py "$initial_program_path" "$evaluator_path" --config "$config_path" --iterations 200"
-        eval $cmd &
+        echo "  Adding $split_name - Problem $i ($initial_program_path)"
+        problem_dirs+=("$problem_dir")
     done
-    wait    # let's do split by split
 done
 
 echo ""
-echo "All experiment processes have been launched in the background."
-echo "Waiting for all background processes to complete..."
-wait
+echo "Running ${#problem_dirs[@]} problems in one batch process"
+echo "($max_concurrent_problems problems at a time, $per_problem_concurrency iterations in flight each)..."
+
+# One process shares the LLM client, request limit and evaluation pool across all problems
+python ../../xevolve-batch.py "${problem_dirs[@]}" \
+    --iterations 200 \
+    --max-concurrent-problems "$max_concurrent_problems" \
+    --per-problem-concurrency "$per_problem_concurrency"
+
 echo ""
-echo "All experiments have completed."
\ No newline at end of file
+echo "All experiments have completed."
@@ -0,0 +1,50 @@
+"""
+Shared fixtures for tests that run the evolution loop
+"""
+
+import os
+from typing import Tuple
+
+# Initial program every fixture problem starts from
+INITIAL_PROGRAM = "def value():\n    return 1\n"
+
+# Evaluator scoring every program the same
+EVALUATOR = "def evaluate(program_path):\n    return {'score': 0.5}\n"
+
+# LLM response turning the initial program into a different child
+DIFF_RESPONSE = """
+<<<<<<< SEARCH
+    return 1
+=======
+    return 2
+>>>>>>> REPLACE
+"""
+
+
+def write_problem(
+    directory: str,
+    evaluator: str = EVALUATOR,
+    program_name: str = "program.py",
+    evaluator_name: str = "evaluator.py",
+) -> Tuple[str, str]:
+    """
+    Write the initial program and an evaluator into a directory
+
+    Args:
+        directory: Directory to write the files to
+        evaluator: Source of the evaluator
+        program_name: File name of the initial program
+        evaluator_name: File name of the evaluator
+
+    Returns:
+        Paths of the initial program and the evaluator
+    """
+    program_path = os.path.join(directory, program_name)
+    with open(program_path, "w") as f:
+        f.write(INITIAL_PROGRAM)
+
+    evaluator_path = os.path.join(directory, evaluator_name)
+    with open(evaluator_path, "w") as f:
+        f.write(evaluator)
+
+    return program_path, evaluator_path
@@ -0,0 +1,197 @@
+"""
+Tests for async utilities
+"""
+
+import asyncio
+import contextvars
+import unittest
+
+from xEvolve.utils.async_utils import (
+    AdaptiveConcurrencyLimiter,
+    BackgroundWriter,
+    PriorityTaskPool,
+    TaskDropped,
+)
+
+
+class TestAdaptiveConcurrencyLimiter(unittest.TestCase):
+    """Tests for the AIMD concurrency limiter"""
+
+    def test_window_limits_concurrency(self):
+        """Test that no more requests than the window run at once"""
+        limiter = AdaptiveConcurrencyLimiter(initial=2, maximum=2)
+        active = 0
+        peak = 0
+
+        async def request():
+            nonlocal active, peak
+            async with limiter.slot():
+                active += 1
+                peak = max(peak, active)
+                await asyncio.sleep(0.01)
+                active -= 1
+
+        async def run():
+            await asyncio.gather(*(request() for _ in range(10)))
+
+        asyncio.run(run())
+        self.assertEqual(peak, 2)
+        self.assertEqual(limiter.in_flight, 0)
+
+    def test_additive_increase(self):
+        """Test that the window grows by about one slot per window of stable requests"""
+        limiter = AdaptiveConcurrencyLimiter(initial=2, maximum=4)
+
+        async def run(count, latency):
+            for _ in range(count):
+                async with limiter.slot() as slot:
+                    slot.succeeded(latency)
+
+        asyncio.run(run(2, 1.0))
+        self.assertAlmostEqual(limiter.window, 2.0 + 1 / 2.0 + 1 / 2.5)
+
+        # Latency far above the running average holds the window
+        window = limiter.window
+        asyncio.run(run(1, 10.0))
+        self.assertEqual(limiter.window, window)
+
+        asyncio.run(run(100, 1.0))
+        self.assertEqual(limiter.window, 4.0)
+
+    def test_multiplicative_decrease(self):
+        """Test that overload halves the window once per burst of failures"""
+        limiter = AdaptiveConcurrencyLimiter(initial=8, maximum=8)
+
+        async def run():
+            async with limiter.slot() as slot:
+                slot.succeeded(10.0)
+            for _ in range(3):
+                async with limiter.slot() as slot:
+                    slot.overload()
+
+        asyncio.run(run())
+        self.assertEqual(limiter.window, 4.0)
+        self.assertEqual(limiter.limit, 4)
+
+    def test_minimum_window(self):
+        """Test that the window never drops below the minimum"""
+        limiter = AdaptiveConcurrencyLimiter(initial=1, minimum=1)
+
+        async def run():
+            async with limiter.slot() as slot:
+                slot.overload()
+
+        asyncio.run(run())
+        self.assertEqual(limiter.limit, 1)
+
+
+class TestPriorityTaskPool(unittest.TestCase):
+    """Tests for the priority task pool"""
+
+    def test_priority_order(self):
+        """Test that waiting tasks start by priority, then in submission order"""
+        pool = PriorityTaskPool(max_concurrency=1)
+        started = []
+
+        async def job(name):
+            started.append(name)
+            await asyncio.sleep(0.01)
+
+        async def run():
+            tasks = [
+                asyncio.create_task(pool.run_with_priority(priority, job, name))
+                for name, priority in [("first", 0), ("low", -1), ("a", 5), ("b", 5), ("mid", 1)]
+            ]
+            await asyncio.gather(*tasks)
+
+        asyncio.run(run())
+        # The first job takes the free slot before the others are queued
+        self.assertEqual(started, ["first", "a", "b", "mid", "low"])
+        self.assertEqual(pool.active, 0)
+
+    def test_drop_pending(self):
+        """Test that dropping keeps the highest-priority waiting tasks"""
+        pool = PriorityTaskPool(max_concurrency=1)
+
+        async def job(name):
+            await asyncio.sleep(0.01)
+            return name
+
+        async def run():
+            tasks = [
+                asyncio.create_task(pool.run_with_priority(priority, job, name))
+                for name, priority in [("running", 0), ("low", 1), ("high", 3), ("mid", 2)]
+            ]
+            await asyncio.sleep(0)
+            self.assertEqual(pool.pending, 3)
+            self.assertEqual(pool.drop_pending(keep=1), 2)
+            return await asyncio.gather(*tasks, return_exceptions=True)
+
+        results = asyncio.run(run())
+        self.assertEqual(results[0], "running")
+        self.assertIsInstance(results[1], TaskDropped)
+        self.assertEqual(results[2], "high")
+        self.assertIsInstance(results[3], TaskDropped)
+        self.assertEqual(pool.active, 0)
+
+    def test_cancelled_waiter(self):
+        """Test that a cancelled waiter does not leak its slot"""
+        pool = PriorityTaskPool(max_concurrency=1)
+
+        async def job():
+            await asyncio.sleep(0.01)
+            return True
+
+        async def run():
+            first = asyncio.create_task(pool.run(job))
+            second = asyncio.create_task(pool.run(job))
+            await asyncio.sleep(0)
+            second.cancel()
+            self.assertTrue(await first)
+            self.assertTrue(await pool.run(job))
+
+        asyncio.run(run())
+        self.assertEqual(pool.active, 0)
+
+
+class TestBackgroundWriter(unittest.TestCase):
+    """Tests for the background writer"""
+
+    def test_errors_are_raised(self):
+        """Test that a failed job is raised by flush and close, and later jobs still run"""
+        writer = BackgroundWriter()
+        written = []
+
+        def fail():
+            raise OSError("disk full")
+
+        writer.submit(fail)
+        writer.submit(written.append, 1)
+        with self.assertRaises(OSError):
+            writer.flush()
+        self.assertEqual(written, [1])
+
+        # The error is raised once
+        writer.flush()
+
+        writer.submit(fail)
+        with self.assertRaises(OSError):
+            writer.close()
+
+    def test_context_is_propagated(self):
+        """Test that jobs see the context variables of the code that submitted them"""
+        variable = contextvars.ContextVar("variable", default=None)
+        writer = BackgroundWriter()
+        seen = []
+
+        variable.set("first")
+        writer.submit(lambda: seen.append(variable.get()))
+        variable.set("second")
+        writer.submit(lambda: seen.append(variable.get()))
+        writer.close()
+
+        self.assertEqual(seen, ["first", "second"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,177 @@
+"""
+Tests for the multi-problem batch runner
+"""
+
+import asyncio
+import glob
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+from typing import Dict
+from unittest.mock import patch
+
+# Set dummy API key for testing to prevent OpenAI SDK import failures
+os.environ["OPENAI_API_KEY"] = "test"
+
+from tests.helpers import DIFF_RESPONSE, write_problem
+from xEvolve.batch import BatchRunner, discover_problems
+from xEvolve.config import Config
+from xEvolve.controller import xEvolve
+
+
+class TestBatchRunner(unittest.TestCase):
+    """Tests for running several problems in one process"""
+
+    def setUp(self):
+        """Set up test environment"""
+        self.test_dir = tempfile.mkdtemp()
+
+        self.problem_dirs = []
+        for name in ("a", "b", "c"):
+            problem_dir = os.path.join(self.test_dir, name)
+            os.makedirs(problem_dir)
+            write_problem(problem_dir, program_name="initial_program.py")
+            with open(os.path.join(problem_dir, "config.yaml"), "w") as f:
+                f.write("checkpoint_interval: 1000\n" "evaluator:\n  cascade_evaluation: false\n")
+            self.problem_dirs.append(problem_dir)
+
+        # A directory without an evaluator is skipped
+        os.makedirs(os.path.join(self.test_dir, "empty"))
+        self.problem_dirs.append(os.path.join(self.test_dir, "empty"))
+
+        self.config = Config()
+        self.config.evaluator.cascade_evaluation = False
+        self.config.llm.parallel_requests = 2
+
+    def tearDown(self):
+        """Clean up test environment"""
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def _record_controllers(self, runner: BatchRunner) -> Dict[str, xEvolve]:
+        """Collect the controllers the runner creates, which it drops once they finish"""
+        controllers = {}
+        create_controller = runner._create_controller
+
+        def record(problem):
+            controllers[problem.name] = create_controller(problem)
+            return controllers[problem.name]
+
+        runner._create_controller = record
+        return controllers
+
+    def test_discover_problems(self):
+        """Test that only complete problem directories are used"""
+        problems = discover_problems(self.problem_dirs)
+        self.assertEqual(len(problems), 3)
+        self.assertTrue(all(problem.config_path for problem in problems))
+
+    def test_shared_pools(self):
+        """Test that problems share the LLM request limit and respect the per-problem cap"""
+        runner = BatchRunner(
+            discover_problems(self.problem_dirs),
+            config=self.config,
+            per_problem_concurrency=2,
+        )
+        controllers = self._record_controllers(runner)
+
+        active = 0
+        peak = 0
+
+        async def fake_call(*args, **kwargs):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.02)
+            active -= 1
+            return DIFF_RESPONSE
+
+        with (
+            patch.object(
+                runner.llm_ensemble.primary_model, "generate_with_context", side_effect=fake_call
+            ),
+            patch.object(
+                runner.llm_ensemble.secondary_model, "generate_with_context", side_effect=fake_call
+            ),
+        ):
+            results = asyncio.run(runner.run(iterations=4))
+
+        # Three problems with two iterations each in flight, but only two LLM requests at once
+        self.assertEqual(peak, 2)
+        self.assertEqual(len(results), 3)
+        self.assertTrue(all(best is not None for best in results.values()))
+
+        for controller in controllers.values():
+            self.assertIs(controller.llm_ensemble, runner.llm_ensemble)
+            self.assertIs(controller.evaluator.task_pool, runner.evaluation_pool)
+            self.assertEqual(controller.config.parallel_iterations, 2)
+            self.assertEqual(len(controller.database.programs), 5)
+        self.assertEqual(runner.controllers, {})
+
+    def test_priorities_ignored(self):
+        """Test that problems with different score scales share the pool in arrival order"""
+        self.config.evaluator.priority_scheduling = True
+        runner = BatchRunner(discover_problems(self.problem_dirs), config=self.config)
+        controllers = self._record_controllers(runner)
+
+        with patch.object(runner.llm_ensemble, "generate_with_context", return_value=DIFF_RESPONSE):
+            asyncio.run(runner.run(iterations=1))
+
+        for controller in controllers.values():
+            self.assertFalse(controller.config.evaluator.priority_scheduling)
+        self.assertTrue(self.config.evaluator.priority_scheduling)
+
+    def test_failed_problem(self):
+        """Test that a failing problem does not stop the rest of the batch"""
+        problems = discover_problems(self.problem_dirs)
+        problems[0].initial_program_path = os.path.join(self.test_dir, "missing.py")
+        runner = BatchRunner(problems, config=self.config, max_concurrent_problems=1)
+
+        with patch.object(runner.llm_ensemble, "generate_with_context", return_value=DIFF_RESPONSE):
+            results = asyncio.run(runner.run(iterations=2))
+
+        self.assertIsNone(results[problems[0].name])
+        self.assertIsNotNone(results[problems[1].name])
+        self.assertIsNotNone(results[problems[2].name])
+
+    def test_log_level_override(self):
+        """Test that the runner's log level replaces the log level of each problem"""
+        problems = discover_problems(self.problem_dirs)
+        with open(problems[0].config_path, "a") as f:
+            f.write("log_level: WARNING\n")
+        runner = BatchRunner(problems, config=self.config, log_level="DEBUG")
+        controllers = self._record_controllers(runner)
+
+        with patch.object(runner.llm_ensemble, "generate_with_context", return_value=DIFF_RESPONSE):
+            asyncio.run(runner.run(iterations=1))
+
+        self.assertEqual(len(controllers), 3)
+        for controller in controllers.values():
+            self.assertEqual(controller.config.log_level, "DEBUG")
+
+    def test_log_files_per_problem(self):
+        """Test that each problem logs to its own file and removes its handler when done"""
+        handlers = list(logging.getLogger().handlers)
+        runner = BatchRunner(discover_problems(self.problem_dirs), config=self.config)
+        controllers = self._record_controllers(runner)
+
+        with patch.object(runner.llm_ensemble, "generate_with_context", return_value=DIFF_RESPONSE):
+            asyncio.run(runner.run(iterations=2))
+
+        new_handlers = [h for h in logging.getLogger().handlers if h not in handlers]
+        self.assertFalse(any(isinstance(h, logging.FileHandler) for h in new_handlers))
+
+        for name, controller in controllers.items():
+            log_files = glob.glob(os.path.join(controller.output_dir, "logs", "*.log"))
+            self.assertEqual(len(log_files), 1)
+            with open(log_files[0]) as f:
+                content = f.read()
+            self.assertIn(os.path.join(name, "initial_program.py"), content)
+            for other in controllers:
+                if other != name:
+                    self.assertNotIn(os.path.join(other, "initial_program.py"), content)
+
+
+if __name__ == "__main__":
+    unittest.main()
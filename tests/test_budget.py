@@ -0,0 +1,126 @@
+"""
+Tests for run budgets
+"""
+
+import asyncio
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# Set dummy API key for testing to prevent OpenAI SDK import failures
+os.environ["OPENAI_API_KEY"] = "test"
+
+from tests.helpers import DIFF_RESPONSE, write_problem
+from xEvolve.budget import RunBudget
+from xEvolve.config import BudgetConfig, Config
+from xEvolve.controller import xEvolve
+
+
+class TestRunBudget(unittest.TestCase):
+    """Tests for the RunBudget scheduler"""
+
+    def test_unlimited(self):
+        """Test that a budget without limits never stops the run"""
+        budget = RunBudget(BudgetConfig())
+        budget.start()
+        budget.update(llm_tokens=10**9, evaluation_seconds=10**6)
+        budget.record_iteration(1.0)
+
+        self.assertFalse(budget.exhausted())
+        self.assertTrue(budget.can_launch(in_flight=100))
+        self.assertIsNone(budget.remaining_wall_time())
+        self.assertEqual(budget.remaining_fraction(), 1.0)
+
+    def test_projected_token_cost(self):
+        """Test that iterations are only launched while their projected cost fits"""
+        budget = RunBudget(BudgetConfig(max_llm_tokens=1000))
+        budget.start()
+
+        # No estimate yet
+        self.assertTrue(budget.can_launch(in_flight=5))
+
+        budget.update(llm_tokens=300, evaluation_seconds=0.0)
+        budget.record_iteration(1.0)
+
+        # 300 spent, 300 per iteration: two more fit, three do not
+        self.assertTrue(budget.can_launch(in_flight=1))
+        self.assertFalse(budget.can_launch(in_flight=2))
+        self.assertIsNone(budget.stop_reason)
+
+        budget.update(llm_tokens=1000, evaluation_seconds=0.0)
+        self.assertFalse(budget.can_launch(in_flight=0))
+        self.assertEqual(budget.stop_reason, "LLM token budget")
+
+    def test_generation_pacing(self):
+        """Test that generation is held back while children queue for evaluation"""
+        budget = RunBudget(BudgetConfig())
+        self.assertFalse(budget.should_throttle_generation(4, evaluation_slots=4))
+        self.assertTrue(budget.should_throttle_generation(5, evaluation_slots=4))
+
+        budget = RunBudget(BudgetConfig(pace_generation=False))
+        self.assertFalse(budget.should_throttle_generation(5, evaluation_slots=4))
+
+
+class TestControllerBudget(unittest.TestCase):
+    """Tests for budgets enforced by the controller"""
+
+    def setUp(self):
+        """Set up test environment"""
+        self.test_dir = tempfile.mkdtemp()
+
+        self.program_path, self.evaluator_path = write_problem(self.test_dir)
+
+        self.config = Config()
+        self.config.checkpoint_interval = 1000
+        self.config.evaluator.cascade_evaluation = False
+
+    def tearDown(self):
+        """Clean up test environment"""
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def _make_controller(self) -> xEvolve:
+        return xEvolve(
+            initial_program_path=self.program_path,
+            evaluation_file=self.evaluator_path,
+            config=self.config,
+            output_dir=self.test_dir,
+        )
+
+    def test_token_budget(self):
+        """Test that the run stops before exceeding the token budget"""
+        self.config.budget.max_llm_tokens = 350
+        controller = self._make_controller()
+        model = controller.llm_ensemble.primary_model
+
+        async def fake_llm(*args, **kwargs):
+            model.completion_tokens += 100
+            return DIFF_RESPONSE
+
+        with patch.object(controller.llm_ensemble, "generate_with_context", side_effect=fake_llm):
+            asyncio.run(controller.run(iterations=10))
+
+        # Three iterations fit in the budget, a fourth would exceed it
+        self.assertEqual(controller.database.last_iteration, 3)
+        self.assertEqual(controller.llm_ensemble.total_tokens, 300)
+
+    def test_wall_time_budget(self):
+        """Test that in-flight iterations are cancelled when the wall-clock budget runs out"""
+        self.config.budget.max_wall_time = 0.3
+        self.config.parallel_iterations = 2
+        controller = self._make_controller()
+
+        async def slow_llm(*args, **kwargs):
+            await asyncio.sleep(10)
+            return DIFF_RESPONSE
+
+        with patch.object(controller.llm_ensemble, "generate_with_context", side_effect=slow_llm):
+            asyncio.run(asyncio.wait_for(controller.run(iterations=10), timeout=5))
+
+        # Only the initial program was added
+        self.assertEqual(len(controller.database.programs), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
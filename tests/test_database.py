@@ -0,0 +1,783 @@
+"""
+Tests for ProgramDatabase bookkeeping
+"""
+
+import json
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from xEvolve.config import Config
+from xEvolve.database import (
+    CodeCache,
+    CodeEntry,
+    CodeStore,
+    FeatureGrid,
+    LazyProgram,
+    Program,
+    ProgramDatabase,
+)
+
+
+class TestProgramDatabaseBatch(unittest.TestCase):
+    """Tests for adding programs in batches"""
+
+    def setUp(self):
+        config = Config()
+        config.database.in_memory = True
+        config.database.archive_size = 3
+        self.db = ProgramDatabase(config.database)
+
+    def _program(self, program_id: str, score: float) -> Program:
+        return Program(
+            id=program_id,
+            code=f"def f():\n    return {score}\n",
+            metrics={"score": score},
+        )
+
+    def test_add_many_matches_sequential_adds(self):
+        """Test that a batch insert keeps the same archive and best program as single adds"""
+        scores = [0.1, 0.9, 0.4, 0.7, 0.2, 0.8]
+
+        sequential = ProgramDatabase(self.db.config)
+        for i, score in enumerate(scores):
+            sequential.add(self._program(f"p{i}", score))
+
+        ids = self.db.add_many(
+            [self._program(f"p{i}", score) for i, score in enumerate(scores)], iteration=6
+        )
+
+        self.assertEqual(ids, [f"p{i}" for i in range(len(scores))])
+        self.assertEqual(len(self.db.programs), len(scores))
+        self.assertEqual(self.db.archive, {"p1", "p3", "p5"})
+        self.assertEqual(self.db.archive, sequential.archive)
+        self.assertEqual(self.db.best_program_id, "p1")
+        self.assertEqual(self.db.last_iteration, 6)
+        self.assertTrue(all(p.iteration_found == 6 for p in self.db.programs.values()))
+        self.assertEqual(sum(len(island) for island in self.db.islands), len(scores))
+
+    def test_add_many_replaces_worst_archived(self):
+        """Test that a batch only displaces archived programs it beats"""
+        self.db.add_many([self._program(f"old{i}", 0.5 + i * 0.1) for i in range(3)])
+        self.db.add_many([self._program("better", 0.95), self._program("worse", 0.1)])
+
+        self.assertEqual(self.db.archive, {"old1", "old2", "better"})
+        self.assertEqual(self.db.best_program_id, "better")
+
+    def test_is_dominated(self):
+        """Test that candidates below both the archive and their parent are dominated"""
+        parent = self._program("parent", 0.6)
+        self.db.add_many([parent, self._program("a", 0.4), self._program("b", 0.5)])
+
+        self.assertTrue(self.db.is_dominated({"score": 0.3}, parent))
+        self.assertFalse(self.db.is_dominated({"score": 0.45}, parent))
+        self.assertFalse(self.db.is_dominated({"score": 0.3}, self._program("weak", 0.2)))
+
+        # Nothing is dominated while the archive still has room
+        self.db.archive.discard("a")
+        self.assertFalse(self.db.is_dominated({"score": 0.0}, parent))
+
+    def test_archive_ranks_by_fitness(self):
+        """Test that the archive prefers combined_score over the average of metrics"""
+        self.db.add_many(
+            [
+                Program(id=f"p{i}", code="", metrics={"combined_score": 0.5 + i / 10, "x": 0.0})
+                for i in range(3)
+            ]
+        )
+        # Its average is higher than any archived program's, its combined_score is not
+        self.db.add(Program(id="q", code="", metrics={"combined_score": 0.45, "x": 5.0}))
+
+        self.assertEqual(self.db.archive, {"p0", "p1", "p2"})
+        self.db.add(Program(id="r", code="", metrics={"combined_score": 0.65}))
+        self.assertEqual(self.db.archive, {"p1", "p2", "r"})
+
+    def test_archive_heap_survives_checkpoint(self):
+        """Test that a loaded archive keeps its order without rescanning programs"""
+        test_dir = tempfile.mkdtemp()
+        try:
+            self.db.add_many([self._program(f"p{i}", i / 10) for i in range(6)])
+            self.db.save(test_dir, iteration=1)
+
+            loaded = ProgramDatabase(self.db.config)
+            with patch.object(loaded, "_rebuild_archive_heap") as rebuild:
+                loaded.load(test_dir)
+            rebuild.assert_not_called()
+
+            self.assertEqual(loaded.archive, {"p3", "p4", "p5"})
+            self.assertTrue(loaded.is_dominated({"score": 0.25}, self._program("x", 0.3)))
+            loaded.add(self._program("new", 0.45))
+            self.assertEqual(loaded.archive, {"new", "p4", "p5"})
+        finally:
+            shutil.rmtree(test_dir, ignore_errors=True)
+
+
+class TestProgram(unittest.TestCase):
+    """Tests for the compact program representation"""
+
+    def test_compact_representation(self):
+        """Test that programs share metric names and language strings and have no __dict__"""
+        first = Program(id="a", code="x = 1", language="".join(["py", "thon"]), metrics={"s": 1})
+        second = Program(id="b", code="x = 2", metrics={"s": 0.5})
+
+        self.assertFalse(hasattr(first, "__dict__"))
+        self.assertIs(first._metric_names, second._metric_names)
+        self.assertIs(first.language, second.language)
+
+        second.metrics = {"s": 0.7, "t": 0.2}
+        self.assertEqual(second.metrics, {"s": 0.7, "t": 0.2})
+
+    def test_metrics_are_read_only(self):
+        """Test that changing a single metric fails rather than being silently lost"""
+        program = Program(id="a", code="x = 1", metrics={"score": 0.5})
+
+        with self.assertRaises(TypeError):
+            program.metrics["score"] = 0.9
+        self.assertEqual(program.metrics, {"score": 0.5})
+        self.assertIs(type(program.to_dict()["metrics"]), dict)
+
+    def test_round_trip(self):
+        """Test that to_dict and from_dict preserve every field"""
+        program = Program(
+            id="a",
+            code="x = 1",
+            parent_id="p",
+            generation=2,
+            iteration_found=3,
+            metrics={"score": 0.5, "time": 1.5},
+            metadata={"changes": "c"},
+        )
+        data = program.to_dict()
+
+        self.assertEqual(list(data), list(Program.FIELDS))
+        self.assertEqual(json.loads(json.dumps(data)), data)
+        self.assertEqual(Program.from_dict(data), program)
+        self.assertNotEqual(Program.from_dict(dict(data, code="x = 2")), program)
+
+
+class TestCodeStore(unittest.TestCase):
+    """Tests for the delta-compressed code store"""
+
+    def _source(self, n: int) -> str:
+        return "".join(f"def f{i}(x):\n    return x * {i}\n\n" for i in range(n))
+
+    def test_deltas_rebuild_sources(self):
+        """Test that sources stored as delta chains rebuild exactly once evicted from the cache"""
+        random.seed(0)
+        store = CodeStore(CodeCache(max_entries=1), snapshot_interval=3)
+
+        sources = [self._source(50)]
+        entries = [store.put(sources[0])]
+        for i in range(1, 10):
+            lines = sources[-1].split("\n")
+            lines[random.randrange(len(lines))] = f"    return {i}"
+            lines.insert(random.randrange(len(lines)), f"# edit {i}")
+            sources.append("\n".join(lines))
+            entries.append(store.put(sources[-1], entries[-1]))
+
+        self.assertEqual([entry.depth for entry in entries], [0, 1, 2, 3, 0, 1, 2, 3, 0, 1])
+        self.assertLess(entries[1].size, entries[0].size)
+        for source, entry in reversed(list(zip(sources, entries))):
+            self.assertEqual(entry.source(), source)
+
+        # Identical sources share one entry
+        self.assertIs(store.put(sources[3]), entries[3])
+
+    def test_database_compresses_code(self):
+        """Test that programs added to the database keep their code in the store"""
+        config = Config()
+        config.database.code_cache_size = 1
+        config.database.compress_code = True
+        db = ProgramDatabase(config.database)
+
+        parent = Program(id="p", code=self._source(40), metrics={"score": 0.1})
+        child = Program(id="c", code=parent.code + "x = 1\n", parent_id="p", metrics={"score": 1})
+        twin = Program(id="t", code=child.code, parent_id="p", metrics={"score": 0.5})
+        db.add(parent)
+        db.add_many([child, twin])
+
+        self.assertIsInstance(child._code, CodeEntry)
+        self.assertIs(twin._code, child._code)
+        self.assertIs(child._code.base, parent._code)
+        self.assertEqual(db.get("c").code, self._source(40) + "x = 1\n")
+        self.assertEqual(db.get("p").to_dict()["code"], self._source(40))
+
+    def test_loaded_code_is_compressed_on_demand(self):
+        """Test that loading leaves code as it is until a program gets a child"""
+        config = Config()
+        config.database.compress_code = True
+        db = ProgramDatabase(config.database)
+        db.add(Program(id="p", code=self._source(40), metrics={"score": 0.1}))
+        db.add(Program(id="q", code=self._source(30), metrics={"score": 0.2}))
+
+        test_dir = tempfile.mkdtemp()
+        try:
+            db.save(test_dir)
+            loaded = ProgramDatabase(config.database)
+            loaded.load(test_dir)
+        finally:
+            shutil.rmtree(test_dir)
+
+        self.assertTrue(all(isinstance(p._code, str) for p in loaded.programs.values()))
+        child = Program(id="c", code=self._source(41), parent_id="p", metrics={"score": 1})
+        loaded.add(child)
+        self.assertIs(child._code.base, loaded.programs["p"]._code)
+        self.assertIsInstance(loaded.programs["q"]._code, str)
+
+
+class TestFitnessIndex(unittest.TestCase):
+    """Tests for the incrementally maintained rankings"""
+
+    def setUp(self):
+        config = Config()
+        config.database.in_memory = True
+        self.db = ProgramDatabase(config.database)
+
+    def test_rankings_match_full_sort(self):
+        """Test that top-k and best queries rank programs like a full sort"""
+        rng = random.Random(0)
+        programs = []
+        for i in range(200):
+            metrics = {"score": round(rng.random(), 1), "speed": rng.random()}
+            if i % 3:
+                metrics["combined_score"] = round(rng.random(), 2)
+            programs.append(Program(id=f"p{i}", code=f"x = {i}", metrics=metrics))
+
+        # Query a metric before and after programs are added
+        self.db.add(programs[0])
+        self.db.get_top_programs(5, metric="speed")
+        for program in programs[1:100]:
+            self.db.add(program)
+        self.db.add_many(programs[100:], iteration=1)
+
+        def full_sort(key):
+            return sorted(self.db.programs.values(), key=key, reverse=True)
+
+        average = full_sort(lambda p: sum(p.metrics.values()) / len(p.metrics))
+        self.assertEqual(self.db.get_top_programs(10), average[:10])
+        for metric in ("score", "speed", "combined_score"):
+            ranked = full_sort(lambda p: p.metrics.get(metric, float("-inf")))
+            ranked = [p for p in ranked if metric in p.metrics]
+            self.assertEqual(self.db.get_top_programs(7, metric=metric), ranked[:7])
+            self.assertEqual(self.db.get_best_program(metric=metric), ranked[0])
+
+
+class TestFeatureGrid(unittest.TestCase):
+    """Tests for the NumPy-backed MAP-Elites grid"""
+
+    def test_place_and_neighbours(self):
+        """Test cell replacement, neighbourhood lookups and coverage"""
+        grid = FeatureGrid(num_dimensions=2, bins=4)
+        grid.place((0, 0), "a", 0.1)
+        grid.place((1, 1), "b", 0.2)
+        grid.place((3, 3), "c", 0.3)
+        grid.place((1, 1), "d", 0.4)
+
+        self.assertEqual(grid.get((1, 1)), "d")
+        self.assertNotIn("b", grid)
+        self.assertEqual(sorted(grid.neighbours((0, 1))), ["a", "d"])
+        self.assertEqual(grid.neighbours((3, 3), radius=0), ["c"])
+        self.assertEqual(grid.occupancy(), 3)
+        self.assertAlmostEqual(grid.coverage(), 3 / 16)
+        self.assertEqual(grid.fitness[1, 1], 0.4)
+
+        # Moving a program to another cell empties its old cell
+        grid.place((2, 2), "a", 0.5)
+        self.assertIsNone(grid.get((0, 0)))
+        self.assertEqual(grid.to_dict(), {"1-1": "d", "3-3": "c", "2-2": "a"})
+
+    def test_loads_string_keyed_checkpoints(self):
+        """Test that checkpoints with "-"-joined cell keys restore the grid"""
+        test_dir = tempfile.mkdtemp()
+        try:
+            os.makedirs(os.path.join(test_dir, "programs"))
+            for program_id, score in (("a", 0.2), ("b", 0.7)):
+                program = Program(id=program_id, code="x = 1", metrics={"score": score})
+                with open(os.path.join(test_dir, "programs", f"{program_id}.json"), "w") as f:
+                    json.dump(program.to_dict(), f)
+            with open(os.path.join(test_dir, "metadata.json"), "w") as f:
+                json.dump({"feature_map": {"2-0": "a", "7-0": "b"}, "archive": ["a", "b"]}, f)
+
+            db = ProgramDatabase(Config().database)
+            db.load(test_dir)
+
+            self.assertEqual(db.feature_grid.get((2, 0)), "a")
+            self.assertEqual(db.feature_grid.get((7, 0)), "b")
+            self.assertEqual(db.feature_map, {"2-0": "a", "7-0": "b"})
+        finally:
+            shutil.rmtree(test_dir, ignore_errors=True)
+
+    def test_load_dict_keeps_minus_infinity_occupants(self):
+        """Test that occupants with -inf fitness are restored into their empty cells"""
+        grid = FeatureGrid(num_dimensions=1, bins=4)
+        grid.load_dict({"0": "a", "1": "b"}, {"a": float("-inf"), "b": 0.5})
+
+        self.assertEqual(grid.get((0,)), "a")
+        self.assertEqual(grid.get((1,)), "b")
+        self.assertEqual(grid.occupancy(), 2)
+
+
+class TestEviction(unittest.TestCase):
+    """Tests for keeping the population within population_size"""
+
+    def _db(self, policy: str) -> ProgramDatabase:
+        config = Config()
+        config.database.population_size = 5
+        config.database.archive_size = 2
+        config.database.eviction_policy = policy
+        config.database.feature_dimensions = ["score"]
+        return ProgramDatabase(config.database)
+
+    def _program(self, program_id: str, score: float) -> Program:
+        return Program(id=program_id, code="x = 1", metrics={"score": score})
+
+    def _check_invariants(self, db: ProgramDatabase) -> None:
+        self.assertLessEqual(len(db.programs), 5)
+        self.assertIn(db.best_program_id, db.programs)
+        self.assertTrue(db.archive <= set(db.programs))
+        self.assertTrue(set(db.feature_map.values()) <= set(db.programs))
+        self.assertEqual(set().union(*db.islands), set(db.programs))
+        self.assertEqual(
+            db.get_top_programs(10),
+            sorted(db.programs.values(), key=lambda p: p.metrics["score"], reverse=True),
+        )
+
+    def test_worst_policy(self):
+        """Test that the lowest-scoring unprotected programs are evicted"""
+        db = self._db("worst")
+        scores = [0.51, 0.52, 0.53, 0.54, 0.55, 0.56, 0.57, 0.95]
+        for i, score in enumerate(scores):
+            db.add(self._program(f"p{i}", score), iteration=i)
+
+        self._check_invariants(db)
+        # p6 and p7 are archived and the elites of their cells; p0 to p2 are the weakest
+        self.assertEqual(set(db.programs), {"p3", "p4", "p5", "p6", "p7"})
+
+    def test_oldest_policy(self):
+        """Test that the oldest unprotected programs are evicted"""
+        db = self._db("oldest")
+        scores = [0.9, 0.1, 0.2, 0.3, 0.4, 0.15, 0.25]
+        db.add_many([self._program(f"p{i}", score) for i, score in enumerate(scores)])
+
+        self._check_invariants(db)
+        # p0 is the best, so p1 and p2 are the oldest programs that can go
+        self.assertEqual(set(db.programs), {"p0", "p3", "p4", "p5", "p6"})
+
+    def test_crowding_policy(self):
+        """Test that crowded cells lose their weakest programs first"""
+        db = self._db("crowding")
+        scores = [0.11, 0.12, 0.13, 0.14, 0.15, 0.91, 0.52]
+        for i, score in enumerate(scores):
+            db.add(self._program(f"p{i}", score))
+
+        self._check_invariants(db)
+        self.assertEqual(set(db.programs), {"p2", "p3", "p4", "p5", "p6"})
+
+    def test_worst_policy_ranks_by_fitness(self):
+        """Test that the worst policy ranks programs by combined_score, like the archive"""
+        db = self._db("worst")
+        db.config.feature_dimensions = ["complexity"]
+        # The average of the metrics ranks the programs in the opposite order
+        for i in range(7):
+            metrics = {"combined_score": 0.1 * i, "other": 1.0 - 0.2 * i}
+            db.add(Program(id=f"p{i}", code="x = 1", metrics=metrics))
+
+        self.assertEqual(set(db.programs), {"p2", "p3", "p4", "p5", "p6"})
+
+    def test_protected_population(self):
+        """Test that nothing is evicted when protected programs fill the population"""
+        config = Config()
+        with self.assertLogs("xEvolve.config", level="WARNING"):
+            config.database = type(config.database)(population_size=2, archive_size=4)
+        db = ProgramDatabase(config.database)
+        with patch.object(db._fitness_index, "worst_first") as worst_first:
+            for i in range(4):
+                db.add(self._program(f"p{i}", 0.1 * i))
+
+        self.assertEqual(len(db.programs), 4)
+        worst_first.assert_not_called()
+
+    def test_evicted_programs_leave_checkpoints(self):
+        """Test that checkpoints only hold the current population"""
+        db = self._db("worst")
+        test_dir = tempfile.mkdtemp()
+        try:
+            for i in range(12):
+                db.add(self._program(f"p{i}", i / 12))
+                path = os.path.join(test_dir, f"checkpoint_{i}")
+                ProgramDatabase.write_checkpoint(db.prepare_checkpoint(path, i))
+
+            loaded = ProgramDatabase(db.config)
+            loaded.load(path)
+            self.assertEqual(set(loaded.programs), set(db.programs))
+        finally:
+            shutil.rmtree(test_dir, ignore_errors=True)
+
+
+class TestIncrementalCheckpoints(unittest.TestCase):
+    """Tests for delta-only checkpoints"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.config = Config()
+        self.db = ProgramDatabase(self.config.database)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def _add(self, program_id: str, score: float) -> None:
+        self.db.add(Program(id=program_id, code=f"x = {score}", metrics={"score": score}))
+
+    def _checkpoint(self, name: str, iteration: int) -> str:
+        path = os.path.join(self.test_dir, name)
+        snapshot = self.db.prepare_checkpoint(path, iteration)
+        ProgramDatabase.write_checkpoint(snapshot)
+        self.db.finish_checkpoint(snapshot)
+        return path
+
+    def test_only_new_programs_are_written(self):
+        """Test that a checkpoint writes only programs added since the previous one"""
+        for i in range(3):
+            self._add(f"a{i}", 0.1 * i)
+        first = self._checkpoint("checkpoint_3", 3)
+
+        for i in range(2):
+            self._add(f"b{i}", 0.5 + 0.1 * i)
+        second = self._checkpoint("checkpoint_5", 5)
+
+        self.assertEqual(len(os.listdir(os.path.join(first, "programs"))), 3)
+        self.assertEqual(
+            sorted(os.listdir(os.path.join(second, "programs"))), ["b0.json", "b1.json"]
+        )
+
+        loaded = ProgramDatabase(self.config.database)
+        loaded.load(second)
+
+        self.assertEqual(set(loaded.programs), set(self.db.programs))
+        self.assertEqual(loaded.last_iteration, 5)
+        self.assertEqual(loaded.best_program_id, "b1")
+
+        # Nothing new was added since loading, so the next checkpoint references everything
+        path = os.path.join(self.test_dir, "checkpoint_6")
+        snapshot = loaded.prepare_checkpoint(path, 6)
+        self.assertEqual(snapshot["programs"], [])
+
+    def test_failed_checkpoint_is_not_referenced(self):
+        """Test that programs of an unwritten or failed checkpoint are written again"""
+        for i in range(3):
+            self._add(f"a{i}", 0.1 * i)
+        failed = self.db.prepare_checkpoint(os.path.join(self.test_dir, "checkpoint_3"), 3)
+
+        # Until the first write is confirmed, the next checkpoint includes its programs too
+        self._add("b0", 0.5)
+        pending = self.db.prepare_checkpoint(os.path.join(self.test_dir, "checkpoint_4"), 4)
+        self.assertEqual(len(pending["programs"]), 4)
+        self.db.finish_checkpoint(pending, written=False)
+
+        self.db.finish_checkpoint(failed, written=False)
+        path = self._checkpoint("checkpoint_5", 5)
+        self.assertEqual(len(os.listdir(os.path.join(path, "programs"))), 4)
+        self.assertEqual(
+            self.db.prepare_checkpoint(os.path.join(self.test_dir, "checkpoint_6"), 6)["programs"],
+            [],
+        )
+
+    def test_full_save(self):
+        """Test that save still writes every program"""
+        for i in range(3):
+            self._add(f"a{i}", 0.1 * i)
+        self._checkpoint("checkpoint_3", 3)
+
+        path = os.path.join(self.test_dir, "full")
+        self.db.save(path, 3)
+
+        self.assertEqual(len(os.listdir(os.path.join(path, "programs"))), 3)
+
+    def test_lazy_load(self):
+        """Test that in_memory=False loads programs without code and reads it on access"""
+        for i in range(3):
+            self._add(f"a{i}", 0.1 * i)
+        self._checkpoint("checkpoint_3", 3)
+        for i in range(2):
+            self._add(f"b{i}", 0.5 + 0.1 * i)
+        second = self._checkpoint("checkpoint_5", 5)
+
+        self.config.database.in_memory = False
+        self.config.database.code_cache_size = 2
+        loaded = ProgramDatabase(self.config.database)
+        loaded.load(second)
+
+        self.assertEqual(set(loaded.programs), set(self.db.programs))
+        self.assertTrue(all(isinstance(p, LazyProgram) for p in loaded.programs.values()))
+        self.assertEqual(len(loaded._code_cache), 0)
+        self.assertEqual(loaded.best_program_id, "b1")
+
+        for program_id, program in self.db.programs.items():
+            self.assertEqual(loaded.programs[program_id].to_dict(), program.to_dict())
+        self.assertEqual(len(loaded._code_cache), 2)
+
+        # Unchanged lazy programs are referenced, not rewritten, by the next checkpoint
+        snapshot = loaded.prepare_checkpoint(os.path.join(self.test_dir, "checkpoint_6"), 6)
+        self.assertEqual(snapshot["programs"], [])
+
+
+class TestSQLiteStorage(unittest.TestCase):
+    """Tests for keeping the database in a SQLite file"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.test_dir, "programs.sqlite")
+        self.config = Config()
+        self.config.database.population_size = 5
+        self.config.database.archive_size = 2
+        self.config.database.feature_dimensions = ["score"]
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def _program(self, program_id: str, score: float) -> Program:
+        return Program(id=program_id, code=f"x = {score}", metrics={"score": score})
+
+    def _assert_same(self, loaded: ProgramDatabase, db: ProgramDatabase) -> None:
+        self.assertEqual(set(loaded.programs), set(db.programs))
+        for program_id, program in db.programs.items():
+            self.assertEqual(loaded.programs[program_id].to_dict(), program.to_dict())
+        self.assertEqual(loaded.archive, db.archive)
+        self.assertEqual(loaded.feature_map, db.feature_map)
+        self.assertEqual(loaded.islands[: len(db.islands)], db.islands)
+        self.assertEqual(loaded.best_program_id, db.best_program_id)
+        self.assertEqual(loaded.last_iteration, db.last_iteration)
+
+    def test_live_persistence(self):
+        """Test that a SQLite db_path follows additions and evictions"""
+        self.config.database.db_path = self.path
+        db = ProgramDatabase(self.config.database)
+        for i, score in enumerate([0.51, 0.52, 0.53, 0.54, 0.55, 0.56, 0.57, 0.95]):
+            db.add(self._program(f"p{i}", score), iteration=i)
+        db.add_many([self._program("q0", 0.2), self._program("q1", 0.99)], iteration=8)
+
+        loaded = ProgramDatabase(self.config.database)
+        self._assert_same(loaded, db)
+
+        # Evicted programs were deleted from the file
+        conn = sqlite3.connect(self.path)
+        rows = conn.execute("SELECT id FROM programs").fetchall()
+        self.assertEqual({row[0] for row in rows}, set(db.programs))
+        conn.close()
+
+    def test_close(self):
+        """Test that closing the database closes its SQLite connection and keeps the file"""
+        self.config.database.db_path = self.path
+        db = ProgramDatabase(self.config.database)
+        db.add(self._program("p0", 0.5), iteration=1)
+        store = db._store
+
+        db.close()
+        db.close()
+        with self.assertRaises(sqlite3.ProgrammingError):
+            store._conn.execute("SELECT 1")
+
+        # Later additions stay in memory only
+        db.add(self._program("p1", 0.6), iteration=2)
+        loaded = ProgramDatabase(self.config.database)
+        self.assertEqual(set(loaded.programs), {"p0"})
+        loaded.close()
+
+    def test_writes_only_changed_rows(self):
+        """Test that adding a program touches only the rows it changes"""
+        self.config.database.db_path = self.path
+        self.config.database.population_size = 100
+        self.config.database.archive_size = 50
+        db = ProgramDatabase(self.config.database)
+        for i in range(60):
+            db.add(self._program(f"p{i}", 0.01 * i), iteration=i)
+
+        changes = db._store._conn.total_changes
+        db.add(self._program("q", 0.999), iteration=60)
+        # Program, metric, island, one feature map cell, two archive members and two state keys
+        self.assertLessEqual(db._store._conn.total_changes - changes, 10)
+
+        self._assert_same(ProgramDatabase(self.config.database), db)
+
+    def test_load_checkpoint_into_store(self):
+        """Test that a checkpoint loaded from elsewhere is written to the db_path store"""
+        db = ProgramDatabase(self.config.database)
+        for i, score in enumerate([0.3, 0.9, 0.1]):
+            db.add(self._program(f"p{i}", score), iteration=i)
+        checkpoint = os.path.join(self.test_dir, "checkpoint")
+        db.save(checkpoint, 2)
+
+        self.config.database.db_path = self.path
+        ProgramDatabase(self.config.database).load(checkpoint)
+
+        self._assert_same(ProgramDatabase(self.config.database), db)
+
+    def test_save_and_load(self):
+        """Test that save and load round-trip through a SQLite file"""
+        db = ProgramDatabase(self.config.database)
+        for i, score in enumerate([0.3, 0.9, 0.1, 0.6]):
+            db.add(self._program(f"p{i}", score), iteration=i)
+        db.pending_candidates = [{"id": "c0"}]
+        db.save(self.path, 3)
+
+        loaded = ProgramDatabase(self.config.database)
+        loaded.load(self.path)
+        self._assert_same(loaded, db)
+        self.assertEqual(loaded.pending_candidates, [{"id": "c0"}])
+
+        # The programs are queryable by fitness without loading the database
+        conn = sqlite3.connect(self.path)
+        best = conn.execute("SELECT id FROM programs ORDER BY fitness DESC LIMIT 2").fetchall()
+        self.assertEqual([row[0] for row in best], ["p1", "p3"])
+        conn.close()
+
+
+class TestSegmentLogStorage(unittest.TestCase):
+    """Tests for keeping the database in an append-only segment log"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.test_dir, "programs.log")
+        self.config = Config()
+        self.config.database.db_path = self.path
+        self.config.database.population_size = 5
+        self.config.database.archive_size = 2
+        self.config.database.feature_dimensions = ["score"]
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def _program(self, program_id: str, score: float) -> Program:
+        return Program(id=program_id, code=f"x = {score}", metrics={"score": score})
+
+    def _reopen(self, db: ProgramDatabase) -> ProgramDatabase:
+        db._store.close()
+        loaded = ProgramDatabase(self.config.database)
+        # Appending counts the same live entries as replaying the log
+        self.assertEqual(
+            loaded._store._record_count - loaded._store._garbage,
+            db._store._record_count - db._store._garbage,
+        )
+        self.assertEqual(set(loaded.programs), set(db.programs))
+        for program_id, program in db.programs.items():
+            self.assertEqual(loaded.programs[program_id].to_dict(), program.to_dict())
+        self.assertEqual(loaded.archive, db.archive)
+        self.assertEqual(loaded.feature_map, db.feature_map)
+        self.assertEqual(loaded.islands[: len(db.islands)], db.islands)
+        self.assertEqual(loaded.best_program_id, db.best_program_id)
+        self.assertEqual(loaded.last_iteration, db.last_iteration)
+        return loaded
+
+    def test_replay_and_compaction(self):
+        """Test that the log replays additions and evictions, before and after compaction"""
+        db = ProgramDatabase(self.config.database)
+        db._store.compaction_threshold = 5
+        for i in range(20):
+            db.add(self._program(f"p{i}", random.random()), iteration=i)
+        db._store._compactor.flush()
+
+        # Compaction left a snapshot segment and the segment written since
+        self.assertLessEqual(len(os.listdir(self.path)), 2)
+        loaded = self._reopen(db)
+
+        loaded.add_many([self._program("q0", 0.5), self._program("q1", 0.7)], iteration=20)
+        self._reopen(loaded)._store.close()
+
+    def test_state_records_hold_changes_only(self):
+        """Test that an add appends only the state it changed"""
+        self.config.database.population_size = 100
+        self.config.database.archive_size = 50
+        self.config.database.feature_bins = 20
+        db = ProgramDatabase(self.config.database)
+        for i in range(60):
+            db.add(self._program(f"p{i}", 0.015 * i), iteration=i)
+
+        store = db._store
+        segment = store._segment_path(store._active)
+        before = len(list(store._records(segment)))
+        db.add(self._program("q", 0.999), iteration=60)
+        add, state = list(store._records(segment))[before:]
+
+        self.assertEqual(add["program"]["id"], "q")
+        self.assertEqual(state["changes"]["feature_map"], {"19": "q"})
+        self.assertEqual(set(state["changes"]["archive"]), {"q", "p10"})
+        self.assertNotIn("pending_candidates", state["changes"])
+        self._reopen(db)._store.close()
+
+    def test_close_and_reopen(self):
+        """Test that a closed log, with its compaction finished, can be opened again"""
+        db = ProgramDatabase(self.config.database)
+        db._store.compaction_threshold = 5
+        for i in range(20):
+            db.add(self._program(f"p{i}", random.random()), iteration=i)
+        compactor = db._store._compactor._thread
+
+        db.close()
+        db.close()
+        self.assertFalse(compactor.is_alive())
+
+        reopened = ProgramDatabase(self.config.database)
+        self.assertEqual(set(reopened.programs), set(db.programs))
+        reopened.close()
+
+        # Loading the log right after closing it works as well
+        loaded = ProgramDatabase(Config().database)
+        loaded.load(self.path)
+        self.assertEqual(set(loaded.programs), set(db.programs))
+
+    def test_torn_record(self):
+        """Test that a torn record at the end of the log is dropped on opening"""
+        db = ProgramDatabase(self.config.database)
+        for i in range(3):
+            db.add(self._program(f"p{i}", 0.1 * (i + 1)), iteration=i)
+        db._store.close()
+
+        segment = os.path.join(self.path, sorted(os.listdir(self.path))[-1])
+        with open(segment, "ab") as f:
+            f.write(b"\x00\x00\x01\x00partial")
+
+        loaded = ProgramDatabase(self.config.database)
+        self.assertEqual(set(loaded.programs), {"p0", "p1", "p2"})
+
+        # Records appended after the truncated one replay normally
+        loaded.add(self._program("p3", 0.9), iteration=3)
+        self._reopen(loaded)._store.close()
+
+    def test_save_to_live_log(self):
+        """Test that saving to db_path goes through the open log instead of replacing it"""
+        self.config.database.population_size = 100
+        db = ProgramDatabase(self.config.database)
+        for i in range(20):
+            db.add(self._program(f"p{i}", 0.01 * i), iteration=i)
+        db.save()
+        for i in range(20, 30):
+            db.add(self._program(f"p{i}", 0.01 * i), iteration=i)
+        db.sync()
+
+        self.assertEqual(len(self._reopen(db).programs), 30)
+        with self.assertRaises(RuntimeError):
+            ProgramDatabase(self.config.database)
+
+    def test_save_and_load(self):
+        """Test that save and load round-trip through a segment log"""
+        self.config.database.db_path = None
+        db = ProgramDatabase(self.config.database)
+        for i, score in enumerate([0.3, 0.9, 0.1, 0.6]):
+            db.add(self._program(f"p{i}", score), iteration=i)
+        db.save(self.path, 3)
+        db.save(self.path, 3)
+
+        loaded = ProgramDatabase(self.config.database)
+        loaded.load(self.path)
+        self.assertEqual(set(loaded.programs), set(db.programs))
+        self.assertEqual(loaded.archive, db.archive)
+        self.assertEqual(loaded.best_program_id, "p1")
+        self.assertEqual(loaded.last_iteration, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
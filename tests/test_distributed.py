@@ -0,0 +1,178 @@
+"""
+Tests for distributed evaluation with local worker processes
+"""
+
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from xEvolve.config import EvaluatorConfig
+from xEvolve.distributed import read_message, send_message
+from xEvolve.evaluator import Evaluator
+
+
+class TestDistributedEvaluation(unittest.TestCase):
+    """Tests for evaluating programs on worker processes"""
+
+    def setUp(self):
+        """Set up test environment"""
+        self.test_dir = tempfile.mkdtemp()
+
+        self.evaluator_path = os.path.join(self.test_dir, "evaluator.py")
+        with open(self.evaluator_path, "w") as f:
+            f.write(
+                "import os\n"
+                "import time\n"
+                "\n"
+                "def evaluate(program_path):\n"
+                "    time.sleep(0.2)\n"
+                "    with open(program_path) as f:\n"
+                "        length = len(f.read())\n"
+                "    return {'length': float(length), 'pid': float(os.getpid())}\n"
+            )
+
+        self.config = EvaluatorConfig()
+        self.config.distributed = True
+        self.config.num_local_workers = 2
+        self.config.cascade_evaluation = False
+        self.config.timeout = 60
+
+    def tearDown(self):
+        """Clean up test environment"""
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def test_local_workers(self):
+        """Test that jobs are spread over several local workers"""
+        evaluator = Evaluator(self.config, self.evaluator_path)
+        programs = [("x" * (i + 1), f"program_{i}") for i in range(6)]
+
+        async def run_test():
+            try:
+                return await evaluator.evaluate_multiple(programs)
+            finally:
+                await evaluator.close()
+
+        results = asyncio.run(run_test())
+
+        self.assertEqual([r["length"] for r in results], [1.0, 2.0, 3.0, 4.0, 5.0, 6.0])
+        # Evaluations ran in the workers, not in this process, and used both of them
+        pids = {r["pid"] for r in results}
+        self.assertNotIn(float(os.getpid()), pids)
+        self.assertEqual(len(pids), 2)
+
+    def test_workers_not_limited_by_local_pool(self):
+        """Test that remote jobs use every worker even with a smaller local pool"""
+        self.config.parallel_evaluations = 1
+        evaluator = Evaluator(self.config, self.evaluator_path)
+        programs = [("x" * (i + 1), f"program_{i}") for i in range(4)]
+
+        async def run_test():
+            try:
+                await evaluator.coordinator.start()
+                start = time.monotonic()
+                await evaluator.evaluate_multiple(programs)
+                return time.monotonic() - start
+            finally:
+                await evaluator.close()
+
+        # Four 0.2s jobs on two workers take two rounds, not four
+        self.assertLess(asyncio.run(run_test()), 0.7)
+
+    def test_stuck_worker_job_is_requeued(self):
+        """Test that a job taking longer than the timeout is handed to another worker"""
+        marker = os.path.join(self.test_dir, "stuck")
+        with open(self.evaluator_path, "w") as f:
+            f.write(
+                "import os\n"
+                "import time\n"
+                "\n"
+                "def evaluate(program_path):\n"
+                f"    if not os.path.exists({marker!r}):\n"
+                f"        open({marker!r}, 'w').close()\n"
+                "        time.sleep(60)\n"
+                "    return {'pid': float(os.getpid())}\n"
+            )
+        self.config.timeout = 5
+        evaluator = Evaluator(self.config, self.evaluator_path)
+
+        async def run_test():
+            try:
+                return await evaluator.evaluate_program("x = 1", "program_0")
+            finally:
+                await evaluator.close()
+
+        metrics = asyncio.run(run_test())
+        self.assertIn("pid", metrics)
+
+    def test_every_worker_stuck(self):
+        """Test that stuck workers are restarted and their jobs fail instead of hanging"""
+        with open(self.evaluator_path, "w") as f:
+            f.write("import time\n\ndef evaluate(program_path):\n    time.sleep(60)\n")
+        self.config.timeout = 3
+        self.config.max_retries = 2
+        evaluator = Evaluator(self.config, self.evaluator_path)
+        coordinator = evaluator.coordinator
+
+        async def run_test():
+            try:
+                await coordinator.start()
+                first = dict(coordinator._processes)
+                results = await evaluator.evaluate_multiple([("x = 1", "a"), ("x = 2", "b")])
+                # Every worker was replaced, and the replacements connected again
+                await asyncio.wait_for(coordinator._wait_for_workers(2), timeout=10)
+                restarted = all(
+                    coordinator._processes[name] is not process for name, process in first.items()
+                )
+                return results, restarted
+            finally:
+                await evaluator.close()
+
+        results, restarted = asyncio.run(run_test())
+        self.assertEqual(results, [{"error": 0.0}] * 2)
+        self.assertTrue(restarted)
+
+    def test_no_workers(self):
+        """Test that jobs fail when no worker connects within the timeout"""
+        self.config.num_local_workers = 0
+        self.config.timeout = 1
+        evaluator = Evaluator(self.config, self.evaluator_path)
+
+        async def run_test():
+            try:
+                return await evaluator.evaluate_program("x = 1", "a")
+            finally:
+                await evaluator.close()
+
+        self.assertEqual(asyncio.run(run_test()), {"error": 0.0})
+
+    def test_token_required(self):
+        """Test that workers without the coordinator's token are rejected"""
+        self.config.num_local_workers = 1
+        self.config.coordinator_token = "secret"
+        evaluator = Evaluator(self.config, self.evaluator_path)
+        coordinator = evaluator.coordinator
+
+        async def run_test():
+            try:
+                # Local workers are given the token
+                metrics = await evaluator.evaluate_program("x = 1", "a")
+
+                reader, writer = await asyncio.open_connection(coordinator.host, coordinator.port)
+                await send_message(writer, {"type": "hello", "worker": "intruder", "token": "x"})
+                with self.assertRaises(asyncio.IncompleteReadError):
+                    await read_message(reader)
+                writer.close()
+                return metrics, coordinator.num_workers
+            finally:
+                await evaluator.close()
+
+        metrics, num_workers = asyncio.run(run_test())
+        self.assertEqual(metrics["length"], 5.0)
+        self.assertEqual(num_workers, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,270 @@
+"""
+Tests for the evaluator
+"""
+
+import asyncio
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from contextlib import closing
+
+from xEvolve.cache import EvaluationCache
+from xEvolve.config import EvaluatorConfig
+from xEvolve.evaluator import Evaluator
+
+CASCADE_EVALUATOR = """
+def evaluate(program_path):
+    return {"score": 1.0}
+
+def evaluate_stage1(program_path):
+    return {"stage1": 0.6}
+
+def evaluate_stage2(program_path):
+    return {"stage2": 0.8}
+"""
+
+
+class TestEvaluator(unittest.TestCase):
+    """Tests for evaluating programs in this process"""
+
+    def setUp(self):
+        """Set up test environment"""
+        self.test_dir = tempfile.mkdtemp()
+        self.evaluator_path = os.path.join(self.test_dir, "evaluator.py")
+        with open(self.evaluator_path, "w") as f:
+            f.write(CASCADE_EVALUATOR)
+
+        self.config = EvaluatorConfig()
+        self.config.cascade_thresholds = [0.5, 0.75]
+
+    def tearDown(self):
+        """Clean up test environment"""
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def test_cascade_runs_all_stages(self):
+        """Test that cascade evaluation merges the results of every stage"""
+        evaluator = Evaluator(self.config, self.evaluator_path)
+
+        metrics = asyncio.run(evaluator.evaluate_program("x = 1", "p"))
+
+        self.assertEqual(metrics, {"stage1": 0.6, "stage2": 0.8})
+        self.assertEqual(evaluator.cancelled_evaluations, 0)
+
+    def test_should_continue_stops_cascade(self):
+        """Test that a should_continue callback skips the remaining stages"""
+        evaluator = Evaluator(self.config, self.evaluator_path)
+        calls = []
+
+        def should_continue(program_id, stage, metrics):
+            calls.append((program_id, stage, dict(metrics)))
+            return False
+
+        metrics = asyncio.run(evaluator.evaluate_program("x = 1", "p", should_continue))
+
+        self.assertEqual(metrics, {"stage1": 0.6})
+        self.assertEqual(calls, [("p", 1, {"stage1": 0.6})])
+        self.assertEqual(evaluator.cancelled_evaluations, 1)
+
+    def test_priorities_order_queued_evaluations(self):
+        """Test that queued evaluations start in order of priority"""
+        self.config.parallel_evaluations = 1
+        evaluator = Evaluator(self.config, self.evaluator_path)
+        order = []
+
+        async def fake_evaluate(program_code, program_id="", should_continue=None):
+            order.append(program_id)
+            await asyncio.sleep(0.01)
+            return {"score": 1.0}
+
+        evaluator._evaluate_program = fake_evaluate
+
+        results = asyncio.run(
+            evaluator.evaluate_multiple(
+                [("x = 1", "a"), ("x = 2", "b"), ("x = 3", "c"), ("x = 4", "d")],
+                priorities=[0.0, 0.1, float("-inf"), 0.9],
+            )
+        )
+
+        # The first program takes the free slot, the rest wait and start by priority
+        self.assertEqual(order, ["a", "d", "b", "c"])
+        self.assertEqual(results, [{"score": 1.0}] * 4)
+
+    def test_cache_skips_repeated_evaluations(self):
+        """Test that cached programs are not evaluated again, also by a later evaluator"""
+        cache_path = os.path.join(self.test_dir, "cache.sqlite")
+        evaluator = Evaluator(self.config, self.evaluator_path, cache=EvaluationCache(cache_path))
+        calls = []
+        evaluate_program = evaluator._evaluate_program
+
+        async def count_evaluations(program_code, program_id="", should_continue=None):
+            calls.append(program_id)
+            return await evaluate_program(program_code, program_id, should_continue)
+
+        evaluator._evaluate_program = count_evaluations
+
+        first = asyncio.run(evaluator.evaluate_program("x = 1", "a"))
+        second = asyncio.run(evaluator.evaluate_program("x = 1", "b"))
+        self.assertEqual(first, second)
+        self.assertEqual(calls, ["a"])
+        self.assertEqual((evaluator.cache.hits, evaluator.cache.misses), (1, 1))
+        evaluator.cache.close()
+
+        # A resumed run shares the cache, but a different seed or evaluator does not
+        resumed = Evaluator(self.config, self.evaluator_path, cache=EvaluationCache(cache_path))
+        self.assertEqual(asyncio.run(resumed.evaluate_program("x = 1", "c")), first)
+        self.assertEqual(resumed.cache.hits, 1)
+
+        reseeded = Evaluator(self.config, self.evaluator_path, cache=resumed.cache, random_seed=42)
+        asyncio.run(reseeded.evaluate_program("x = 1", "d"))
+        self.assertEqual(resumed.cache.misses, 1)
+
+    def test_cache_skips_stopped_evaluations(self):
+        """Test that evaluations stopped after a cascade stage are not cached"""
+        cache = EvaluationCache(os.path.join(self.test_dir, "cache.sqlite"))
+        evaluator = Evaluator(self.config, self.evaluator_path, cache=cache)
+
+        asyncio.run(evaluator.evaluate_program("x = 1", "p", lambda *args: False))
+
+        self.assertEqual(len(cache), 0)
+        metrics = asyncio.run(evaluator.evaluate_program("x = 1", "q"))
+        self.assertEqual(metrics, {"stage1": 0.6, "stage2": 0.8})
+        self.assertEqual(len(cache), 1)
+
+    def test_identical_evaluations_are_coalesced(self):
+        """Test that concurrent evaluations of identical code share one evaluation"""
+        evaluator = Evaluator(self.config, self.evaluator_path)
+        calls = []
+
+        async def fake_evaluate(program_code, program_id="", should_continue=None):
+            calls.append(program_id)
+            await asyncio.sleep(0.01)
+            return {"score": len(calls)}
+
+        evaluator._evaluate_program = fake_evaluate
+
+        results = asyncio.run(
+            evaluator.evaluate_multiple([("x = 1", "a"), ("x = 2", "b"), ("x = 1", "c")])
+        )
+
+        self.assertEqual(calls, ["a", "b"])
+        self.assertEqual(results[0], results[2])
+        self.assertEqual(evaluator.coalesced_evaluations, 1)
+
+        # Once finished, identical code is evaluated again (there is no cache)
+        asyncio.run(evaluator.evaluate_program("x = 1", "d"))
+        self.assertEqual(calls, ["a", "b", "d"])
+
+    def test_coalesced_evaluation_records_every_program(self):
+        """Test that the stopped stage and timings of a shared evaluation reach every waiter"""
+        evaluator = Evaluator(self.config, self.evaluator_path)
+        evaluator.record_timings = True
+
+        async def run():
+            return await asyncio.gather(
+                evaluator.evaluate_program("x = 1", "a", lambda *args: False),
+                evaluator.evaluate_program("x = 1", "b", lambda *args: False),
+            )
+
+        self.assertEqual(asyncio.run(run()), [{"stage1": 0.6}] * 2)
+        for program_id in ("a", "b"):
+            self.assertEqual(evaluator.pop_stopped_stage(program_id), 1)
+            self.assertIn("stage1", evaluator.pop_timings(program_id))
+        self.assertEqual(evaluator._stopped_stages, {})
+        self.assertEqual(evaluator._timings, {})
+
+    def test_coalesced_evaluation_stops_only_if_every_caller_agrees(self):
+        """Test that a shared cascade keeps running while any waiting caller wants it to"""
+        evaluator = Evaluator(self.config, self.evaluator_path)
+        asked = []
+
+        def should_continue(program_id, stage, metrics):
+            asked.append(program_id)
+            return program_id == "b"
+
+        async def run():
+            return await asyncio.gather(
+                evaluator.evaluate_program("x = 1", "a", should_continue),
+                evaluator.evaluate_program("x = 1", "b", should_continue),
+            )
+
+        self.assertEqual(asyncio.run(run()), [{"stage1": 0.6, "stage2": 0.8}] * 2)
+        # Each caller's callback is asked about its own program
+        self.assertEqual(asked, ["a", "b"])
+        self.assertEqual(evaluator.cancelled_evaluations, 0)
+        self.assertIsNone(evaluator.pop_stopped_stage("a"))
+
+    def test_coalesced_evaluation_survives_cancelled_caller(self):
+        """Test that a shared evaluation keeps running while any caller still waits for it"""
+        evaluator = Evaluator(self.config, self.evaluator_path)
+
+        async def fake_evaluate(program_code, program_id="", should_continue=None):
+            await asyncio.sleep(0.05)
+            return {"score": 1.0}
+
+        evaluator._evaluate_program = fake_evaluate
+
+        async def run():
+            first = asyncio.create_task(evaluator.evaluate_program("x = 1", "a"))
+            second = asyncio.create_task(evaluator.evaluate_program("x = 1", "b"))
+            await asyncio.sleep(0.01)
+            first.cancel()
+            return await second
+
+        self.assertEqual(asyncio.run(run()), {"score": 1.0})
+
+
+class TestEvaluationCache(unittest.TestCase):
+    """Tests for the persistent evaluation cache"""
+
+    def setUp(self):
+        """Set up test environment"""
+        self.test_dir = tempfile.mkdtemp()
+        self.cache = EvaluationCache(os.path.join(self.test_dir, "cache.sqlite"), max_entries=2)
+
+    def tearDown(self):
+        """Clean up test environment"""
+        self.cache.close()
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def test_evicts_least_recently_used(self):
+        """Test that the least recently used result is evicted once the cache is full"""
+        self.cache.put("a", {"score": 1.0})
+        self.cache.put("b", {"score": 2.0})
+        self.assertEqual(self.cache.get("a"), {"score": 1.0})
+
+        self.cache.put("c", {"score": 3.0})
+
+        self.assertEqual(len(self.cache), 2)
+        self.assertIsNone(self.cache.get("b"))
+        self.assertEqual(self.cache.get("a"), {"score": 1.0})
+        self.assertEqual(self.cache.get("c"), {"score": 3.0})
+
+    def test_hits_are_written_in_batches(self):
+        """Test that hits only update the file once a batch gathers or the cache closes"""
+        path = os.path.join(self.test_dir, "batched.sqlite")
+        cache = EvaluationCache(path, touch_batch_size=2)
+        cache.put("a", {"score": 1.0})
+        cache.put("b", {"score": 2.0})
+
+        def last_used(key):
+            with closing(sqlite3.connect(path)) as conn:
+                query = "SELECT last_used FROM evaluations WHERE key = ?"
+                return conn.execute(query, (key,)).fetchone()[0]
+
+        stored = last_used("a")
+        cache.get("a")
+        self.assertEqual(last_used("a"), stored)
+
+        cache.get("b")
+        self.assertGreater(last_used("a"), stored)
+
+        stored = last_used("a")
+        cache.get("a")
+        cache.close()
+        self.assertGreater(last_used("a"), stored)
+
+
+if __name__ == "__main__":
+    unittest.main()
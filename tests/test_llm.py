@@ -0,0 +1,175 @@
+"""
+Tests for the LLM interfaces
+"""
+
+import asyncio
+import contextvars
+import os
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+# Set dummy API key for testing to prevent OpenAI SDK import failures
+os.environ["OPENAI_API_KEY"] = "test"
+
+from xEvolve.config import LLMConfig
+from xEvolve.llm.ensemble import LLMEnsemble
+from xEvolve.llm.openai import OpenAILLM
+from xEvolve.llm.replay import ReplayLLM
+
+
+class TestOpenAILLM(unittest.TestCase):
+    """Tests for the OpenAI-compatible LLM interface"""
+
+    def setUp(self):
+        self.llm = OpenAILLM(LLMConfig(), model="test-model")
+
+    def test_multiple_completions_use_n(self):
+        """Test that several completions are requested in a single call"""
+        call_api = AsyncMock(return_value=["a", "b", "c"])
+
+        with patch.object(self.llm, "_call_api", call_api):
+            responses = asyncio.run(
+                self.llm.generate_multiple_with_context(
+                    "system", [{"role": "user", "content": "x"}], 3
+                )
+            )
+
+        self.assertEqual(responses, ["a", "b", "c"])
+        self.assertEqual(call_api.call_count, 1)
+        self.assertEqual(call_api.call_args[0][0]["n"], 3)
+
+    def test_multiple_completions_top_up(self):
+        """Test that providers ignoring n are topped up with extra requests"""
+        call_api = AsyncMock(side_effect=[["a"], ["b"], ["c"]])
+
+        with patch.object(self.llm, "_call_api", call_api):
+            responses = asyncio.run(
+                self.llm.generate_multiple_with_context(
+                    "system", [{"role": "user", "content": "x"}], 3
+                )
+            )
+
+        self.assertEqual(responses, ["a", "b", "c"])
+        self.assertEqual([call.args[0].get("n") for call in call_api.call_args_list], [3, 2, None])
+
+    def test_adaptive_concurrency_backs_off_on_timeout(self):
+        """Test that timeouts cut the model's concurrency window"""
+        config = LLMConfig(
+            adaptive_concurrency=True,
+            parallel_requests=8,
+            retries=0,
+            retry_delay=0,
+            primary_model="gpt-4o",
+            secondary_model="gpt-4o",
+        )
+        ensemble = LLMEnsemble(config)
+        llm = ensemble.primary_model
+
+        async def slow_call(params):
+            await asyncio.sleep(1)
+            return ["late"]
+
+        with patch.object(llm, "_call_api", side_effect=slow_call):
+            with self.assertRaises(asyncio.TimeoutError):
+                asyncio.run(llm.generate_with_context("system", [], timeout=0.01))
+
+        self.assertEqual(llm.concurrency_window, 4.0)
+        # Both slots use the same model, each with its own window
+        self.assertEqual(ensemble.concurrency_windows, {"primary": 4.0, "secondary": 8.0})
+
+    def test_client_does_not_retry(self):
+        """Test that rate limit errors are not retried inside the client, hidden from the limiter"""
+        self.assertEqual(self.llm.client.max_retries, 0)
+
+    def test_api_call_keeps_context(self):
+        """Test that the blocking client call sees the caller's context variables"""
+        variable = contextvars.ContextVar("variable", default=None)
+        seen = []
+
+        def create(**params):
+            seen.append(variable.get())
+            return SimpleNamespace(
+                usage=None, choices=[SimpleNamespace(message=SimpleNamespace(content="ok"))]
+            )
+
+        async def call():
+            variable.set("run-1")
+            return await self.llm._call_api({})
+
+        with patch.object(self.llm.client.chat.completions, "create", side_effect=create):
+            self.assertEqual(asyncio.run(call()), ["ok"])
+        self.assertEqual(seen, ["run-1"])
+
+
+class TestRecordReplay(unittest.TestCase):
+    """Tests for recording LLM responses and replaying them offline"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.log_path = os.path.join(self.test_dir, "llm.jsonl")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def _messages(self, content):
+        return [{"role": "user", "content": content}]
+
+    def test_record_then_replay(self):
+        """Test that a replayed ensemble returns the recorded responses without the API"""
+        recording = LLMEnsemble(LLMConfig(record_path=self.log_path))
+        call_api = AsyncMock(side_effect=[["first"], ["second"], ["x", "y"]])
+
+        async def record():
+            with (
+                patch.object(recording.primary_model.model, "_call_api", call_api),
+                patch.object(recording.secondary_model.model, "_call_api", call_api),
+            ):
+                await recording.generate_with_context("system", self._messages("a"))
+                await recording.generate_with_context("system", self._messages("b"))
+                await recording.generate_multiple_with_context("system", self._messages("c"), n=2)
+
+        asyncio.run(record())
+
+        replaying = LLMEnsemble(LLMConfig(replay_path=self.log_path))
+        self.assertIsInstance(replaying.primary_model, ReplayLLM)
+
+        async def replay():
+            # Prompts are matched by hash, not by order
+            return [
+                await replaying.generate_multiple_with_context("system", self._messages("c"), n=2),
+                await replaying.generate_with_context("system", self._messages("b")),
+                await replaying.generate_with_context("system", self._messages("a")),
+            ]
+
+        self.assertEqual(asyncio.run(replay()), [["x", "y"], "second", "first"])
+        self.assertEqual(replaying.primary_model.hits, 3)
+
+    def test_sequence_fallback(self):
+        """Test that unknown prompts get the next unused response in recording order"""
+        with open(self.log_path, "w") as f:
+            for seq, (key, response) in enumerate([("k1", "one"), ("k2", "two")]):
+                f.write(
+                    f'{{"seq": {seq}, "key": "{key}", "model": "m", "latency": 0.0, '
+                    f'"responses": ["{response}"]}}\n'
+                )
+
+        replay = ReplayLLM(self.log_path)
+
+        async def run():
+            return [
+                await replay.generate_with_context("system", self._messages("new"))
+                for _ in range(2)
+            ]
+
+        self.assertEqual(asyncio.run(run()), ["one", "two"])
+        self.assertEqual(replay.misses, 2)
+
+        with self.assertRaises(RuntimeError):
+            asyncio.run(replay.generate_with_context("system", self._messages("new")))
+
+
+if __name__ == "__main__":
+    unittest.main()
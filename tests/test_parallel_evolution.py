@@ -0,0 +1,323 @@
+"""
+Tests for concurrent evolution modes of the controller
+"""
+
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import AsyncMock, patch
+
+# Set dummy API key for testing to prevent OpenAI SDK import failures
+os.environ["OPENAI_API_KEY"] = "test"
+
+from tests.helpers import DIFF_RESPONSE, write_problem
+from xEvolve.config import Config
+from xEvolve.controller import xEvolve
+from xEvolve.database import Program
+
+
+class TestParallelEvolution(unittest.TestCase):
+    """Tests for running several iterations in flight at once"""
+
+    def setUp(self):
+        """Set up test environment"""
+        self.test_dir = tempfile.mkdtemp()
+
+        self.program_path, self.evaluator_path = write_problem(self.test_dir)
+
+        self.config = Config()
+        self.config.checkpoint_interval = 1000
+        self.config.evaluator.cascade_evaluation = False
+
+    def tearDown(self):
+        """Clean up test environment"""
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def _make_controller(self) -> xEvolve:
+        return xEvolve(
+            initial_program_path=self.program_path,
+            evaluation_file=self.evaluator_path,
+            config=self.config,
+            output_dir=self.test_dir,
+        )
+
+    def test_iterations_overlap(self):
+        """Test that LLM calls overlap when several iterations are in flight"""
+        self.config.parallel_iterations = 4
+        self.config.llm.parallel_requests = 4
+        controller = self._make_controller()
+
+        active = 0
+        peak = 0
+
+        async def fake_llm(*args, **kwargs):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.05)
+            active -= 1
+            return DIFF_RESPONSE
+
+        with patch.object(controller.llm_ensemble, "generate_with_context", side_effect=fake_llm):
+            asyncio.run(controller.run(iterations=8))
+
+        self.assertEqual(peak, 4)
+        # Initial program plus one child per iteration
+        self.assertEqual(len(controller.database.programs), 9)
+        self.assertEqual(controller.database.last_iteration, 8)
+
+    def test_llm_concurrency_limit(self):
+        """Test that the LLM pool caps concurrency below the number of iterations in flight"""
+        self.config.parallel_iterations = 6
+        self.config.llm.parallel_requests = 2
+        controller = self._make_controller()
+
+        active = 0
+        peak = 0
+
+        async def fake_call(*args, **kwargs):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.02)
+            active -= 1
+            return DIFF_RESPONSE
+
+        with (
+            patch.object(
+                controller.llm_ensemble.primary_model,
+                "generate_with_context",
+                side_effect=fake_call,
+            ),
+            patch.object(
+                controller.llm_ensemble.secondary_model,
+                "generate_with_context",
+                side_effect=fake_call,
+            ),
+        ):
+            asyncio.run(controller.run(iterations=6))
+
+        self.assertEqual(peak, 2)
+        self.assertEqual(len(controller.database.programs), 7)
+
+    def test_generational_mode(self):
+        """Test that generational mode commits children one generation at a time"""
+        self.config.evolution_mode = "generational"
+        self.config.generation_size = 3
+        controller = self._make_controller()
+
+        batches = []
+        add_many = controller.database.add_many
+
+        def record_add_many(programs, iteration=None):
+            batches.append((len(programs), iteration))
+            return add_many(programs, iteration=iteration)
+
+        with (
+            patch.object(
+                controller.llm_ensemble, "generate_with_context", return_value=DIFF_RESPONSE
+            ),
+            patch.object(controller.database, "add_many", side_effect=record_add_many),
+        ):
+            asyncio.run(controller.run(iterations=7))
+
+        self.assertEqual(batches, [(3, 3), (3, 6), (1, 7)])
+        self.assertEqual(len(controller.database.programs), 8)
+        self.assertEqual(controller.database.last_iteration, 7)
+
+    def test_generational_mode_survives_failed_generation(self):
+        """Test that a generation failing to commit does not end the run"""
+        self.config.evolution_mode = "generational"
+        self.config.generation_size = 3
+        controller = self._make_controller()
+
+        batches = []
+        add_many = controller.database.add_many
+
+        def fail_first_add_many(programs, iteration=None):
+            batches.append(iteration)
+            if len(batches) == 1:
+                raise RuntimeError("disk full")
+            return add_many(programs, iteration=iteration)
+
+        with (
+            patch.object(
+                controller.llm_ensemble, "generate_with_context", return_value=DIFF_RESPONSE
+            ),
+            patch.object(controller.database, "add_many", side_effect=fail_first_add_many),
+        ):
+            asyncio.run(controller.run(iterations=6))
+
+        self.assertEqual(batches, [3, 6])
+        self.assertEqual(len(controller.database.programs), 4)
+
+    def test_children_per_prompt(self):
+        """Test that one prompt fans out into several evaluated children"""
+        self.config.children_per_prompt = 3
+        controller = self._make_controller()
+
+        responses = [DIFF_RESPONSE, DIFF_RESPONSE.replace("return 2", "return 3"), "No changes"]
+        generate = AsyncMock(return_value=responses)
+
+        with patch.object(controller.llm_ensemble, "generate_multiple_with_context", generate):
+            asyncio.run(controller.run(iterations=2))
+
+        self.assertEqual(generate.call_count, 2)
+        self.assertEqual(generate.call_args.kwargs["n"], 3)
+        # Initial program plus two children per prompt; the unusable response is dropped
+        self.assertEqual(len(controller.database.programs), 5)
+        children = [p for p in controller.database.programs.values() if p.parent_id]
+        self.assertEqual({p.iteration_found for p in children}, {1, 2})
+
+    def test_priority_scheduling(self):
+        """Test that children are queued for evaluation with their expected value"""
+        self.config.evaluator.priority_scheduling = True
+        controller = self._make_controller()
+
+        # Applies to whichever program is sampled as the parent
+        broken = DIFF_RESPONSE.replace("    return 1", "def value():").replace(
+            "    return 2", "def value(:"
+        )
+        priorities = []
+        evaluate_program = controller.evaluator.evaluate_program
+
+        async def record_priority(program_code, program_id="", **kwargs):
+            priorities.append(kwargs.get("priority"))
+            return await evaluate_program(program_code, program_id, **kwargs)
+
+        with (
+            patch.object(
+                controller.llm_ensemble,
+                "generate_with_context",
+                side_effect=[DIFF_RESPONSE, broken],
+            ),
+            patch.object(controller.evaluator, "evaluate_program", side_effect=record_priority),
+        ):
+            asyncio.run(controller.run(iterations=2))
+
+        # Initial program, then a child inheriting the parent's fitness, then one that fails
+        # to compile
+        self.assertEqual(priorities, [None, 0.5, float("-inf")])
+
+    def test_dropped_evaluations_leave_no_stopped_stage(self):
+        """Test that children without metrics do not keep their stopped stage around"""
+        controller = self._make_controller()
+        evaluator = controller.evaluator
+
+        async def stop_then_drop(program_code, program_id="", **kwargs):
+            evaluator._stopped_stages[program_id] = 1
+            return None
+
+        parent = Program(id="p", code="x = 0")
+        with patch.object(evaluator, "evaluate_program", side_effect=stop_then_drop):
+            metrics = asyncio.run(controller._evaluate_children([(parent, "c", "x = 1")]))
+
+        self.assertEqual(metrics, [None])
+        self.assertEqual(evaluator._stopped_stages, {})
+
+    def test_background_checkpoints(self):
+        """Test that background checkpoints are complete when run returns"""
+        self.config.checkpoint_interval = 2
+        self.config.incremental_checkpoints = True
+        self.config.async_checkpoints = True
+        controller = self._make_controller()
+        writer = controller.checkpoint_writer
+
+        with patch.object(
+            controller.llm_ensemble, "generate_with_context", return_value=DIFF_RESPONSE
+        ):
+            asyncio.run(controller.run(iterations=4))
+
+        # The writer thread is stopped once the run is over
+        self.assertIsNone(controller.checkpoint_writer)
+        self.assertFalse(writer._thread.is_alive())
+
+        checkpoint_dir = os.path.join(self.test_dir, "checkpoints")
+        self.assertEqual(sorted(os.listdir(checkpoint_dir)), ["checkpoint_2", "checkpoint_4"])
+
+        # The second checkpoint only holds the programs added after the first one
+        latest = os.path.join(checkpoint_dir, "checkpoint_4")
+        self.assertEqual(len(os.listdir(os.path.join(latest, "programs"))), 2)
+        self.assertTrue(os.path.exists(os.path.join(latest, "best_program.py")))
+
+        resumed = self._make_controller()
+        resumed.database.load(latest)
+        self.assertEqual(set(resumed.database.programs), set(controller.database.programs))
+        self.assertEqual(resumed.database.last_iteration, 4)
+
+    def test_segment_log_reopened_after_run(self):
+        """Test that a run releases its segment log db_path for the next controller"""
+        self.config.database.db_path = os.path.join(self.test_dir, "programs.log")
+        controller = self._make_controller()
+
+        with patch.object(
+            controller.llm_ensemble, "generate_with_context", return_value=DIFF_RESPONSE
+        ):
+            asyncio.run(controller.run(iterations=2))
+
+        resumed = self._make_controller()
+        self.assertEqual(set(resumed.database.programs), set(controller.database.programs))
+        resumed.database.close()
+
+    def test_shutdown_saves_pending_candidates(self):
+        """Test that a shutdown saves unevaluated children and a resumed run evaluates them"""
+        slow_evaluator_path = os.path.join(self.test_dir, "slow_evaluator.py")
+        with open(slow_evaluator_path, "w") as f:
+            f.write(
+                "import time\n"
+                "def evaluate(program_path):\n"
+                "    if 'return 2' in open(program_path).read():\n"
+                "        time.sleep(2)\n"
+                "    return {'score': 0.5}\n"
+            )
+
+        self.config.parallel_iterations = 2
+        self.config.shutdown_timeout = 0.1
+        self.config.async_checkpoints = False
+        controller = xEvolve(
+            initial_program_path=self.program_path,
+            evaluation_file=slow_evaluator_path,
+            config=self.config,
+            output_dir=self.test_dir,
+        )
+
+        calls = 0
+
+        async def fake_llm(*args, **kwargs):
+            nonlocal calls
+            calls += 1
+            if calls == 2:
+                # Both iterations have their child, stop before they are evaluated
+                controller.request_shutdown()
+            return DIFF_RESPONSE
+
+        with patch.object(controller.llm_ensemble, "generate_with_context", side_effect=fake_llm):
+            asyncio.run(controller.run(iterations=10))
+
+        self.assertEqual(calls, 2)
+        self.assertEqual(len(controller.database.programs), 1)
+
+        checkpoint = os.path.join(self.test_dir, "checkpoints", "checkpoint_0")
+        with open(os.path.join(checkpoint, "metadata.json")) as f:
+            pending = json.load(f)["pending_candidates"]
+        self.assertEqual(len(pending), 2)
+
+        # The resumed run evaluates the saved children without asking the LLM again
+        resumed = self._make_controller()
+        resumed.database.load(checkpoint)
+        generate = AsyncMock(return_value=DIFF_RESPONSE)
+        with patch.object(resumed.llm_ensemble, "generate_with_context", generate):
+            asyncio.run(resumed.run(iterations=1))
+
+        self.assertEqual(generate.call_count, 1)
+        for candidate in pending:
+            self.assertIn(candidate["id"], resumed.database.programs)
+        # Initial program, the two resumed children and one new child
+        self.assertEqual(len(resumed.database.programs), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
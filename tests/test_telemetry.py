@@ -0,0 +1,138 @@
+"""
+Tests for per-phase iteration telemetry
+"""
+
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# Set dummy API key for testing to prevent OpenAI SDK import failures
+os.environ["OPENAI_API_KEY"] = "test"
+
+from tests.helpers import DIFF_RESPONSE, write_problem
+from xEvolve.config import Config
+from xEvolve.controller import xEvolve
+from xEvolve.telemetry import Telemetry
+
+
+class TestTelemetry(unittest.TestCase):
+    """Tests for the Telemetry recorder"""
+
+    def setUp(self):
+        """Set up test environment"""
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Clean up test environment"""
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def test_records_and_percentiles(self):
+        """Test that phases are summed per iteration and summarized over the window"""
+        path = os.path.join(self.test_dir, "telemetry.jsonl")
+        telemetry = Telemetry(path, window=3)
+
+        for i in range(4):
+            telemetry.add(i, "llm", float(i))
+            telemetry.add(i, "llm", 1.0)
+            telemetry.finish(i, elapsed=float(i) + 1.0, children=1)
+
+        stats = telemetry.report(4)
+
+        # Only the last three iterations are in the window: 2, 3 and 4 seconds
+        self.assertEqual(stats["llm"]["count"], 3)
+        self.assertAlmostEqual(stats["llm"]["p50"], 3.0)
+        self.assertAlmostEqual(stats["llm"]["mean"], 3.0)
+
+        with open(path) as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual([r["type"] for r in records], ["iteration"] * 4 + ["summary"])
+        self.assertEqual(records[0]["iteration"], 1)
+        self.assertEqual(records[3]["phases"], {"llm": 4.0})
+
+    def test_discard(self):
+        """Test that discarded iterations are not recorded"""
+        telemetry = Telemetry()
+        telemetry.add(0, "llm", 1.0)
+        telemetry.discard(0)
+        telemetry.finish(0, elapsed=1.0)
+
+        self.assertNotIn("llm", telemetry.percentiles())
+
+
+class TestControllerTelemetry(unittest.TestCase):
+    """Tests for telemetry emitted by the evolution loop"""
+
+    def setUp(self):
+        """Set up test environment"""
+        self.test_dir = tempfile.mkdtemp()
+
+        self.program_path, self.evaluator_path = write_problem(
+            self.test_dir,
+            evaluator=(
+                "def evaluate_stage1(program_path):\n"
+                "    return {'score': 0.5}\n"
+                "\n"
+                "def evaluate_stage2(program_path):\n"
+                "    return {'score': 0.6}\n"
+                "\n"
+                "def evaluate(program_path):\n"
+                "    return {'score': 0.6}\n"
+            ),
+        )
+
+        self.config = Config()
+        self.config.checkpoint_interval = 2
+        self.config.evaluator.cascade_thresholds = [0.1, 0.1]
+
+    def tearDown(self):
+        """Clean up test environment"""
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def test_iteration_records(self):
+        """Test that each iteration writes one record with its phase timings"""
+        controller = xEvolve(
+            initial_program_path=self.program_path,
+            evaluation_file=self.evaluator_path,
+            config=self.config,
+            output_dir=self.test_dir,
+        )
+
+        with patch.object(
+            controller.llm_ensemble, "generate_with_context", return_value=DIFF_RESPONSE
+        ):
+            asyncio.run(controller.run(iterations=4))
+
+        with open(os.path.join(self.test_dir, "logs", "telemetry.jsonl")) as f:
+            records = [json.loads(line) for line in f]
+
+        iterations = [r for r in records if r["type"] == "iteration"]
+        summaries = [r for r in records if r["type"] == "summary"]
+
+        self.assertEqual([r["iteration"] for r in iterations], [1, 2, 3, 4])
+        self.assertEqual([r["iteration"] for r in summaries], [2, 4])
+        self.assertEqual(
+            set(iterations[0]["phases"]),
+            {
+                "sample",
+                "build_prompt",
+                "llm",
+                "apply_diff",
+                "evaluate",
+                "evaluate_stage1",
+                "evaluate_stage2",
+                "database_add",
+            },
+        )
+        self.assertIn("checkpoint", iterations[1]["phases"])
+        self.assertIn("llm", summaries[-1]["phases"])
+
+        # Timings of evaluated programs are not kept once recorded
+        self.assertEqual(controller.evaluator._timings, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,368 @@
+"""
+Batch runner for evolving many problems in one process
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import sys
+from dataclasses import dataclass, replace
+from typing import Dict, List, Optional
+
+from xEvolve.config import Config, load_config
+from xEvolve.controller import xEvolve
+from xEvolve.database import Program
+from xEvolve.llm.ensemble import LLMEnsemble
+from xEvolve.utils.async_utils import PriorityTaskPool
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BatchProblem:
+    """A single problem of a batch run"""
+
+    name: str
+    initial_program_path: str
+    evaluation_file: str
+    config_path: Optional[str] = None
+    output_dir: Optional[str] = None
+
+
+def discover_problems(
+    problem_dirs: List[str],
+    initial_program_name: str = "initial_program.py",
+    evaluator_name: str = "evaluator.py",
+    config_name: str = "config.yaml",
+) -> List[BatchProblem]:
+    """
+    Build batch problems from problem directories
+
+    A directory is used if it contains both an initial program and an evaluator;
+    its config file is optional.
+
+    Args:
+        problem_dirs: Directories holding one problem each
+        initial_program_name: File name of the initial program
+        evaluator_name: File name of the evaluator
+        config_name: File name of the problem configuration
+
+    Returns:
+        List of problems, in the order of problem_dirs
+    """
+    problems = []
+    for problem_dir in problem_dirs:
+        initial_program_path = os.path.join(problem_dir, initial_program_name)
+        evaluation_file = os.path.join(problem_dir, evaluator_name)
+        config_path = os.path.join(problem_dir, config_name)
+
+        if not os.path.isfile(initial_program_path) or not os.path.isfile(evaluation_file):
+            logger.warning(f"Skipping {problem_dir}: initial program or evaluator not found")
+            continue
+
+        problems.append(
+            BatchProblem(
+                name=os.path.normpath(problem_dir),
+                initial_program_path=initial_program_path,
+                evaluation_file=evaluation_file,
+                config_path=config_path if os.path.isfile(config_path) else None,
+            )
+        )
+    return problems
+
+
+class BatchRunner:
+    """
+    Runs the evolution of many problems concurrently inside one process
+
+    All problems share one LLM ensemble, and with it the OpenAI clients and the
+    limit on concurrent LLM requests, as well as one pool of evaluation slots.
+    The LLM and evaluation settings of the batch config therefore apply to every
+    problem; the remaining settings come from each problem's own config. Since
+    the ensemble is shared, LLM token budgets count the tokens of the whole batch.
+
+    Each problem keeps at most ``per_problem_concurrency`` iterations in flight,
+    and waiters on the shared pools are served in arrival order, so no single
+    problem can take over the shared capacity while others are waiting. For
+    the same reason ``priority_scheduling`` is ignored: parent fitness is on a
+    different scale in every problem.
+
+    A ``log_level`` given to the runner overrides the log level of every problem.
+    """
+
+    def __init__(
+        self,
+        problems: List[BatchProblem],
+        config: Optional[Config] = None,
+        max_concurrent_problems: Optional[int] = None,
+        per_problem_concurrency: Optional[int] = None,
+        log_level: Optional[str] = None,
+    ):
+        self.problems = problems
+        self.config = config or Config()
+        self.log_level = log_level
+
+        self.max_concurrent_problems = max_concurrent_problems or len(problems) or 1
+        self.per_problem_concurrency = per_problem_concurrency or self.config.parallel_iterations
+
+        # Shared by every problem of the batch
+        self.llm_ensemble = LLMEnsemble(self.config.llm)
+        self.evaluation_pool = PriorityTaskPool(
+            max_concurrency=self.config.evaluator.parallel_evaluations
+        )
+
+        # Controllers of the problems currently running
+        self.controllers: Dict[str, xEvolve] = {}
+        self._shutdown_requested = False
+
+        if self.config.evaluator.priority_scheduling:
+            logger.warning(
+                "Ignoring priority_scheduling: the shared evaluation pool serves problems "
+                "in arrival order"
+            )
+
+        logger.info(
+            f"Initialized batch runner with {len(problems)} problems "
+            f"({self.max_concurrent_problems} at a time, "
+            f"{self.per_problem_concurrency} iterations in flight per problem)"
+        )
+
+    async def run(
+        self,
+        iterations: Optional[int] = None,
+        target_score: Optional[float] = None,
+    ) -> Dict[str, Optional[Program]]:
+        """
+        Run the evolution of every problem
+
+        A problem that fails is logged and does not stop the rest of the batch.
+
+        Args:
+            iterations: Maximum number of iterations per problem (uses config if None)
+            target_score: Target score to reach for each problem
+
+        Returns:
+            Dictionary of problem name to best program, or None if the problem failed
+        """
+        slots = asyncio.Semaphore(self.max_concurrent_problems)
+        self._shutdown_requested = False
+
+        async def run_problem(problem: BatchProblem) -> Optional[Program]:
+            async with slots:
+                if self._shutdown_requested:
+                    logger.info(f"Skipping problem {problem.name} after shutdown request")
+                    return None
+                return await self._run_problem(problem, iterations, target_score)
+
+        installed = self._install_signal_handlers()
+        try:
+            results = await asyncio.gather(*(run_problem(problem) for problem in self.problems))
+        finally:
+            self._remove_signal_handlers(installed)
+
+        completed = sum(1 for result in results if result is not None)
+        logger.info(f"Batch complete: {completed}/{len(self.problems)} problems succeeded")
+
+        return {problem.name: result for problem, result in zip(self.problems, results)}
+
+    def request_shutdown(self) -> None:
+        """Shut down every running problem gracefully and start no new ones"""
+        self._shutdown_requested = True
+        for controller in self.controllers.values():
+            controller.request_shutdown()
+
+    def _install_signal_handlers(self) -> List[int]:
+        """Call request_shutdown() on SIGINT and SIGTERM, returning the handled signals"""
+        loop = asyncio.get_running_loop()
+        installed = []
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self._handle_signal, installed)
+                installed.append(sig)
+            except (NotImplementedError, RuntimeError, ValueError):
+                logger.debug(f"Could not install a handler for signal {sig}")
+        return installed
+
+    def _handle_signal(self, installed: List[int]) -> None:
+        """Shut down on the first signal, so that a second one aborts the process"""
+        self._remove_signal_handlers(installed)
+        self.request_shutdown()
+
+    @staticmethod
+    def _remove_signal_handlers(installed: List[int]) -> None:
+        loop = asyncio.get_running_loop()
+        for sig in installed:
+            loop.remove_signal_handler(sig)
+        installed.clear()
+
+    def _create_controller(self, problem: BatchProblem) -> xEvolve:
+        """Create the controller for a problem, wired to the shared pools"""
+        config = load_config(problem.config_path) if problem.config_path else Config()
+        config.llm = self.config.llm
+        config.evaluator = replace(self.config.evaluator, priority_scheduling=False)
+        config.parallel_iterations = self.per_problem_concurrency
+        if self.log_level:
+            config.log_level = self.log_level
+        # The batch handles signals for all of its problems
+        config.handle_signals = False
+
+        return xEvolve(
+            initial_program_path=problem.initial_program_path,
+            evaluation_file=problem.evaluation_file,
+            config=config,
+            output_dir=problem.output_dir,
+            llm_ensemble=self.llm_ensemble,
+            evaluation_pool=self.evaluation_pool,
+        )
+
+    async def _run_problem(
+        self,
+        problem: BatchProblem,
+        iterations: Optional[int],
+        target_score: Optional[float],
+    ) -> Optional[Program]:
+        """Run the evolution of a single problem"""
+        logger.info(f"Starting problem {problem.name}")
+
+        try:
+            controller = self._create_controller(problem)
+        except Exception as e:
+            logger.error(f"Failed to set up problem {problem.name}: {str(e)}")
+            return None
+
+        self.controllers[problem.name] = controller
+
+        try:
+            best_program = await controller.run(iterations=iterations, target_score=target_score)
+            logger.info(f"Finished problem {problem.name}")
+            return best_program
+        except Exception as e:
+            logger.error(f"Problem {problem.name} failed: {str(e)}")
+            return None
+        finally:
+            del self.controllers[problem.name]
+            await controller.evaluator.close()
+            controller.database.close()
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command-line arguments"""
+    parser = argparse.ArgumentParser(
+        description="xEvolve batch runner - evolve many problems in one process"
+    )
+
+    parser.add_argument(
+        "problem_dirs",
+        nargs="+",
+        help="Problem directories, each with an initial program, an evaluator and a config",
+    )
+
+    parser.add_argument(
+        "--config",
+        "-c",
+        help="Configuration file (YAML) for the shared LLM and evaluation pools",
+        default=None,
+    )
+
+    parser.add_argument(
+        "--iterations",
+        "-i",
+        help="Maximum number of iterations per problem",
+        type=int,
+        default=None,
+    )
+
+    parser.add_argument(
+        "--target-score", "-t", help="Target score to reach", type=float, default=None
+    )
+
+    parser.add_argument(
+        "--max-concurrent-problems",
+        help="Number of problems evolved at the same time (default: all)",
+        type=int,
+        default=None,
+    )
+
+    parser.add_argument(
+        "--per-problem-concurrency",
+        help="Iterations kept in flight per problem (default: parallel_iterations from config)",
+        type=int,
+        default=None,
+    )
+
+    parser.add_argument("--initial-program-name", default="initial_program.py")
+
+    parser.add_argument("--evaluator-name", default="evaluator.py")
+
+    parser.add_argument("--config-name", default="config.yaml")
+
+    parser.add_argument(
+        "--log-level",
+        "-l",
+        help="Logging level of every problem (default: log_level of each config)",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"],
+        default=None,
+    )
+
+    return parser.parse_args()
+
+
+async def main_async() -> int:
+    """
+    Main asynchronous entry point
+
+    Returns:
+        Exit code
+    """
+    args = parse_args()
+
+    problems = discover_problems(
+        args.problem_dirs,
+        initial_program_name=args.initial_program_name,
+        evaluator_name=args.evaluator_name,
+        config_name=args.config_name,
+    )
+    if not problems:
+        print("Error: No problems found")
+        return 1
+
+    # Without a batch config, the pools are sized from the first problem's config
+    config_path = args.config or problems[0].config_path
+    config = load_config(config_path)
+
+    runner = BatchRunner(
+        problems,
+        config=config,
+        max_concurrent_problems=args.max_concurrent_problems,
+        per_problem_concurrency=args.per_problem_concurrency,
+        log_level=args.log_level,
+    )
+    results = await runner.run(iterations=args.iterations, target_score=args.target_score)
+
+    print(f"\nBatch complete!")
+    for name, best_program in results.items():
+        if best_program is None:
+            print(f"  {name}: failed")
+        else:
+            metrics = ", ".join(
+                f"{metric}={value:.4f}" for metric, value in best_program.metrics.items()
+            )
+            print(f"  {name}: {metrics}")
+
+    return 0 if all(result is not None for result in results.values()) else 1
+
+
+def main() -> int:
+    """
+    Main entry point
+
+    Returns:
+        Exit code
+    """
+    return asyncio.run(main_async())
+
+
+if __name__ == "__main__":
+    sys.exit(main())
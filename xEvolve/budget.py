@@ -0,0 +1,177 @@
+"""
+Run budget tracking and pacing for xEvolve
+"""
+
+import logging
+import time
+from typing import Optional
+
+from xEvolve.config import BudgetConfig
+
+logger = logging.getLogger(__name__)
+
+
+class RunBudget:
+    """
+    Tracks the resources a run has spent and decides when to start new work
+
+    Three budgets are tracked: wall-clock time, LLM tokens and evaluation
+    seconds (time spent inside the evaluator, summed over concurrent
+    evaluations). New iterations are only started while the projected cost of
+    everything in flight still fits the remaining budget, so a run stops close
+    to its budget without starting work it cannot finish.
+
+    The budget also paces the evolution loop: while children are queueing for
+    evaluator slots, generating more children only grows the queue, so new
+    iterations are held back until the evaluators catch up.
+    """
+
+    def __init__(self, config: BudgetConfig):
+        self.config = config
+
+        self.start_time: Optional[float] = None
+        self.llm_tokens = 0
+        self.evaluation_seconds = 0.0
+        self.completed_iterations = 0
+
+        self._iteration_seconds = 0.0
+        self.stop_reason: Optional[str] = None
+
+    def start(self) -> None:
+        """Start the wall clock"""
+        self.start_time = time.time()
+
+    @property
+    def elapsed(self) -> float:
+        """Wall-clock seconds since the run started"""
+        if self.start_time is None:
+            return 0.0
+        return time.time() - self.start_time
+
+    def update(self, llm_tokens: int, evaluation_seconds: float) -> None:
+        """
+        Update the resources spent so far
+
+        Args:
+            llm_tokens: Total LLM tokens used by the run
+            evaluation_seconds: Total seconds spent evaluating programs
+        """
+        self.llm_tokens = llm_tokens
+        self.evaluation_seconds = evaluation_seconds
+
+    def record_iteration(self, iteration_seconds: float) -> None:
+        """
+        Record a completed iteration
+
+        Args:
+            iteration_seconds: Wall-clock duration of the iteration
+        """
+        self.completed_iterations += 1
+        self._iteration_seconds += iteration_seconds
+
+    def exhausted(self) -> bool:
+        """Check whether any budget has been used up"""
+        reason = None
+        if self.config.max_wall_time is not None and self.elapsed >= self.config.max_wall_time:
+            reason = "wall-clock budget"
+        elif (
+            self.config.max_llm_tokens is not None and self.llm_tokens >= self.config.max_llm_tokens
+        ):
+            reason = "LLM token budget"
+        elif (
+            self.config.max_evaluation_seconds is not None
+            and self.evaluation_seconds >= self.config.max_evaluation_seconds
+        ):
+            reason = "evaluation budget"
+
+        if reason is not None and self.stop_reason is None:
+            self.stop_reason = reason
+            logger.info(f"Run budget exhausted: {reason} ({self.summary()})")
+
+        return reason is not None
+
+    def remaining_wall_time(self) -> Optional[float]:
+        """Seconds left in the wall-clock budget, or None if there is no limit"""
+        if self.config.max_wall_time is None:
+            return None
+        return max(0.0, self.config.max_wall_time - self.elapsed)
+
+    def remaining_fraction(self) -> float:
+        """Fraction of the most used budget that is still available (1.0 without limits)"""
+        fractions = [1.0]
+        if self.config.max_wall_time:
+            fractions.append(1.0 - self.elapsed / self.config.max_wall_time)
+        if self.config.max_llm_tokens:
+            fractions.append(1.0 - self.llm_tokens / self.config.max_llm_tokens)
+        if self.config.max_evaluation_seconds:
+            fractions.append(1.0 - self.evaluation_seconds / self.config.max_evaluation_seconds)
+        return max(0.0, min(fractions))
+
+    def can_launch(self, in_flight: int) -> bool:
+        """
+        Check whether another iteration fits in the remaining budget
+
+        Before the first iteration completes there is no cost estimate, so
+        iterations are started as long as no budget is exhausted.
+
+        Args:
+            in_flight: Number of iterations already running
+
+        Returns:
+            True if a new iteration can be started
+        """
+        if self.exhausted():
+            return False
+
+        if self.completed_iterations == 0:
+            return True
+
+        # Project the cost of everything in flight plus one more iteration
+        pending = in_flight + 1
+        if self.config.max_llm_tokens is not None:
+            tokens_per_iteration = self.llm_tokens / self.completed_iterations
+            if self.llm_tokens + pending * tokens_per_iteration > self.config.max_llm_tokens:
+                return False
+
+        if self.config.max_evaluation_seconds is not None:
+            seconds_per_iteration = self.evaluation_seconds / self.completed_iterations
+            if (
+                self.evaluation_seconds + pending * seconds_per_iteration
+                > self.config.max_evaluation_seconds
+            ):
+                return False
+
+        if self.config.max_wall_time is not None:
+            iteration_seconds = self._iteration_seconds / self.completed_iterations
+            if self.elapsed + iteration_seconds > self.config.max_wall_time:
+                return False
+
+        return True
+
+    def should_throttle_generation(self, awaiting_evaluation: int, evaluation_slots: int) -> bool:
+        """
+        Check whether generation is outpacing evaluation
+
+        Pacing only goes this way. Evaluation only runs on children that
+        generation has produced, so when generation is the bottleneck the
+        evaluation slots sit idle without spending any budget, and holding
+        evaluation back would not free anything for generation.
+
+        Args:
+            awaiting_evaluation: Children waiting for or in evaluation
+            evaluation_slots: Number of evaluations that can run at once
+
+        Returns:
+            True if no new iterations should be started for now
+        """
+        if not self.config.pace_generation:
+            return False
+        return awaiting_evaluation > evaluation_slots
+
+    def summary(self) -> str:
+        """Human-readable summary of the resources spent"""
+        return (
+            f"{self.elapsed:.1f}s wall-clock, {self.llm_tokens} LLM tokens, "
+            f"{self.evaluation_seconds:.1f}s evaluation, "
+            f"{self.completed_iterations} iterations"
+        )
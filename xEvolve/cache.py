@@ -0,0 +1,159 @@
+"""
+Persistent evaluation cache for xEvolve
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def evaluation_key(program_code: str, evaluator_hash: str, seed: Optional[int] = None) -> str:
+    """
+    Build the cache key of an evaluation
+
+    Args:
+        program_code: Code of the evaluated program
+        evaluator_hash: Hash of the evaluation file contents
+        seed: Random seed of the run, if any
+
+    Returns:
+        Hex digest identifying the evaluation
+    """
+    code_hash = hashlib.sha256(program_code.encode("utf-8")).hexdigest()
+    return hashlib.sha256(f"{code_hash}:{evaluator_hash}:{seed}".encode("utf-8")).hexdigest()
+
+
+def file_hash(path: str) -> str:
+    """Hash the contents of a file"""
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+class EvaluationCache:
+    """
+    Content-addressed store of evaluation results in a SQLite file
+
+    Results are keyed by the hash of the program code, the hash of the
+    evaluation file and the random seed, so a program the LLM regenerates, or
+    a diff that left its parent unchanged, is not evaluated again. The file can
+    be shared by later runs and resumed runs of the same problem, since a
+    changed evaluator produces different keys.
+
+    The cache holds at most ``max_entries`` results; once full, the least
+    recently used results are evicted. Lookups run on the event loop, so hits
+    only note when a result was used; the notes are written in one transaction
+    once ``touch_batch_size`` have gathered, before evicting, and on close.
+    """
+
+    def __init__(self, path: str, max_entries: int = 100000, touch_batch_size: int = 256):
+        self.path = path
+        self.max_entries = max_entries
+        self.touch_batch_size = touch_batch_size
+
+        self.hits = 0
+        self.misses = 0
+
+        # Last use of results hit since the last write, by key
+        self._touched: Dict[str, float] = {}
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS evaluations ("
+            "key TEXT PRIMARY KEY, metrics TEXT NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS evaluations_last_used ON evaluations (last_used)"
+        )
+        self._size = self._conn.execute("SELECT COUNT(*) FROM evaluations").fetchone()[0]
+
+        logger.info(f"Opened evaluation cache {path} with {self._size} results")
+
+    def __len__(self) -> int:
+        return self._size
+
+    def get(self, key: str) -> Optional[Dict[str, float]]:
+        """
+        Look up the metrics of an evaluation, marking them as recently used
+
+        Args:
+            key: Key from evaluation_key
+
+        Returns:
+            Stored metrics, or None if the evaluation is not cached
+        """
+        row = self._conn.execute("SELECT metrics FROM evaluations WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+
+        self._touched[key] = time.time()
+        if len(self._touched) >= self.touch_batch_size:
+            self.flush()
+        self.hits += 1
+        return json.loads(row[0])
+
+    def flush(self) -> None:
+        """Write the last use of the results hit since the previous write"""
+        if not self._touched:
+            return
+        touched, self._touched = self._touched, {}
+        self._conn.execute("BEGIN")
+        try:
+            self._conn.executemany(
+                "UPDATE evaluations SET last_used = ? WHERE key = ?",
+                [(last_used, key) for key, last_used in touched.items()],
+            )
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def put(self, key: str, metrics: Dict[str, float]) -> None:
+        """
+        Store the metrics of an evaluation, evicting the least recently used if full
+
+        Args:
+            key: Key from evaluation_key
+            metrics: Metrics to store
+        """
+        cursor = self._conn.execute(
+            "INSERT OR IGNORE INTO evaluations (key, metrics, last_used) VALUES (?, ?, ?)",
+            (key, json.dumps(metrics), time.time()),
+        )
+        if cursor.rowcount == 0:
+            return
+
+        self._size += 1
+        if self._size > self.max_entries:
+            # Evict by up-to-date last use
+            self.flush()
+            excess = self._size - self.max_entries
+            self._conn.execute(
+                "DELETE FROM evaluations WHERE key IN "
+                "(SELECT key FROM evaluations ORDER BY last_used LIMIT ?)",
+                (excess,),
+            )
+            self._size -= excess
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups answered from the cache"""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def close(self) -> None:
+        """Write pending last uses and close the cache file"""
+        try:
+            self.flush()
+        finally:
+            self._conn.close()
@@ -57,6 +57,16 @@ def parse_args() -> argparse.Namespace:
 
     parser.add_argument("--secondary-model", help="Secondary LLM model name", default=None)
 
+    parser.add_argument(
+        "--record-llm", help="Record all LLM responses to this JSONL log", default=None
+    )
+
+    parser.add_argument(
+        "--replay-llm",
+        help="Replay LLM responses from a recorded JSONL log instead of calling the API",
+        default=None,
+    )
+
     return parser.parse_args()
 
 
@@ -80,7 +90,13 @@ async def main_async() -> int:
 
     # Create config object with command-line overrides
     config = None
-    if args.api_base or args.primary_model or args.secondary_model:
+    if (
+        args.api_base
+        or args.primary_model
+        or args.secondary_model
+        or args.record_llm
+        or args.replay_llm
+    ):
         # Load base config from file or defaults
         config = load_config(args.config)
 
@@ -97,6 +113,14 @@ async def main_async() -> int:
             config.llm.secondary_model = args.secondary_model
             print(f"Using secondary model: {config.llm.secondary_model}")
 
+        if args.record_llm:
+            config.llm.record_path = args.record_llm
+            print(f"Recording LLM responses to: {config.llm.record_path}")
+
+        if args.replay_llm:
+            config.llm.replay_path = args.replay_llm
+            print(f"Replaying LLM responses from: {config.llm.replay_path}")
+
     # Initialize OpenEvolve
     try:
         openevolve = xEvolve(
@@ -123,10 +147,13 @@ async def main_async() -> int:
             logging.getLogger().setLevel(getattr(logging, args.log_level))
 
         # Run evolution
-        best_program = await openevolve.run(
-            iterations=args.iterations,
-            target_score=args.target_score,
-        )
+        try:
+            best_program = await openevolve.run(
+                iterations=args.iterations,
+                target_score=args.target_score,
+            )
+        finally:
+            await openevolve.evaluator.close()
 
         # Get the checkpoint path
         checkpoint_dir = os.path.join(openevolve.output_dir, "checkpoints")
@@ -2,6 +2,7 @@
 Configuration handling for OpenEvolve
 """
 
+import logging
 import os
 from dataclasses import dataclass, field
 from pathlib import Path
@@ -9,6 +10,8 @@ from typing import Any, Dict, List, Optional, Union
 
 import yaml
 
+logger = logging.getLogger(__name__)
+
 
 @dataclass
 class LLMConfig:
@@ -36,6 +39,19 @@ class LLMConfig:
     retries: int = 3
     retry_delay: int = 5
 
+    # Maximum number of concurrent in-flight requests
+    parallel_requests: int = 4
+
+    # Adapt concurrency per model: grow the window while latency is stable and halve it on
+    # rate limits or timeouts, starting at parallel_requests and capped at max_parallel_requests
+    adaptive_concurrency: bool = False
+    max_parallel_requests: int = 32
+
+    # Record responses to a JSONL log, or replay them from one instead of calling the API
+    record_path: Optional[str] = None
+    replay_path: Optional[str] = None
+    replay_latency: bool = False  # Wait as long as the recorded request took
+
 
 @dataclass
 class PromptConfig:
@@ -63,10 +79,25 @@ class DatabaseConfig:
 
     # General settings
     db_path: Optional[str] = None  # Path to store database on disk
+    # With in_memory disabled, checkpoints load without program code, which is read on
+    # first access and kept in a cache of code_cache_size programs
     in_memory: bool = True
+    code_cache_size: int = 1000
+    # Keep program code compressed, as deltas against the parent's code with a full copy
+    # at least every code_snapshot_interval generations; decompressed code shares the cache.
+    # Compression runs as programs are added, so it trades event loop time for memory.
+    # It only applies in memory: checkpoints and db_path stores keep every program's full code
+    compress_code: bool = False
+    code_snapshot_interval: int = 8
+    # Segment log backend (db_path ending in .log): segment file size and fsync batching
+    log_segment_size: int = 16 * 1024 * 1024
+    log_fsync_interval: float = 1.0
 
     # Evolutionary parameters
     population_size: int = 1000
+    # Programs evicted once population_size is exceeded: "worst" (lowest fitness),
+    # "oldest" or "crowding" (weakest program of the most crowded MAP-Elites cell)
+    eviction_policy: str = "worst"
     archive_size: int = 100
     num_islands: int = 5
 
@@ -80,6 +111,14 @@ class DatabaseConfig:
     feature_dimensions: List[str] = field(default_factory=lambda: ["score", "complexity"])
     feature_bins: int = 10
 
+    def __post_init__(self) -> None:
+        if self.population_size <= self.archive_size:
+            logger.warning(
+                f"population_size ({self.population_size}) does not exceed archive_size "
+                f"({self.archive_size}): archived programs are never evicted, so the "
+                f"population can grow past population_size"
+            )
+
 
 @dataclass
 class EvaluatorConfig:
@@ -96,15 +135,49 @@ class EvaluatorConfig:
     # Evaluation strategies
     cascade_evaluation: bool = True
     cascade_thresholds: List[float] = field(default_factory=lambda: [0.5, 0.75, 0.9])
+    # Skip the remaining cascade stages of candidates that can no longer beat
+    # the worst archived program or their parent
+    cancel_dominated: bool = False
 
     # Parallel evaluation
     parallel_evaluations: int = 4
     distributed: bool = False
+    # Start waiting evaluations of likely winners first (parent fitness, code that compiles)
+    priority_scheduling: bool = False
+
+    # Distributed evaluation (used when distributed is True)
+    coordinator_host: str = "127.0.0.1"  # Use "0.0.0.0" to accept workers on other hosts
+    coordinator_port: int = 0  # 0 picks a free port
+    num_local_workers: int = 0  # Worker processes to spawn on this host
+    # Shared secret workers must present; set it whenever other hosts can reach the coordinator
+    coordinator_token: Optional[str] = None
 
     # LLM-based feedback
     use_llm_feedback: bool = False
     llm_feedback_weight: float = 0.1
 
+    # Reuse the metrics of programs evaluated before, across runs and resumes
+    cache_evaluations: bool = False
+    cache_path: Optional[str] = None  # Defaults to output_dir/evaluation_cache.sqlite
+    cache_max_entries: int = 100000  # Least recently used results are evicted beyond this
+
+
+@dataclass
+class BudgetConfig:
+    """Configuration for run budgets (None = unlimited)"""
+
+    max_wall_time: Optional[float] = None  # Wall-clock seconds
+    max_llm_tokens: Optional[int] = None  # Prompt plus completion tokens
+    max_evaluation_seconds: Optional[float] = None  # Seconds spent inside the evaluator
+
+    # Hold back new iterations while children queue up for evaluation. Evaluation needs no
+    # pacing the other way: it only runs on generated children, and idle slots cost nothing
+    pace_generation: bool = True
+
+    # Once less than this fraction of the budget is left, drop queued evaluations that
+    # cannot start right away, lowest priority first (0 = never drop)
+    drop_pending_below: float = 0.0
+
 
 @dataclass
 class Config:
@@ -113,15 +186,37 @@ class Config:
     # General settings
     max_iterations: int = 10000
     checkpoint_interval: int = 100
+    incremental_checkpoints: bool = False  # Only write programs added since the last checkpoint
+    async_checkpoints: bool = False  # Write checkpoints on a background thread
     log_level: str = "INFO"
     log_dir: Optional[str] = None
     random_seed: Optional[int] = None
 
+    # Evolution mode: "steady_state" merges children as they complete,
+    # "generational" commits children in batches of generation_size
+    evolution_mode: str = "steady_state"
+    generation_size: int = 8
+
+    # Number of iterations kept in flight concurrently (1 = sequential)
+    parallel_iterations: int = 1
+
+    # Number of LLM completions (and children) requested per prompt
+    children_per_prompt: int = 1
+
+    # Per-phase iteration timings, written as JSONL to log_dir/telemetry.jsonl
+    telemetry: bool = True
+    telemetry_window: int = 1000  # Recent iterations used for rolling percentiles
+
+    # Graceful shutdown on SIGINT/SIGTERM: seconds in-flight work may take to finish
+    handle_signals: bool = True
+    shutdown_timeout: float = 60.0
+
     # Component configurations
     llm: LLMConfig = field(default_factory=LLMConfig)
     prompt: PromptConfig = field(default_factory=PromptConfig)
     database: DatabaseConfig = field(default_factory=DatabaseConfig)
     evaluator: EvaluatorConfig = field(default_factory=EvaluatorConfig)
+    budget: BudgetConfig = field(default_factory=BudgetConfig)
 
     # Evolution settings
     diff_based_evolution: bool = True
@@ -143,7 +238,9 @@ class Config:
 
         # Update top-level fields
         for key, value in config_dict.items():
-            if key not in ["llm", "prompt", "database", "evaluator"] and hasattr(config, key):
+            if key not in ["llm", "prompt", "database", "evaluator", "budget"] and hasattr(
+                config, key
+            ):
                 setattr(config, key, value)
 
         # Update nested configs
@@ -155,6 +252,8 @@ class Config:
             config.database = DatabaseConfig(**config_dict["database"])
         if "evaluator" in config_dict:
             config.evaluator = EvaluatorConfig(**config_dict["evaluator"])
+        if "budget" in config_dict:
+            config.budget = BudgetConfig(**config_dict["budget"])
 
         return config
 
@@ -164,9 +263,19 @@ class Config:
             # General settings
             "max_iterations": self.max_iterations,
             "checkpoint_interval": self.checkpoint_interval,
+            "incremental_checkpoints": self.incremental_checkpoints,
+            "async_checkpoints": self.async_checkpoints,
             "log_level": self.log_level,
             "log_dir": self.log_dir,
             "random_seed": self.random_seed,
+            "evolution_mode": self.evolution_mode,
+            "generation_size": self.generation_size,
+            "parallel_iterations": self.parallel_iterations,
+            "children_per_prompt": self.children_per_prompt,
+            "telemetry": self.telemetry,
+            "telemetry_window": self.telemetry_window,
+            "handle_signals": self.handle_signals,
+            "shutdown_timeout": self.shutdown_timeout,
             # Component configurations
             "llm": {
                 "primary_model": self.llm.primary_model,
@@ -180,6 +289,12 @@ class Config:
                 "timeout": self.llm.timeout,
                 "retries": self.llm.retries,
                 "retry_delay": self.llm.retry_delay,
+                "parallel_requests": self.llm.parallel_requests,
+                "adaptive_concurrency": self.llm.adaptive_concurrency,
+                "max_parallel_requests": self.llm.max_parallel_requests,
+                "record_path": self.llm.record_path,
+                "replay_path": self.llm.replay_path,
+                "replay_latency": self.llm.replay_latency,
             },
             "prompt": {
                 "template_dir": self.prompt.template_dir,
@@ -194,7 +309,13 @@ class Config:
             "database": {
                 "db_path": self.database.db_path,
                 "in_memory": self.database.in_memory,
+                "code_cache_size": self.database.code_cache_size,
+                "compress_code": self.database.compress_code,
+                "code_snapshot_interval": self.database.code_snapshot_interval,
+                "log_segment_size": self.database.log_segment_size,
+                "log_fsync_interval": self.database.log_fsync_interval,
                 "population_size": self.database.population_size,
+                "eviction_policy": self.database.eviction_policy,
                 "archive_size": self.database.archive_size,
                 "num_islands": self.database.num_islands,
                 "elite_selection_ratio": self.database.elite_selection_ratio,
@@ -211,10 +332,26 @@ class Config:
                 "cpu_limit": self.evaluator.cpu_limit,
                 "cascade_evaluation": self.evaluator.cascade_evaluation,
                 "cascade_thresholds": self.evaluator.cascade_thresholds,
+                "cancel_dominated": self.evaluator.cancel_dominated,
                 "parallel_evaluations": self.evaluator.parallel_evaluations,
+                "priority_scheduling": self.evaluator.priority_scheduling,
                 "distributed": self.evaluator.distributed,
+                "coordinator_host": self.evaluator.coordinator_host,
+                "coordinator_port": self.evaluator.coordinator_port,
+                "num_local_workers": self.evaluator.num_local_workers,
+                "coordinator_token": self.evaluator.coordinator_token,
                 "use_llm_feedback": self.evaluator.use_llm_feedback,
                 "llm_feedback_weight": self.evaluator.llm_feedback_weight,
+                "cache_evaluations": self.evaluator.cache_evaluations,
+                "cache_path": self.evaluator.cache_path,
+                "cache_max_entries": self.evaluator.cache_max_entries,
+            },
+            "budget": {
+                "max_wall_time": self.budget.max_wall_time,
+                "max_llm_tokens": self.budget.max_llm_tokens,
+                "max_evaluation_seconds": self.budget.max_evaluation_seconds,
+                "pace_generation": self.budget.pace_generation,
+                "drop_pending_below": self.budget.drop_pending_below,
             },
             # Evolution settings
             "diff_based_evolution": self.diff_based_evolution,
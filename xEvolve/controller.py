@@ -3,19 +3,26 @@ Main controller for OpenEvolve
 """
 
 import asyncio
+import contextvars
+import itertools
 import logging
 import os
 import re
+import signal
 import time
 import uuid
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple, Union
 
+from xEvolve.budget import RunBudget
+from xEvolve.cache import EvaluationCache
 from xEvolve.config import Config, load_config
-from xEvolve.database import Program, ProgramDatabase
+from xEvolve.database import Program, ProgramDatabase, calculate_fitness
 from xEvolve.evaluator import Evaluator
 from xEvolve.llm.ensemble import LLMEnsemble
 from xEvolve.prompt.sampler import PromptSampler
+from xEvolve.telemetry import Telemetry
+from xEvolve.utils.async_utils import BackgroundWriter, PriorityTaskPool
 from xEvolve.utils.code_utils import (
     apply_diff,
     extract_code_language,
@@ -27,6 +34,24 @@ from xEvolve.utils.code_utils import (
 
 logger = logging.getLogger(__name__)
 
+# Run that log records emitted in the current task belong to, for routing them to its log file
+_current_run: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar(
+    "current_run", default=None
+)
+_run_ids = itertools.count()
+
+
+class _RunLogFilter(logging.Filter):
+    """Passes the records of one run, and records emitted outside of any run"""
+
+    def __init__(self, run_id: int):
+        super().__init__()
+        self.run_id = run_id
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        run_id = _current_run.get()
+        return run_id is None or run_id == self.run_id
+
 
 class xEvolve:
     """
@@ -49,6 +74,8 @@ class xEvolve:
         config_path: Optional[str] = None,
         config: Optional[Config] = None,
         output_dir: Optional[str] = None,
+        llm_ensemble: Optional[LLMEnsemble] = None,
+        evaluation_pool: Optional[PriorityTaskPool] = None,
     ):
         # Load configuration
         if config is not None:
@@ -65,6 +92,8 @@ class xEvolve:
         os.makedirs(self.output_dir, exist_ok=True)
 
         # Set up logging
+        self._run_id = next(_run_ids)
+        self._log_handler: Optional[logging.Handler] = None
         self._setup_logging()
 
         # Load initial program
@@ -83,15 +112,66 @@ class xEvolve:
                 self.file_extension = f".{self.file_extension}"
 
         # Initialize components
-        self.llm_ensemble = LLMEnsemble(self.config.llm)
+        # A shared ensemble and evaluation pool are passed in when several runs share a process
+        self.llm_ensemble = llm_ensemble or LLMEnsemble(self.config.llm)
         self.prompt_sampler = PromptSampler(self.config.prompt)
         self.database = ProgramDatabase(self.config.database)
-        self.evaluator = Evaluator(self.config.evaluator, evaluation_file, self.llm_ensemble)
+
+        # Reuse results of programs evaluated before, in this run or earlier ones
+        evaluation_cache = None
+        if self.config.evaluator.cache_evaluations:
+            cache_path = self.config.evaluator.cache_path or os.path.join(
+                self.output_dir, "evaluation_cache.sqlite"
+            )
+            evaluation_cache = EvaluationCache(
+                cache_path, max_entries=self.config.evaluator.cache_max_entries
+            )
+
+        self.evaluator = Evaluator(
+            self.config.evaluator,
+            evaluation_file,
+            self.llm_ensemble,
+            task_pool=evaluation_pool,
+            cache=evaluation_cache,
+            random_seed=self.config.random_seed,
+        )
+
+        # Record how long each phase of an iteration takes
+        telemetry_path = None
+        if self.config.telemetry:
+            log_dir = self.config.log_dir or os.path.join(self.output_dir, "logs")
+            telemetry_path = os.path.join(log_dir, "telemetry.jsonl")
+        self.telemetry = Telemetry(telemetry_path, window=self.config.telemetry_window)
+        self.evaluator.record_timings = self.config.telemetry
+
+        # Track resources spent against the run budget
+        self.budget = RunBudget(self.config.budget)
+        self._awaiting_evaluation = 0
+
+        # Children generated but not yet evaluated, saved with checkpoints so an
+        # interrupted run can evaluate them on resume without calling the LLM again
+        self._pending_candidates: Dict[str, Dict[str, Any]] = {}
+
+        # Graceful shutdown state, set by request_shutdown()
+        self._shutdown_requested = False
+        self._shutdown_deadline = 0.0
+        self._shutdown_event: Optional[asyncio.Event] = None
+        self._signal_handlers: List[int] = []
+
+        # Write checkpoints without blocking the evolution loop
+        self.checkpoint_writer: Optional[BackgroundWriter] = None
+        if self.config.async_checkpoints:
+            self.checkpoint_writer = BackgroundWriter(name="checkpoint-writer")
 
         logger.info(f"Initialized OpenEvolve with {initial_program_path} " f"and {evaluation_file}")
 
     def _setup_logging(self) -> None:
-        """Set up logging"""
+        """
+        Set up logging
+
+        The log file only receives the records of this run, so runs sharing a
+        process, as in a batch, each keep their own log.
+        """
         log_dir = self.config.log_dir or os.path.join(self.output_dir, "logs")
         os.makedirs(log_dir, exist_ok=True)
 
@@ -99,21 +179,36 @@ class xEvolve:
         root_logger = logging.getLogger()
         root_logger.setLevel(getattr(logging, self.config.log_level))
 
+        # Records emitted from here on in this task (and tasks it starts) belong to this run
+        _current_run.set(self._run_id)
+
         # Add file handler
         log_file = os.path.join(log_dir, f"openevolve_{time.strftime('%Y%m%d_%H%M%S')}.log")
         file_handler = logging.FileHandler(log_file)
         file_handler.setFormatter(
             logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
         )
+        file_handler.addFilter(_RunLogFilter(self._run_id))
         root_logger.addHandler(file_handler)
+        self._log_handler = file_handler
 
-        # Add console handler
-        console_handler = logging.StreamHandler()
-        console_handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
-        root_logger.addHandler(console_handler)
+        # Add console handler, once per process even if several runs share it
+        if not any(type(handler) is logging.StreamHandler for handler in root_logger.handlers):
+            console_handler = logging.StreamHandler()
+            console_handler.setFormatter(
+                logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
+            )
+            root_logger.addHandler(console_handler)
 
         logger.info(f"Logging to {log_file}")
 
+    def _close_logging(self) -> None:
+        """Remove and close the log file handler of this run"""
+        if self._log_handler is not None:
+            logging.getLogger().removeHandler(self._log_handler)
+            self._log_handler.close()
+            self._log_handler = None
+
     def _load_initial_program(self) -> str:
         """Load the initial program from file"""
         with open(self.initial_program_path, "r") as f:
@@ -136,6 +231,43 @@ class xEvolve:
         """
         max_iterations = iterations or self.config.max_iterations
 
+        if self._log_handler is None:
+            self._setup_logging()
+        _current_run.set(self._run_id)
+
+        # Start the wall clock for the run budget
+        self.budget.start()
+
+        # Stop gracefully on SIGINT/SIGTERM
+        self._shutdown_event = asyncio.Event()
+        if self._shutdown_requested:
+            self._shutdown_event.set()
+        self._install_signal_handlers()
+
+        try:
+            return await self._run(max_iterations, target_score)
+        finally:
+            self._remove_signal_handlers()
+            self._close_checkpoint_writer()
+            self.database.close()
+            self._close_logging()
+
+    def _close_checkpoint_writer(self) -> None:
+        """Finish the queued checkpoint writes and stop the writer thread"""
+        if self.checkpoint_writer is None:
+            return
+        writer, self.checkpoint_writer = self.checkpoint_writer, None
+        try:
+            writer.close()
+        except Exception as e:
+            # A successful run has already flushed the writer, so this only follows a failure
+            logger.error(f"Error writing checkpoint during shutdown: {str(e)}")
+
+    async def _run(self, max_iterations: int, target_score: Optional[float]) -> Program:
+        """Run the evolution process once signal handling is in place"""
+        # Evaluate children left over from an interrupted run
+        await self._resume_pending_candidates()
+
         # Define start_iteration before creating the initial program
         start_iteration = self.database.last_iteration
 
@@ -157,6 +289,7 @@ class xEvolve:
             initial_metrics = await self.evaluator.evaluate_program(
                 self.initial_program_code, initial_program_id
             )
+            self.evaluator.pop_timings(initial_program_id)
 
             initial_program = Program(
                 id=initial_program_id,
@@ -176,112 +309,31 @@ class xEvolve:
         total_iterations = start_iteration + max_iterations
 
         logger.info(
-            f"Starting evolution from iteration {start_iteration} for {max_iterations} iterations (total: {total_iterations})"
+            f"Starting {self.config.evolution_mode} evolution from iteration {start_iteration} "
+            f"for {max_iterations} iterations (total: {total_iterations})"
         )
 
-        for i in range(start_iteration, total_iterations):
-            iteration_start = time.time()
-
-            # Sample parent and inspirations
-            parent, inspirations = self.database.sample()
+        if self.config.evolution_mode == "generational":
+            await self._run_generational(start_iteration, total_iterations, target_score)
+        else:
+            await self._run_steady_state(start_iteration, total_iterations, target_score)
 
-            # Build prompt
-            prompt = self.prompt_sampler.build_prompt(
-                current_program=parent.code,
-                parent_program=parent.code,  # We don't have the parent's code, use the same
-                program_metrics=parent.metrics,
-                previous_programs=[p.to_dict() for p in self.database.get_top_programs(3)],
-                top_programs=[p.to_dict() for p in inspirations],
-                language=self.language,
-                evolution_round=i,
-                allow_full_rewrite=self.config.allow_full_rewrites,
+        if self._shutdown_requested:
+            # Persist everything, including children that could not be evaluated in time
+            logger.info(
+                f"Saving final checkpoint with {len(self._pending_candidates)} "
+                f"pending candidates before shutting down"
             )
+            self._save_checkpoint(self.database.last_iteration)
+        self._pending_candidates.clear()
 
-            # Generate code modification
-            try:
-                llm_response = await self.llm_ensemble.generate_with_context(
-                    system_message=prompt["system"],
-                    messages=[{"role": "user", "content": prompt["user"]}],
-                )
-
-                # Parse the response
-                if self.config.diff_based_evolution:
-                    diff_blocks = extract_diffs(llm_response)
-
-                    if not diff_blocks:
-                        logger.warning(f"Iteration {i+1}: No valid diffs found in response")
-                        continue
-
-                    # Apply the diffs
-                    child_code = apply_diff(parent.code, llm_response)
-                    changes_summary = format_diff_summary(diff_blocks)
-                else:
-                    # Parse full rewrite
-                    new_code = parse_full_rewrite(llm_response, self.language)
-
-                    if not new_code:
-                        logger.warning(f"Iteration {i+1}: No valid code found in response")
-                        continue
-
-                    child_code = new_code
-                    changes_summary = "Full rewrite"
-
-                # Check code length
-                if len(child_code) > self.config.max_code_length:
-                    logger.warning(
-                        f"Iteration {i+1}: Generated code exceeds maximum length "
-                        f"({len(child_code)} > {self.config.max_code_length})"
-                    )
-                    continue
-
-                # Evaluate the child program
-                child_id = str(uuid.uuid4())
-                child_metrics = await self.evaluator.evaluate_program(child_code, child_id)
-
-                # Create a child program
-                child_program = Program(
-                    id=child_id,
-                    code=child_code,
-                    language=self.language,
-                    parent_id=parent.id,
-                    generation=parent.generation + 1,
-                    metrics=child_metrics,
-                    metadata={
-                        "changes": changes_summary,
-                        "parent_metrics": parent.metrics,
-                    },
-                )
+        self._update_budget()
+        logger.info(f"Run budget used: {self.budget.summary()}")
 
-                # Add to database
-                self.database.add(child_program, iteration=i + 1)
-
-                # Log progress
-                iteration_time = time.time() - iteration_start
-                self._log_iteration(i, parent, child_program, iteration_time)
-
-                # Specifically check if this is the new best program
-                if self.database.best_program_id == child_program.id:
-                    logger.info(
-                        f"🌟 New best solution found at iteration {i+1}: {child_program.id}"
-                    )
-                    logger.info(
-                        f"Metrics: {', '.join(f'{name}={value:.4f}' for name, value in child_program.metrics.items())}"
-                    )
-
-                # Save checkpoint
-                if (i + 1) % self.config.checkpoint_interval == 0:
-                    self._save_checkpoint(i + 1)
-
-                # Check if target score reached
-                if target_score is not None:
-                    avg_score = sum(child_metrics.values()) / max(1, len(child_metrics))
-                    if avg_score >= target_score:
-                        logger.info(f"Target score {target_score} reached after {i+1} iterations")
-                        break
-
-            except Exception as e:
-                logger.error(f"Error in iteration {i+1}: {str(e)}")
-                continue
+        # Make sure every checkpoint, and the database log if any, has reached the disk
+        if self.checkpoint_writer is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self.checkpoint_writer.flush)
+        self.database.sync()
 
         # Get the best program using our tracking mechanism
         best_program = None
@@ -330,6 +382,782 @@ class xEvolve:
             # Return None if no programs found instead of undefined initial_program
             return None
 
+    async def _run_steady_state(
+        self,
+        start_iteration: int,
+        total_iterations: int,
+        target_score: Optional[float] = None,
+    ) -> None:
+        """
+        Run iterations concurrently, merging children as soon as they are evaluated
+
+        Up to ``parallel_iterations`` iterations are kept in flight at any time.
+
+        Args:
+            start_iteration: First iteration to run
+            total_iterations: Iteration number to stop at (exclusive)
+            target_score: Target score to reach, if any
+        """
+        parallel_iterations = max(1, self.config.parallel_iterations)
+        in_flight: Dict[asyncio.Task, int] = {}
+        next_iteration = start_iteration
+        target_reached = False
+        shutdown_waiter = asyncio.create_task(self._shutdown_event.wait())
+
+        try:
+            while True:
+                while (
+                    not target_reached
+                    and not self._shutdown_requested
+                    and next_iteration < total_iterations
+                    and len(in_flight) < parallel_iterations
+                    and self._can_launch(len(in_flight))
+                ):
+                    task = asyncio.create_task(self._run_iteration(next_iteration))
+                    in_flight[task] = next_iteration
+                    next_iteration += 1
+
+                if not in_flight:
+                    break
+
+                # After a shutdown request, in-flight iterations get until the deadline
+                timeout = self.budget.remaining_wall_time()
+                if self._shutdown_requested:
+                    grace = max(0.0, self._shutdown_deadline - time.time())
+                    timeout = grace if timeout is None else min(timeout, grace)
+
+                waiting = set(in_flight)
+                if not shutdown_waiter.done():
+                    waiting.add(shutdown_waiter)
+                done, _ = await asyncio.wait(
+                    waiting, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if shutdown_waiter in done:
+                    # Woken by the shutdown request, wait again with the deadline
+                    done.discard(shutdown_waiter)
+                    if not done:
+                        continue
+
+                if not done:
+                    # The wall-clock budget or the shutdown deadline ran out
+                    reason = (
+                        "Shutdown deadline" if self._shutdown_requested else "Wall-clock budget"
+                    )
+                    logger.info(
+                        f"{reason} reached, cancelling {len(in_flight)} in-flight iterations"
+                    )
+                    await self._cancel_iterations(in_flight)
+                    break
+
+                for task in done:
+                    i = in_flight.pop(task)
+                    result = task.result()
+                    if result is None:
+                        continue
+
+                    parent, children, iteration_start = result
+                    self.budget.record_iteration(time.time() - iteration_start)
+                    try:
+                        if self._commit_children(
+                            i, parent, children, iteration_start, target_score
+                        ):
+                            target_reached = True
+                    except Exception as e:
+                        logger.error(f"Error in iteration {i+1}: {str(e)}")
+
+                if target_reached and in_flight:
+                    # Abandon iterations that are still running once the target is reached
+                    await self._cancel_iterations(in_flight)
+        finally:
+            shutdown_waiter.cancel()
+
+    async def _run_generational(
+        self,
+        start_iteration: int,
+        total_iterations: int,
+        target_score: Optional[float] = None,
+    ) -> None:
+        """
+        Run evolution in generations of ``generation_size`` iterations
+
+        All parents of a generation are sampled before any of its children are
+        committed, and the children are added to the database in a single batch.
+        A generation that fails is logged and the run goes on with the next one.
+
+        Args:
+            start_iteration: First iteration to run
+            total_iterations: Iteration number to stop at (exclusive)
+            target_score: Target score to reach, if any
+        """
+        generation_size = max(1, self.config.generation_size)
+        iteration = start_iteration
+
+        while iteration < total_iterations and not self._shutdown_requested:
+            size = min(generation_size, total_iterations - iteration)
+
+            # Only start a generation that fits in the remaining budget
+            if not self._can_launch(size - 1):
+                break
+
+            generation = asyncio.create_task(self._run_generation(iteration, size, target_score))
+            if not await self._finish_before_shutdown(generation):
+                for i in range(iteration, iteration + size):
+                    self.telemetry.discard(i)
+                break
+
+            iteration += size
+            try:
+                target_reached = generation.result()
+            except Exception as e:
+                logger.error(f"Error in generation ending at iteration {iteration}: {str(e)}")
+                for i in range(iteration - size, iteration):
+                    self.telemetry.discard(i)
+                continue
+            if target_reached:
+                break
+
+    async def _run_generation(
+        self, iteration: int, size: int, target_score: Optional[float] = None
+    ) -> bool:
+        """
+        Run and commit a single generation
+
+        Args:
+            iteration: First iteration of the generation (zero-based)
+            size: Number of iterations in the generation
+            target_score: Target score to reach, if any
+
+        Returns:
+            True if any child reached the target score
+        """
+        generation_start = time.time()
+
+        # Sample every parent before any child of this generation is committed
+        samples = []
+        for i in range(iteration, iteration + size):
+            try:
+                samples.append((i, *self._sample_and_build_prompt(i)))
+            except Exception as e:
+                logger.error(f"Error in iteration {i+1}: {str(e)}")
+
+        # Generate all children concurrently
+        responses = await asyncio.gather(
+            *(self._generate_children_code(i, parent, prompt) for i, parent, prompt in samples),
+            return_exceptions=True,
+        )
+
+        candidates = []
+        for (i, parent, _), response in zip(samples, responses):
+            if isinstance(response, Exception):
+                logger.error(f"Error in iteration {i+1}: {str(response)}")
+                continue
+            for child_code, changes_summary in response:
+                candidates.append((i, parent, str(uuid.uuid4()), child_code, changes_summary))
+
+        # Evaluate all children concurrently
+        for i, parent, child_id, child_code, changes in candidates:
+            self._track_pending(i, parent, child_id, child_code, changes)
+
+        evaluation_start = time.perf_counter()
+        child_ids = [child_id for _, _, child_id, _, _ in candidates]
+        try:
+            metrics_list = await self._evaluate_children(
+                [
+                    (parent, child_id, child_code)
+                    for _, parent, child_id, child_code, _ in candidates
+                ]
+            )
+        except Exception:
+            # Cancelled evaluations stay pending for the final checkpoint, failed ones do not
+            self._untrack_pending(child_ids)
+            raise
+        self._untrack_pending(child_ids)
+        evaluation_time = time.perf_counter() - evaluation_start
+        for i, _, _ in samples:
+            self.telemetry.add(i, "evaluate", evaluation_time)
+        for i, _, child_id, _, _ in candidates:
+            self._record_evaluation_timings(i, [child_id])
+
+        # Evaluations dropped to save budget produce no child
+        children = [
+            (i, parent, self._create_child(parent, child_id, child_code, changes, metrics))
+            for (i, parent, child_id, child_code, changes), metrics in zip(candidates, metrics_list)
+            if metrics is not None
+        ]
+
+        end_iteration = iteration + size
+        for _ in range(size):
+            self.budget.record_iteration(time.time() - generation_start)
+
+        # Commit the whole generation in one step
+        commit_start = time.perf_counter()
+        self.database.add_many([child for _, _, child in children], iteration=end_iteration)
+        commit_time = time.perf_counter() - commit_start
+
+        target_reached = False
+        for i, parent, child_program in children:
+            self._log_iteration(i, parent, child_program, time.time() - generation_start)
+
+            if self.database.best_program_id == child_program.id:
+                logger.info(f"🌟 New best solution found at iteration {i+1}: {child_program.id}")
+
+            if target_score is not None and self._reaches_target(child_program, target_score):
+                logger.info(f"Target score {target_score} reached after {i+1} iterations")
+                target_reached = True
+
+        logger.info(
+            f"Generation ending at iteration {end_iteration} committed {len(children)} "
+            f"children from {len(samples)} prompts in {time.time() - generation_start:.2f}s"
+        )
+
+        # Save checkpoint if this generation crossed a checkpoint boundary
+        checkpoint_time = 0.0
+        interval = self.config.checkpoint_interval
+        if end_iteration // interval > iteration // interval:
+            checkpoint_start = time.perf_counter()
+            self._save_checkpoint(end_iteration)
+            checkpoint_time = time.perf_counter() - checkpoint_start
+
+        generation_time = time.time() - generation_start
+        children_per_iteration = {}
+        for i, _, _ in children:
+            children_per_iteration[i] = children_per_iteration.get(i, 0) + 1
+        for i, _, _ in samples:
+            self.telemetry.add(i, "database_add", commit_time)
+            if checkpoint_time:
+                self.telemetry.add(i, "checkpoint", checkpoint_time)
+            self.telemetry.finish(i, generation_time, children=children_per_iteration.get(i, 0))
+
+        return target_reached
+
+    async def _run_iteration(
+        self, iteration: int
+    ) -> Optional[Tuple[Program, List[Program], float]]:
+        """
+        Run a single iteration up to, but not including, the database update
+
+        Args:
+            iteration: Iteration number (zero-based)
+
+        Returns:
+            Tuple of (parent, children, iteration start time), or None if no child was produced
+        """
+        iteration_start = time.time()
+        child_ids: List[str] = []
+
+        try:
+            parent, prompt = self._sample_and_build_prompt(iteration)
+
+            generated = await self._generate_children_code(iteration, parent, prompt)
+            if not generated:
+                self.telemetry.finish(iteration, time.time() - iteration_start, children=0)
+                return None
+
+            # Evaluate the children, together when the prompt produced several
+            child_ids = [str(uuid.uuid4()) for _ in generated]
+            for (child_code, changes_summary), child_id in zip(generated, child_ids):
+                self._track_pending(iteration, parent, child_id, child_code, changes_summary)
+
+            with self.telemetry.phase(iteration, "evaluate"):
+                metrics_list = await self._evaluate_children(
+                    [
+                        (parent, child_id, child_code)
+                        for (child_code, _), child_id in zip(generated, child_ids)
+                    ]
+                )
+            self._untrack_pending(child_ids)
+            self._record_evaluation_timings(iteration, child_ids)
+
+            # Evaluations dropped to save budget produce no child
+            children = [
+                self._create_child(parent, child_id, child_code, changes_summary, child_metrics)
+                for (child_code, changes_summary), child_id, child_metrics in zip(
+                    generated, child_ids, metrics_list
+                )
+                if child_metrics is not None
+            ]
+            if not children:
+                self.telemetry.finish(iteration, time.time() - iteration_start, children=0)
+                return None
+
+            return parent, children, iteration_start
+
+        except Exception as e:
+            logger.error(f"Error in iteration {iteration+1}: {str(e)}")
+            self._untrack_pending(child_ids)
+            self.telemetry.finish(iteration, time.time() - iteration_start, children=0)
+            return None
+
+    def request_shutdown(self) -> None:
+        """
+        Stop the run gracefully
+
+        No new iterations are started. Iterations in flight get up to
+        ``shutdown_timeout`` seconds to finish, after which they are cancelled and
+        their unevaluated children are saved with a final checkpoint, to be
+        evaluated when the run is resumed. A second request while shutting down
+        falls through to the default signal handling and aborts the process.
+        """
+        if self._shutdown_requested:
+            return
+
+        self._shutdown_requested = True
+        self._shutdown_deadline = time.time() + self.config.shutdown_timeout
+        if self._shutdown_event is not None:
+            self._shutdown_event.set()
+        self._remove_signal_handlers()
+
+        logger.warning(
+            f"Shutdown requested, finishing in-flight work "
+            f"(up to {self.config.shutdown_timeout}s) and saving a checkpoint"
+        )
+
+    def _install_signal_handlers(self) -> None:
+        """Call request_shutdown() on SIGINT and SIGTERM"""
+        if not self.config.handle_signals:
+            return
+
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.request_shutdown)
+                self._signal_handlers.append(sig)
+            except (NotImplementedError, RuntimeError, ValueError):
+                # Not supported on this platform or outside the main thread
+                logger.debug(f"Could not install a handler for signal {sig}")
+
+    def _remove_signal_handlers(self) -> None:
+        """Restore the default handling of the signals handled during the run"""
+        if not self._signal_handlers:
+            return
+
+        loop = asyncio.get_running_loop()
+        for sig in self._signal_handlers:
+            loop.remove_signal_handler(sig)
+        self._signal_handlers = []
+
+    async def _finish_before_shutdown(self, task: asyncio.Task) -> bool:
+        """
+        Wait for a task, giving it until the shutdown deadline once shutdown is requested
+
+        Args:
+            task: Task to wait for
+
+        Returns:
+            True if the task finished, False if it was cancelled at the deadline
+        """
+        shutdown_waiter = asyncio.create_task(self._shutdown_event.wait())
+        try:
+            await asyncio.wait({task, shutdown_waiter}, return_when=asyncio.FIRST_COMPLETED)
+            if task.done():
+                return True
+
+            logger.info(f"Waiting up to {self.config.shutdown_timeout}s for the current generation")
+            await asyncio.wait({task}, timeout=max(0.0, self._shutdown_deadline - time.time()))
+            if task.done():
+                return True
+
+            logger.info("Shutdown deadline reached, cancelling the current generation")
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            return False
+        finally:
+            shutdown_waiter.cancel()
+
+    def _track_pending(
+        self, iteration: int, parent: Program, child_id: str, code: str, changes: str
+    ) -> None:
+        """Remember a child that is waiting for its evaluation"""
+        self._pending_candidates[child_id] = {
+            "id": child_id,
+            "iteration": iteration,
+            "parent_id": parent.id,
+            "code": code,
+            "changes": changes,
+        }
+
+    def _untrack_pending(self, child_ids: List[str]) -> None:
+        """Forget children whose evaluation has finished"""
+        for child_id in child_ids:
+            self._pending_candidates.pop(child_id, None)
+
+    async def _resume_pending_candidates(self) -> None:
+        """Evaluate the children an interrupted run saved before they were evaluated"""
+        pending = self.database.pending_candidates
+        self.database.pending_candidates = []
+
+        candidates = []
+        for candidate in pending:
+            parent = self.database.get(candidate["parent_id"])
+            if parent is None or candidate["id"] in self.database.programs:
+                continue
+            candidates.append((candidate, parent))
+        if not candidates:
+            return
+
+        logger.info(f"Evaluating {len(candidates)} pending candidates from the interrupted run")
+        for candidate, parent in candidates:
+            self._track_pending(
+                candidate["iteration"],
+                parent,
+                candidate["id"],
+                candidate["code"],
+                candidate["changes"],
+            )
+
+        metrics_list = await self._evaluate_children(
+            [(parent, candidate["id"], candidate["code"]) for candidate, parent in candidates]
+        )
+        self._untrack_pending([candidate["id"] for candidate, _ in candidates])
+
+        for (candidate, parent), metrics in zip(candidates, metrics_list):
+            self.evaluator.pop_timings(candidate["id"])
+            if metrics is None:
+                continue
+            child = self._create_child(
+                parent, candidate["id"], candidate["code"], candidate["changes"], metrics
+            )
+            self.database.add(child, iteration=candidate["iteration"] + 1)
+
+    async def _cancel_iterations(self, in_flight: Dict[asyncio.Task, int]) -> None:
+        """Cancel in-flight iterations and drop their partial timings"""
+        for task in in_flight:
+            task.cancel()
+        await asyncio.gather(*in_flight.keys(), return_exceptions=True)
+
+        for iteration in in_flight.values():
+            self.telemetry.discard(iteration)
+        in_flight.clear()
+
+    def _record_evaluation_timings(self, iteration: int, child_ids: List[str]) -> None:
+        """Add the evaluator's per-phase timings of the children to an iteration"""
+        for child_id in child_ids:
+            for phase, seconds in self.evaluator.pop_timings(child_id).items():
+                self.telemetry.add(iteration, f"evaluate_{phase}", seconds)
+
+    def _update_budget(self) -> None:
+        """Report the tokens and evaluation time spent so far to the run budget"""
+        self.budget.update(self.llm_ensemble.total_tokens, self.evaluator.total_evaluation_time)
+
+    def _can_launch(self, in_flight: int) -> bool:
+        """
+        Check whether the run budget and pacing allow starting another iteration
+
+        Args:
+            in_flight: Number of iterations already running
+
+        Returns:
+            True if a new iteration can be started
+        """
+        self._update_budget()
+        self._drop_pending_evaluations()
+        if not self.budget.can_launch(in_flight):
+            return False
+
+        # Hold back generation while children queue up for evaluator slots
+        return not self.budget.should_throttle_generation(
+            self._awaiting_evaluation, self.config.evaluator.parallel_evaluations
+        )
+
+    def _drop_pending_evaluations(self) -> None:
+        """Drop queued low-priority evaluations once the budget is nearly exhausted"""
+        threshold = self.config.budget.drop_pending_below
+        if threshold <= 0 or self.budget.remaining_fraction() >= threshold:
+            return
+
+        # Keep what the evaluator slots can pick up next, drop the rest
+        dropped = self.evaluator.drop_pending(keep=self.config.evaluator.parallel_evaluations)
+        if dropped:
+            logger.info(
+                f"Budget nearly exhausted ({self.budget.remaining_fraction():.0%} left), "
+                f"dropped {dropped} queued evaluations"
+            )
+
+    def _evaluation_priority(self, parent: Program, child_code: str) -> float:
+        """
+        Estimate how promising a candidate is, to order queued evaluations
+
+        Candidates inherit their parent's fitness; Python candidates that do not
+        even compile go last.
+
+        Args:
+            parent: Parent program
+            child_code: Code of the candidate
+
+        Returns:
+            Priority of the candidate's evaluation (higher is evaluated first)
+        """
+        if self.language == "python":
+            try:
+                compile(child_code, "<candidate>", "exec")
+            except (SyntaxError, ValueError):
+                return float("-inf")
+
+        return calculate_fitness(parent.metrics)
+
+    def _sample_and_build_prompt(self, iteration: int) -> Tuple[Program, Dict[str, str]]:
+        """
+        Sample a parent with inspirations and build the prompt for it
+
+        Args:
+            iteration: Iteration number (zero-based)
+
+        Returns:
+            Tuple of (parent, prompt)
+        """
+        # Sample parent and inspirations
+        with self.telemetry.phase(iteration, "sample"):
+            parent, inspirations = self.database.sample()
+
+        # Build prompt
+        with self.telemetry.phase(iteration, "build_prompt"):
+            prompt = self.prompt_sampler.build_prompt(
+                current_program=parent.code,
+                parent_program=parent.code,  # We don't have the parent's code, use the same
+                program_metrics=parent.metrics,
+                previous_programs=[p.to_dict() for p in self.database.get_top_programs(3)],
+                top_programs=[p.to_dict() for p in inspirations],
+                language=self.language,
+                evolution_round=iteration,
+                allow_full_rewrite=self.config.allow_full_rewrites,
+            )
+
+        return parent, prompt
+
+    async def _generate_children_code(
+        self, iteration: int, parent: Program, prompt: Dict[str, str]
+    ) -> List[Tuple[str, str]]:
+        """
+        Ask the LLM for ``children_per_prompt`` modifications of the parent and apply them
+
+        Args:
+            iteration: Iteration number (zero-based)
+            parent: Parent program
+            prompt: Prompt built for the parent
+
+        Returns:
+            List of (child_code, changes_summary) tuples for the usable responses
+        """
+        children_per_prompt = max(1, self.config.children_per_prompt)
+        messages = [{"role": "user", "content": prompt["user"]}]
+
+        with self.telemetry.phase(iteration, "llm"):
+            if children_per_prompt == 1:
+                llm_responses = [
+                    await self.llm_ensemble.generate_with_context(
+                        system_message=prompt["system"], messages=messages
+                    )
+                ]
+            else:
+                llm_responses = await self.llm_ensemble.generate_multiple_with_context(
+                    system_message=prompt["system"], messages=messages, n=children_per_prompt
+                )
+
+        children = []
+        with self.telemetry.phase(iteration, "apply_diff"):
+            for llm_response in llm_responses:
+                parsed = self._parse_llm_response(iteration, parent, llm_response)
+                if parsed is not None:
+                    children.append(parsed)
+
+        return children
+
+    async def _evaluate_children(
+        self, candidates: List[Tuple[Program, str, str]]
+    ) -> List[Dict[str, float]]:
+        """
+        Evaluate candidate children, together when there are several
+
+        With ``cancel_dominated`` enabled, candidates that can no longer beat the
+        archive or their parent after a cascade stage skip the remaining stages.
+
+        Args:
+            candidates: List of (parent, child_id, child_code) tuples
+
+        Returns:
+            List of metric dictionaries, in the order of the candidates, with None for
+            evaluations that were dropped
+        """
+        kwargs = {}
+        if self.config.evaluator.cancel_dominated:
+            parents = {child_id: parent for parent, child_id, _ in candidates}
+
+            def should_continue(program_id: str, stage: int, metrics: Dict[str, float]) -> bool:
+                return not self.database.is_dominated(metrics, parents.get(program_id))
+
+            kwargs["should_continue"] = should_continue
+
+        priorities = None
+        if self.config.evaluator.priority_scheduling:
+            priorities = [
+                self._evaluation_priority(parent, child_code)
+                for parent, _, child_code in candidates
+            ]
+
+        self._awaiting_evaluation += len(candidates)
+        try:
+            if len(candidates) == 1:
+                _, child_id, child_code = candidates[0]
+                if priorities is not None:
+                    kwargs["priority"] = priorities[0]
+                metrics_list = [
+                    await self.evaluator.evaluate_program(child_code, child_id, **kwargs)
+                ]
+            else:
+                if priorities is not None:
+                    kwargs["priorities"] = priorities
+                metrics_list = await self.evaluator.evaluate_multiple(
+                    [(child_code, child_id) for _, child_id, child_code in candidates], **kwargs
+                )
+        except BaseException:
+            for _, child_id, _ in candidates:
+                self.evaluator.pop_stopped_stage(child_id)
+            raise
+        finally:
+            self._awaiting_evaluation -= len(candidates)
+
+        # Only children that are created collect their stopped stage, so forget the rest
+        for (_, child_id, _), metrics in zip(candidates, metrics_list):
+            if metrics is None:
+                self.evaluator.pop_stopped_stage(child_id)
+        return metrics_list
+
+    def _create_child(
+        self,
+        parent: Program,
+        child_id: str,
+        child_code: str,
+        changes_summary: str,
+        child_metrics: Dict[str, float],
+    ) -> Program:
+        """Create an evaluated child program of a parent"""
+        # Parent metrics are reachable through parent_id, so they are not copied here
+        metadata = {"changes": changes_summary}
+
+        # Record partial results of evaluations that were stopped early
+        cancelled_stage = self.evaluator.pop_stopped_stage(child_id)
+        if cancelled_stage is not None:
+            metadata["cancelled_after_stage"] = cancelled_stage
+
+        return Program(
+            id=child_id,
+            code=child_code,
+            language=self.language,
+            parent_id=parent.id,
+            generation=parent.generation + 1,
+            metrics=child_metrics,
+            metadata=metadata,
+        )
+
+    def _parse_llm_response(
+        self, iteration: int, parent: Program, llm_response: str
+    ) -> Optional[Tuple[str, str]]:
+        """
+        Turn an LLM response into child code
+
+        Args:
+            iteration: Iteration number (zero-based)
+            parent: Parent program the response was generated for
+            llm_response: Raw LLM response
+
+        Returns:
+            Tuple of (child_code, changes_summary), or None if the response is unusable
+        """
+        if self.config.diff_based_evolution:
+            diff_blocks = extract_diffs(llm_response)
+
+            if not diff_blocks:
+                logger.warning(f"Iteration {iteration+1}: No valid diffs found in response")
+                return None
+
+            # Apply the diffs
+            child_code = apply_diff(parent.code, llm_response)
+            changes_summary = format_diff_summary(diff_blocks)
+        else:
+            # Parse full rewrite
+            new_code = parse_full_rewrite(llm_response, self.language)
+
+            if not new_code:
+                logger.warning(f"Iteration {iteration+1}: No valid code found in response")
+                return None
+
+            child_code = new_code
+            changes_summary = "Full rewrite"
+
+        # Check code length
+        if len(child_code) > self.config.max_code_length:
+            logger.warning(
+                f"Iteration {iteration+1}: Generated code exceeds maximum length "
+                f"({len(child_code)} > {self.config.max_code_length})"
+            )
+            return None
+
+        return child_code, changes_summary
+
+    def _commit_children(
+        self,
+        iteration: int,
+        parent: Program,
+        children: List[Program],
+        iteration_start: float,
+        target_score: Optional[float] = None,
+    ) -> bool:
+        """
+        Add the evaluated children of an iteration to the database
+
+        Also handles logging, checkpoints and the target score check.
+
+        Args:
+            iteration: Iteration number (zero-based)
+            parent: Parent program
+            children: Evaluated child programs
+            iteration_start: Time at which the iteration started
+            target_score: Target score to reach, if any
+
+        Returns:
+            True if any child reached the target score
+        """
+        # Add to database
+        with self.telemetry.phase(iteration, "database_add"):
+            if len(children) == 1:
+                self.database.add(children[0], iteration=iteration + 1)
+            else:
+                self.database.add_many(children, iteration=iteration + 1)
+
+        target_reached = False
+        iteration_time = time.time() - iteration_start
+        for child_program in children:
+            # Log progress
+            self._log_iteration(iteration, parent, child_program, iteration_time)
+
+            # Specifically check if this is the new best program
+            if self.database.best_program_id == child_program.id:
+                logger.info(
+                    f"🌟 New best solution found at iteration {iteration+1}: {child_program.id}"
+                )
+                logger.info(
+                    f"Metrics: {', '.join(f'{name}={value:.4f}' for name, value in child_program.metrics.items())}"
+                )
+
+            # Check if target score reached
+            if target_score is not None and self._reaches_target(child_program, target_score):
+                logger.info(f"Target score {target_score} reached after {iteration+1} iterations")
+                target_reached = True
+
+        # Save checkpoint
+        if (iteration + 1) % self.config.checkpoint_interval == 0:
+            with self.telemetry.phase(iteration, "checkpoint"):
+                self._save_checkpoint(iteration + 1)
+
+        self.telemetry.finish(iteration, time.time() - iteration_start, children=len(children))
+
+        return target_reached
+
+    def _reaches_target(self, program: Program, target_score: float) -> bool:
+        """Check whether the average of a program's metrics reaches the target score"""
+        avg_score = sum(program.metrics.values()) / max(1, len(program.metrics))
+        return avg_score >= target_score
+
     def _log_iteration(
         self,
         iteration: int,
@@ -366,58 +1194,137 @@ class xEvolve:
         """
         Save a checkpoint
 
+        The checkpoint contents are captured immediately, but written on the
+        checkpoint writer thread when async checkpoints are enabled.
+
         Args:
             iteration: Current iteration number
         """
         checkpoint_dir = os.path.join(self.output_dir, "checkpoints")
-        os.makedirs(checkpoint_dir, exist_ok=True)
 
         # Create specific checkpoint directory
         checkpoint_path = os.path.join(checkpoint_dir, f"checkpoint_{iteration}")
-        os.makedirs(checkpoint_path, exist_ok=True)
 
-        # Save the database
-        self.database.save(checkpoint_path, iteration)
+        # Report rolling phase timings alongside the checkpoint
+        self.telemetry.report(iteration)
+        if self.evaluator.coalesced_evaluations:
+            logger.info(f"Identical evaluations coalesced: {self.evaluator.coalesced_evaluations}")
+        grid = self.database.feature_grid
+        logger.info(
+            f"MAP-Elites coverage: {grid.occupancy()}/{grid.occupants.size} cells "
+            f"({grid.coverage():.1%})"
+        )
+        cache = self.evaluator.cache
+        if cache is not None:
+            logger.info(
+                f"Evaluation cache: {cache.hits} hits, {cache.misses} misses "
+                f"({cache.hit_rate:.1%}), {len(cache)} stored results"
+            )
+        windows = self.llm_ensemble.concurrency_windows
+        if windows:
+            logger.info(
+                "LLM concurrency windows: "
+                + ", ".join(f"{name}={window:.1f}" for name, window in windows.items())
+            )
 
-        # Save the best program found so far
+        # Capture the database, with the children still waiting for evaluation
+        self.database.pending_candidates = list(self._pending_candidates.values())
+        snapshot = self.database.prepare_checkpoint(
+            checkpoint_path, iteration, incremental=self.config.incremental_checkpoints
+        )
+
+        # Capture the best program found so far
         best_program = None
         if self.database.best_program_id:
             best_program = self.database.get(self.database.best_program_id)
         else:
             best_program = self.database.get_best_program()
 
+        best_program_code = None
+        best_program_info = None
         if best_program:
+            best_program_code = best_program.code
+            best_program_info = {
+                "id": best_program.id,
+                "generation": best_program.generation,
+                "iteration": best_program.iteration_found,
+                "current_iteration": iteration,
+                "metrics": dict(best_program.metrics),
+                "language": best_program.language,
+                "timestamp": best_program.timestamp,
+                "saved_at": time.time(),
+            }
+
+        if self.checkpoint_writer is not None:
+            self.checkpoint_writer.submit(
+                self._write_checkpoint, snapshot, best_program_code, best_program_info
+            )
+        else:
+            self._write_checkpoint(snapshot, best_program_code, best_program_info)
+
+    def _write_checkpoint(
+        self,
+        snapshot: Dict[str, Any],
+        best_program_code: Optional[str],
+        best_program_info: Optional[Dict[str, Any]],
+    ) -> None:
+        """
+        Write a captured checkpoint to disk and record the outcome in the database
+
+        Args:
+            snapshot: Database snapshot from ProgramDatabase.prepare_checkpoint
+            best_program_code: Code of the best program, if any
+            best_program_info: Information about the best program, if any
+        """
+        try:
+            self._write_checkpoint_files(snapshot, best_program_code, best_program_info)
+        except Exception:
+            # Programs of a failed checkpoint must not be referenced by later ones
+            self.database.finish_checkpoint(snapshot, written=False)
+            raise
+        self.database.finish_checkpoint(snapshot)
+
+    def _write_checkpoint_files(
+        self,
+        snapshot: Dict[str, Any],
+        best_program_code: Optional[str],
+        best_program_info: Optional[Dict[str, Any]],
+    ) -> None:
+        """
+        Write the files of a captured checkpoint
+
+        Args:
+            snapshot: Database snapshot from ProgramDatabase.prepare_checkpoint
+            best_program_code: Code of the best program, if any
+            best_program_info: Information about the best program, if any
+        """
+        checkpoint_path = snapshot["path"]
+        os.makedirs(checkpoint_path, exist_ok=True)
+
+        # Save the best program first, the database metadata marks the checkpoint complete
+        if best_program_code is not None:
             # Save the best program at this checkpoint
             best_program_path = os.path.join(checkpoint_path, f"best_program{self.file_extension}")
             with open(best_program_path, "w") as f:
-                f.write(best_program.code)
+                f.write(best_program_code)
 
             # Save metrics
             best_program_info_path = os.path.join(checkpoint_path, "best_program_info.json")
             with open(best_program_info_path, "w") as f:
                 import json
 
-                json.dump(
-                    {
-                        "id": best_program.id,
-                        "generation": best_program.generation,
-                        "iteration": best_program.iteration_found,
-                        "current_iteration": iteration,
-                        "metrics": best_program.metrics,
-                        "language": best_program.language,
-                        "timestamp": best_program.timestamp,
-                        "saved_at": time.time(),
-                    },
-                    f,
-                    indent=2,
-                )
+                json.dump(best_program_info, f, indent=2)
 
             logger.info(
-                f"Saved best program at checkpoint {iteration} with metrics: "
-                f"{', '.join(f'{name}={value:.4f}' for name, value in best_program.metrics.items())}"
+                f"Saved best program at checkpoint {best_program_info['current_iteration']} "
+                f"with metrics: "
+                f"{', '.join(f'{name}={value:.4f}' for name, value in best_program_info['metrics'].items())}"
             )
 
-        logger.info(f"Saved checkpoint at iteration {iteration} to {checkpoint_path}")
+        # Save the database
+        self.database.write_checkpoint(snapshot)
+
+        logger.info(f"Saved checkpoint to {checkpoint_path}")
 
     def _save_best_program(self, program: Optional[Program] = None) -> None:
         """
@@ -460,7 +1367,7 @@ class xEvolve:
                     "iteration": program.iteration_found,
                     "timestamp": program.timestamp,
                     "parent_id": program.parent_id,
-                    "metrics": program.metrics,
+                    "metrics": dict(program.metrics),
                     "language": program.language,
                     "saved_at": time.time(),
                 },
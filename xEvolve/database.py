@@ -2,51 +2,185 @@
 Program database for xEvolve
 """
 
+import bisect
+import copy
+import hashlib
+import heapq
 import json
 import logging
+import math
 import os
 import random
+import sys
+import threading
 import time
-from dataclasses import asdict, dataclass, field
+import weakref
+import zlib
+from collections import OrderedDict
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Set, Tuple, Union
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Set, Tuple, Union
 
 import numpy as np
 
 from xEvolve.config import DatabaseConfig
-from xEvolve.utils.code_utils import calculate_edit_distance
+from xEvolve.storage import (
+    ProgramStore,
+    SegmentLogStore,
+    is_store_path,
+    open_store,
+)
+from xEvolve.utils.code_utils import apply_line_delta, calculate_edit_distance, line_delta
 
 logger = logging.getLogger(__name__)
 
+# Programs of a checkpoint directory without their code, for loading it lazily
+PROGRAM_INDEX = "program_index.json"
 
-@dataclass
-class Program:
-    """Represents a program in the database"""
 
-    # Program identification
-    id: str
-    code: str
-    language: str = "python"
+def calculate_fitness(metrics: Dict[str, float]) -> float:
+    """
+    Reduce a set of metrics to a single fitness value
+
+    Uses combined_score when available, otherwise the average of all metrics.
 
-    # Evolution information
-    parent_id: Optional[str] = None
-    generation: int = 0
-    timestamp: float = field(default_factory=time.time)
-    iteration_found: int = 0  # Track which iteration this program was found
+    Args:
+        metrics: Dictionary of metric name to score
+
+    Returns:
+        Fitness value (0.0 if there are no metrics)
+    """
+    if "combined_score" in metrics:
+        return metrics["combined_score"]
+    return sum(metrics.values()) / max(1, len(metrics))
 
-    # Performance metrics
-    metrics: Dict[str, float] = field(default_factory=dict)
 
-    # Derived features
-    complexity: float = 0.0
-    diversity: float = 0.0
+# Shared, interned metric names of each metric layout seen so far
+_metric_layouts: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
 
-    # Metadata
-    metadata: Dict[str, Any] = field(default_factory=dict)
+
+def _metric_layout(names: Tuple[str, ...]) -> Tuple[str, ...]:
+    """Get the shared tuple of metric names for a layout, registering it on first use"""
+    layout = _metric_layouts.get(names)
+    if layout is None:
+        layout = tuple(sys.intern(name) for name in names)
+        _metric_layouts[layout] = layout
+    return layout
+
+
+class Program:
+    """
+    Represents a program in the database
+
+    Programs are slotted and kept small, since populations can hold hundreds
+    of thousands of them: metrics are stored as a tuple of values next to a
+    tuple of metric names shared by every program with the same metrics, and
+    language names are interned. ``metrics`` is a read-only view built on each
+    access, so metrics are changed by assigning a whole dictionary. Code may
+    be held as an entry of the database's CodeStore rather than a string.
+    """
+
+    __slots__ = (
+        "id",
+        "_code",
+        "language",
+        "parent_id",
+        "generation",
+        "timestamp",
+        "iteration_found",
+        "_metric_names",
+        "_metric_values",
+        "complexity",
+        "diversity",
+        "metadata",
+    )
+
+    # Fields in constructor and dictionary order
+    FIELDS = (
+        "id",
+        "code",
+        "language",
+        "parent_id",
+        "generation",
+        "timestamp",
+        "iteration_found",
+        "metrics",
+        "complexity",
+        "diversity",
+        "metadata",
+    )
+
+    def __init__(
+        self,
+        id: str,
+        code: str,
+        language: str = "python",
+        parent_id: Optional[str] = None,
+        generation: int = 0,
+        timestamp: Optional[float] = None,
+        iteration_found: int = 0,
+        metrics: Optional[Dict[str, float]] = None,
+        complexity: float = 0.0,
+        diversity: float = 0.0,
+        metadata: Optional[Dict[str, Any]] = None,
+    ):
+        # Program identification
+        self.id = id
+        self.code = code
+        self.language = sys.intern(language) if isinstance(language, str) else language
+
+        # Evolution information
+        self.parent_id = parent_id
+        self.generation = generation
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self.iteration_found = iteration_found  # Track which iteration this program was found
+
+        # Performance metrics
+        self.metrics = metrics or {}
+
+        # Derived features
+        self.complexity = complexity
+        self.diversity = diversity
+
+        # Metadata
+        self.metadata = metadata if metadata is not None else {}
+
+    @property
+    def code(self) -> str:
+        code = self._code
+        return code if isinstance(code, str) else code.source()
+
+    @code.setter
+    def code(self, value: Union[str, "CodeEntry"]) -> None:
+        self._code = value
+
+    @property
+    def metrics(self) -> Mapping[str, float]:
+        # Read-only, so that changing a single metric fails instead of being lost
+        return MappingProxyType(dict(zip(self._metric_names, self._metric_values)))
+
+    @metrics.setter
+    def metrics(self, metrics: Dict[str, float]) -> None:
+        self._metric_names = _metric_layout(tuple(metrics))
+        self._metric_values = tuple(metrics.values())
+
+    def __eq__(self, other: Any) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.FIELDS)
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.FIELDS)
+        return f"{self.__class__.__name__}({fields})"
 
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary representation"""
-        return asdict(self)
+        data = {name: getattr(self, name) for name in self.FIELDS}
+        data["metrics"] = dict(self.metrics)
+        data["metadata"] = copy.deepcopy(self.metadata)
+        return data
 
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> "Program":
@@ -54,6 +188,360 @@ class Program:
         return cls(**data)
 
 
+class CodeCache:
+    """
+    Least recently used cache of program code that is not kept in memory as is
+
+    Holds the code of lazily loaded programs, read on demand from their
+    checkpoint files, and of programs rebuilt from a CodeStore, up to
+    ``max_entries`` sources.
+    """
+
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self._code: "OrderedDict[Union[str, bytes], str]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._code)
+
+    def get(self, key: Union[str, bytes], load: Callable[[], str]) -> str:
+        """
+        Get cached code, loading it on a miss
+
+        Args:
+            key: Key of the code
+            load: Function loading the code
+
+        Returns:
+            The code
+        """
+        code = self._code.get(key)
+        if code is not None:
+            self._code.move_to_end(key)
+            return code
+
+        code = load()
+        self.put(key, code)
+        return code
+
+    def put(self, key: Union[str, bytes], code: str) -> None:
+        """Cache code, evicting the least recently used if full"""
+        self._code[key] = code
+        self._code.move_to_end(key)
+        if len(self._code) > self.max_entries:
+            self._code.popitem(last=False)
+
+
+class CodeEntry:
+    """
+    A source in a CodeStore, compressed whole or as a delta against a base entry
+
+    Programs reference the entry of their code, so entries live exactly as
+    long as a program or a delta needs them.
+    """
+
+    __slots__ = ("key", "base", "depth", "_payload", "_store", "__weakref__")
+
+    def __init__(
+        self,
+        store: "CodeStore",
+        key: bytes,
+        payload: bytes,
+        base: Optional["CodeEntry"] = None,
+    ):
+        self._store = store
+        self.key = key
+        self._payload = payload
+        self.base = base
+        self.depth = base.depth + 1 if base is not None else 0
+
+    @property
+    def size(self) -> int:
+        """Compressed size in bytes"""
+        return len(self._payload)
+
+    def source(self) -> str:
+        """Rebuild the source, going through the store's cache"""
+        return self._store.cache.get(self.key, self._rebuild)
+
+    def _rebuild(self) -> str:
+        data = zlib.decompress(self._payload).decode("utf-8")
+        if self.base is None:
+            return data
+        return apply_line_delta(self.base.source(), json.loads(data))
+
+
+class CodeStore:
+    """
+    Content-addressed, delta-compressed store of program sources
+
+    Identical sources share one entry. A source is stored as a compressed
+    line delta against the source of its parent program, unless the chain of
+    deltas would grow longer than ``snapshot_interval`` or the delta is not
+    smaller than the source, in which case it is stored whole. Rebuilt
+    sources are kept in a CodeCache.
+
+    The store only saves memory: checkpoints and db_path stores write the full
+    source of every program, so they are no smaller with compression on.
+    """
+
+    def __init__(self, cache: CodeCache, snapshot_interval: int = 8):
+        self.cache = cache
+        self.snapshot_interval = snapshot_interval
+        self._entries: "weakref.WeakValueDictionary[bytes, CodeEntry]" = (
+            weakref.WeakValueDictionary()
+        )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def put(self, code: str, base: Optional[CodeEntry] = None) -> CodeEntry:
+        """
+        Store a source
+
+        Args:
+            code: Source to store
+            base: Entry of the parent's source, to store a delta against
+
+        Returns:
+            Entry of the source
+        """
+        encoded = code.encode("utf-8")
+        key = hashlib.sha256(encoded).digest()
+        entry = self._entries.get(key)
+        if entry is not None:
+            return entry
+
+        payload = zlib.compress(encoded)
+        if base is not None and base.depth < self.snapshot_interval:
+            delta = json.dumps(line_delta(base.source(), code), separators=(",", ":"))
+            compressed_delta = zlib.compress(delta.encode("utf-8"))
+            if len(compressed_delta) < len(payload):
+                entry = CodeEntry(self, key, compressed_delta, base)
+        if entry is None:
+            entry = CodeEntry(self, key, payload)
+
+        self._entries[key] = entry
+        self.cache.put(key, code)
+        return entry
+
+
+class LazyProgram(Program):
+    """Program loaded from a checkpoint index, whose code is fetched on first access"""
+
+    __slots__ = ("_program_path", "_code_cache")
+
+    def __init__(self, program_path: str, code_cache: CodeCache, **fields: Any):
+        """
+        Args:
+            program_path: Path to the program JSON file holding the code
+            code_cache: Cache to fetch the code through
+            **fields: Program fields other than code
+        """
+        self._program_path = program_path
+        self._code_cache = code_cache
+        super().__init__(code=None, **fields)
+
+    @property
+    def code(self) -> str:
+        if self._code is not None:
+            # Code assigned after loading is kept with the program
+            return Program.code.fget(self)
+        return self._code_cache.get(self._program_path, self._read_code)
+
+    @code.setter
+    def code(self, value: Union[str, CodeEntry, None]) -> None:
+        self._code = value
+
+    def _read_code(self) -> str:
+        with open(self._program_path, "r") as f:
+            return json.load(f)["code"]
+
+
+def average_score(program: Program) -> float:
+    """Average of a program's metrics (0.0 if it has none)"""
+    return sum(program.metrics.values()) / max(1, len(program.metrics))
+
+
+class FitnessIndex:
+    """
+    Programs kept sorted by a score, updated as programs are added and removed
+
+    Each program's score is computed once, when it is added, and entries are
+    kept in a list sorted with bisect, so the top k programs are a slice of
+    the list. Programs with equal scores keep the order they were added in.
+    """
+
+    def __init__(self, score: Callable[[Program], Optional[float]]):
+        """
+        Args:
+            score: Score of a program, or None to leave the program out of the index
+        """
+        self._score = score
+        # Sorted (-score, sequence number, program ID) entries, best first
+        self._entries: List[Tuple[float, int, str]] = []
+        self._by_id: Dict[str, Tuple[float, int, str]] = {}
+        self._sequence = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, program_id: str) -> bool:
+        return program_id in self._by_id
+
+    def add(self, program: Program) -> None:
+        """Add a program, replacing its previous entry if it was indexed before"""
+        self.remove(program.id)
+
+        score = self._score(program)
+        if score is None:
+            return
+        if math.isnan(score):
+            score = float("-inf")
+
+        entry = (-score, self._sequence, program.id)
+        self._sequence += 1
+        bisect.insort(self._entries, entry)
+        self._by_id[program.id] = entry
+
+    def remove(self, program_id: str) -> None:
+        """Remove a program if it is indexed"""
+        entry = self._by_id.pop(program_id, None)
+        if entry is not None:
+            del self._entries[bisect.bisect_left(self._entries, entry)]
+
+    def score(self, program_id: str) -> Optional[float]:
+        """Cached score of an indexed program"""
+        entry = self._by_id.get(program_id)
+        return -entry[0] if entry is not None else None
+
+    def top(self, n: int) -> List[str]:
+        """IDs of the n highest-scoring programs, best first"""
+        return [entry[2] for entry in self._entries[:n]]
+
+    def worst_first(self) -> Iterator[str]:
+        """Iterate over the IDs of indexed programs, lowest score first"""
+        for entry in reversed(self._entries):
+            yield entry[2]
+
+
+Cell = Tuple[int, ...]
+
+
+def cell_key(cell: Cell) -> str:
+    """Key of a MAP-Elites cell in stored feature maps: its "-"-joined coordinates"""
+    return "-".join(str(c) for c in cell)
+
+
+class FeatureGrid:
+    """
+    MAP-Elites grid of the best program found in each feature cell
+
+    Cells are indexed by integer feature coordinates. Two NumPy arrays hold,
+    per cell, the slot of its occupant (-1 when empty) and the occupant's
+    fitness, so replacing an occupant is O(1) and neighbourhood, occupancy
+    and coverage queries are vectorized over the grid.
+    """
+
+    def __init__(self, num_dimensions: int, bins: int):
+        self.bins = bins
+        self.shape = (bins,) * num_dimensions
+
+        self.occupants = np.full(self.shape, -1, dtype=np.int64)
+        self.fitness = np.full(self.shape, -np.inf, dtype=np.float64)
+
+        # Program ID held in each occupant slot, and the cell each program occupies
+        self._slot_ids: List[Optional[str]] = []
+        self._free_slots: List[int] = []
+        self._cells: Dict[str, Cell] = {}
+
+        # Cells whose occupant changed, collected for the stores that write changes only
+        self.changed_cells: Set[Cell] = set()
+
+    def __len__(self) -> int:
+        return len(self._cells)
+
+    def __contains__(self, program_id: str) -> bool:
+        return program_id in self._cells
+
+    def get(self, cell: Cell) -> Optional[str]:
+        """ID of the program occupying a cell, or None if the cell is empty"""
+        slot = self.occupants[cell]
+        return self._slot_ids[slot] if slot >= 0 else None
+
+    def place(self, cell: Cell, program_id: str, fitness: float) -> None:
+        """Make a program the occupant of a cell, replacing the previous occupant"""
+        previous = self.get(cell)
+        if previous is not None:
+            self._release(previous)
+        if program_id in self._cells:
+            self._release(program_id)
+
+        if self._free_slots:
+            slot = self._free_slots.pop()
+            self._slot_ids[slot] = program_id
+        else:
+            slot = len(self._slot_ids)
+            self._slot_ids.append(program_id)
+
+        self.occupants[cell] = slot
+        self.fitness[cell] = fitness
+        self._cells[program_id] = cell
+        self.changed_cells.add(cell)
+
+    def _release(self, program_id: str) -> None:
+        """Empty the cell a program occupies"""
+        cell = self._cells.pop(program_id)
+        slot = self.occupants[cell]
+        self.occupants[cell] = -1
+        self.fitness[cell] = -np.inf
+        self._slot_ids[slot] = None
+        self._free_slots.append(slot)
+        self.changed_cells.add(cell)
+
+    def program_ids(self) -> List[str]:
+        """IDs of every occupant"""
+        return list(self._cells)
+
+    def neighbours(self, cell: Cell, radius: int = 1) -> List[str]:
+        """IDs of the occupants within radius cells of a cell (including the cell itself)"""
+        window = tuple(slice(max(0, c - radius), min(self.bins, c + radius + 1)) for c in cell)
+        slots = self.occupants[window]
+        return [self._slot_ids[slot] for slot in slots[slots >= 0]]
+
+    def occupancy(self) -> int:
+        """Number of occupied cells"""
+        return int(np.count_nonzero(self.occupants >= 0))
+
+    def coverage(self) -> float:
+        """Fraction of cells that are occupied"""
+        return self.occupancy() / self.occupants.size
+
+    def to_dict(self) -> Dict[str, str]:
+        """Occupants keyed by "-"-joined coordinates, the format checkpoints store"""
+        return {cell_key(cell): pid for pid, cell in self._cells.items()}
+
+    def load_dict(self, feature_map: Dict[str, str], fitness: Dict[str, float]) -> None:
+        """
+        Fill the grid from a dictionary written by to_dict
+
+        Args:
+            feature_map: Program IDs keyed by "-"-joined coordinates
+            fitness: Fitness of each program
+        """
+        for key, program_id in feature_map.items():
+            coords = [int(c) for c in key.split("-")] if key else []
+            if len(coords) != len(self.shape):
+                logger.warning(f"Ignoring feature map cell {key} with the wrong dimensions")
+                continue
+            cell = tuple(min(max(c, 0), self.bins - 1) for c in coords)
+            if program_id not in fitness:
+                continue
+            # Empty cells hold -inf, so occupants with -inf fitness are placed explicitly
+            if self.get(cell) is None or fitness[program_id] > self.fitness[cell]:
+                self.place(cell, program_id, fitness[program_id])
+
+
 class ProgramDatabase:
     """
     Database for storing and sampling programs during evolution
@@ -70,14 +558,18 @@ class ProgramDatabase:
         self.programs: Dict[str, Program] = {}
 
         # Feature grid for MAP-Elites
-        self.feature_map: Dict[str, str] = {}
         self.feature_bins = config.feature_bins
+        self.feature_grid = FeatureGrid(len(config.feature_dimensions), config.feature_bins)
 
         # Island populations
         self.islands: List[Set[str]] = [set() for _ in range(config.num_islands)]
 
-        # Archive of elite programs
+        # Archive of elite programs, and a min-heap of (fitness, sequence number, program ID)
+        # entries ordering it. Heap entries of programs no longer archived are dropped lazily.
         self.archive: Set[str] = set()
+        self._archive_heap: List[Tuple[float, int, str]] = []
+        self._archive_entries: Dict[str, Tuple[float, int, str]] = {}
+        self._archive_sequence = 0
 
         # Track the absolute best program separately
         self.best_program_id: Optional[str] = None
@@ -85,8 +577,52 @@ class ProgramDatabase:
         # Track the last iteration number (for resuming)
         self.last_iteration: int = 0
 
-        # Load database from disk if path is provided
-        if config.db_path and os.path.exists(config.db_path):
+        # Children that were generated but not evaluated when the run was interrupted
+        self.pending_candidates: List[Dict[str, Any]] = []
+
+        # Archive members changed since the state was last written to a db_path store, and
+        # the pending candidates it holds
+        self._changed_archive: Set[str] = set()
+        self._stored_pending: List[Dict[str, Any]] = []
+
+        # Programs sorted by the average of their metrics, and by single metrics on demand
+        self._average_index = FitnessIndex(average_score)
+        self._metric_indexes: Dict[str, FitnessIndex] = {}
+        # Programs sorted by the fitness the archive ranks them by, used by eviction
+        self._fitness_index = FitnessIndex(lambda program: calculate_fitness(program.metrics))
+
+        # MAP-Elites cell of each program and the programs in each cell, used by crowding eviction
+        self._program_cells: Dict[str, Cell] = {}
+        self._cell_members: Dict[Cell, Set[str]] = {}
+
+        # Code of programs loaded lazily (in_memory=False), and the store compressing the
+        # code of every other program
+        self._code_cache = CodeCache(config.code_cache_size)
+        self._code_store: Optional[CodeStore] = None
+        if config.compress_code:
+            self._code_store = CodeStore(self._code_cache, config.code_snapshot_interval)
+
+        # Programs added since the last checkpoint, and the checkpoint holding each program.
+        # Programs of checkpoints still being written count as changed until the write is
+        # confirmed, which may happen on a background thread.
+        self._dirty_program_ids: Set[str] = set()
+        self._checkpoint_locations: Dict[str, str] = {}
+        self._unwritten_program_ids: Dict[str, int] = {}
+        self._checkpoint_lock = threading.Lock()
+
+        # A db_path naming a SQLite file or segment log keeps the database there as it changes
+        self._store: Optional[ProgramStore] = None
+        if config.db_path and is_store_path(config.db_path):
+            exists = os.path.exists(config.db_path)
+            self._store = open_store(
+                config.db_path,
+                segment_size=config.log_segment_size,
+                fsync_interval=config.log_fsync_interval,
+            )
+            if exists:
+                self._load_store(config.db_path, self._store)
+        elif config.db_path and os.path.exists(config.db_path):
+            # Load database from disk if path is provided
             self.load(config.db_path)
 
         logger.info(f"Initialized program database with {len(self.programs)} programs")
@@ -110,16 +646,12 @@ class ProgramDatabase:
             self.last_iteration = max(self.last_iteration, iteration)
 
         self.programs[program.id] = program
-
-        # Calculate feature coordinates for MAP-Elites
-        feature_coords = self._calculate_feature_coords(program)
+        self._dirty_program_ids.add(program.id)
+        self._index_program(program)
+        self._store_code(program)
 
         # Add to feature map (replacing existing if better)
-        feature_key = self._feature_coords_to_key(feature_coords)
-        if feature_key not in self.feature_map or self._is_better(
-            program, self.programs[self.feature_map[feature_key]]
-        ):
-            self.feature_map[feature_key] = program.id
+        self._place_in_grid(program)
 
         # Add to an island (randomly)
         island_idx = random.randint(0, len(self.islands) - 1)
@@ -132,12 +664,69 @@ class ProgramDatabase:
         self._update_best_program(program)
 
         # Save to disk if configured
-        if self.config.db_path:
-            self._save_program(program)
+        self._persist([program])
+
+        self._enforce_population_size()
+        self._compact_store()
 
         logger.debug(f"Added program {program.id} to database")
         return program.id
 
+    def add_many(self, programs: List[Program], iteration: int = None) -> List[str]:
+        """
+        Add a batch of programs to the database in one step
+
+        Feature map and island membership are updated per program, while the
+        best program tracking is updated once for the whole batch.
+
+        Args:
+            programs: Programs to add
+            iteration: Current iteration (defaults to last_iteration)
+
+        Returns:
+            List of program IDs
+        """
+        if not programs:
+            return []
+
+        if iteration is not None:
+            self.last_iteration = max(self.last_iteration, iteration)
+
+        for program in programs:
+            if iteration is not None:
+                program.iteration_found = iteration
+            self.programs[program.id] = program
+            self._dirty_program_ids.add(program.id)
+            self._index_program(program)
+            self._store_code(program)
+
+        for program in programs:
+            # Add to feature map (replacing existing if better)
+            self._place_in_grid(program)
+
+            # Add to an island (randomly)
+            island_idx = random.randint(0, len(self.islands) - 1)
+            self.islands[island_idx].add(program.id)
+
+        # Update archive, and best program once for the whole batch
+        for program in programs:
+            self._update_archive(program)
+
+        best_new = programs[0]
+        for program in programs[1:]:
+            if self._is_better(program, best_new):
+                best_new = program
+        self._update_best_program(best_new)
+
+        # Save to disk if configured
+        self._persist(programs)
+
+        self._enforce_population_size()
+        self._compact_store()
+
+        logger.debug(f"Added {len(programs)} programs to database")
+        return [program.id for program in programs]
+
     def get(self, program_id: str) -> Optional[Program]:
         """
         Get a program by ID
@@ -185,28 +774,18 @@ class ProgramDatabase:
             return self.programs[self.best_program_id]
 
         if metric:
-            # Sort by specific metric
-            sorted_programs = sorted(
-                [p for p in self.programs.values() if metric in p.metrics],
-                key=lambda p: p.metrics[metric],
-                reverse=True,
-            )
+            # Rank by specific metric
+            sorted_programs = self._top_programs(self._metric_index(metric), 1)
             if sorted_programs:
                 logger.debug(f"Found best program by metric '{metric}': {sorted_programs[0].id}")
-        elif self.programs and all("combined_score" in p.metrics for p in self.programs.values()):
-            # Sort by combined_score if it exists (preferred method)
-            sorted_programs = sorted(
-                self.programs.values(), key=lambda p: p.metrics["combined_score"], reverse=True
-            )
+        elif len(self._metric_index("combined_score")) == len(self.programs):
+            # Rank by combined_score if every program has it (preferred method)
+            sorted_programs = self._top_programs(self._metric_index("combined_score"), 1)
             if sorted_programs:
                 logger.debug(f"Found best program by combined_score: {sorted_programs[0].id}")
         else:
-            # Sort by average of all metrics as fallback
-            sorted_programs = sorted(
-                self.programs.values(),
-                key=lambda p: sum(p.metrics.values()) / max(1, len(p.metrics)),
-                reverse=True,
-            )
+            # Rank by average of all metrics as fallback
+            sorted_programs = self._top_programs(self._average_index, 1)
             if sorted_programs:
                 logger.debug(f"Found best program by average metrics: {sorted_programs[0].id}")
 
@@ -237,6 +816,9 @@ class ProgramDatabase:
         """
         Get the top N programs based on a metric
 
+        Programs are kept ranked as they are added, so this takes O(n) time
+        rather than sorting the whole population.
+
         Args:
             n: Number of programs to return
             metric: Metric to use for ranking (uses average if None)
@@ -244,25 +826,58 @@ class ProgramDatabase:
         Returns:
             List of top programs
         """
-        if not self.programs:
-            return []
-
         if metric:
-            # Sort by specific metric
-            sorted_programs = sorted(
-                [p for p in self.programs.values() if metric in p.metrics],
-                key=lambda p: p.metrics[metric],
-                reverse=True,
-            )
-        else:
-            # Sort by average of all metrics
-            sorted_programs = sorted(
-                self.programs.values(),
-                key=lambda p: sum(p.metrics.values()) / max(1, len(p.metrics)),
-                reverse=True,
-            )
+            return self._top_programs(self._metric_index(metric), n)
+        return self._top_programs(self._average_index, n)
+
+    def _top_programs(self, index: FitnessIndex, n: int) -> List[Program]:
+        """Get the top N programs of an index"""
+        return [self.programs[program_id] for program_id in index.top(n)]
+
+    def _metric_index(self, metric: str) -> FitnessIndex:
+        """
+        Get the index ranking programs by a single metric, building it on first use
+
+        Programs without the metric are left out of the index.
+        """
+        index = self._metric_indexes.get(metric)
+        if index is None:
+            index = FitnessIndex(lambda program: program.metrics.get(metric))
+            for program in self.programs.values():
+                index.add(program)
+            self._metric_indexes[metric] = index
+        return index
+
+    def _index_program(self, program: Program) -> None:
+        """Add a program to every fitness index"""
+        self._average_index.add(program)
+        self._fitness_index.add(program)
+        for index in self._metric_indexes.values():
+            index.add(program)
+
+    def is_dominated(self, metrics: Dict[str, float], parent: Optional[Program] = None) -> bool:
+        """
+        Check whether a candidate with these metrics cannot improve the population
+
+        A candidate is dominated when the archive is full and its fitness is below
+        both the worst archived program and its parent.
+
+        Args:
+            metrics: Metrics of the candidate (possibly from an early cascade stage)
+            parent: Parent of the candidate, if any
+
+        Returns:
+            True if the candidate is dominated
+        """
+        if len(self.archive) < self.config.archive_size:
+            return False
 
-        return sorted_programs[:n]
+        fitness = calculate_fitness(metrics)
+        if parent is not None and fitness >= calculate_fitness(parent.metrics):
+            return False
+
+        archive_worst = self._archive_worst()
+        return archive_worst is not None and fitness < archive_worst[0]
 
     def save(self, path: Optional[str] = None, iteration: int = 0) -> None:
         """
@@ -277,31 +892,226 @@ class ProgramDatabase:
             logger.warning("No database path specified, skipping save")
             return
 
-        # Create directory if it doesn't exist
-        os.makedirs(save_path, exist_ok=True)
+        snapshot = self.prepare_checkpoint(save_path, iteration, incremental=False)
+        if self._store is not None and snapshot["path"] == os.path.abspath(self.config.db_path):
+            # The store of db_path is open, so the snapshot goes through it rather than a second one
+            self._store.write_snapshot(snapshot["programs"], snapshot["metadata"])
+            return
 
-        # Save each program
-        for program in self.programs.values():
-            self._save_program(program, save_path)
+        try:
+            self.write_checkpoint(snapshot)
+        except Exception:
+            self.finish_checkpoint(snapshot, written=False)
+            raise
+        self.finish_checkpoint(snapshot)
+
+    def sync(self) -> None:
+        """Force the records appended to a segment log db_path to disk"""
+        if isinstance(self._store, SegmentLogStore):
+            self._store.sync()
+
+    def close(self) -> None:
+        """
+        Close the SQLite file or segment log of db_path, if one is open
+
+        The programs stay available in memory, but later changes are no longer
+        persisted as they happen; save() still writes the whole database.
+        Safe to call more than once.
+        """
+        if self._store is not None:
+            store, self._store = self._store, None
+            store.close()
+
+    def prepare_checkpoint(
+        self, path: str, iteration: int = 0, incremental: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Capture the state needed to write a checkpoint
+
+        The snapshot only contains plain data, so it can be written with
+        write_checkpoint on another thread while evolution continues. Once
+        written, pass it to finish_checkpoint.
+
+        With incremental checkpoints only programs added since the previous
+        checkpoint are serialized. Unchanged programs are referenced by the
+        checkpoint directory that already holds them, so older checkpoints
+        must be kept for the new one to load. A path naming a SQLite file or
+        segment log always gets a full snapshot.
+
+        Args:
+            path: Checkpoint directory, SQLite file or segment log
+            iteration: Current iteration number
+            incremental: Whether to write only programs changed since the last checkpoint
+
+        Returns:
+            Snapshot to pass to write_checkpoint
+        """
+        path = os.path.abspath(path)
+        store_path = is_store_path(path)
+
+        with self._checkpoint_lock:
+            if incremental and not store_path:
+                changed_ids = [
+                    pid
+                    for pid in self.programs
+                    if pid in self._dirty_program_ids
+                    or pid in self._unwritten_program_ids
+                    or pid not in self._checkpoint_locations
+                ]
+            else:
+                changed_ids = list(self.programs)
+
+            # Reference unchanged programs by the checkpoint directory that holds them
+            changed = set(changed_ids)
+            locations: Dict[str, List[str]] = {}
+            for pid in self.programs:
+                if pid not in changed:
+                    locations.setdefault(self._checkpoint_locations[pid], []).append(pid)
+
+            # Only checkpoint directories can be referenced by later incremental checkpoints,
+            # and only once finish_checkpoint confirms they were written
+            if not store_path:
+                for pid in changed_ids:
+                    self._unwritten_program_ids[pid] = self._unwritten_program_ids.get(pid, 0) + 1
+                self._dirty_program_ids.difference_update(changed_ids)
+
+        metadata = self._metadata(iteration)
+        metadata["islands"] = [list(island) for island in self.islands]
+        metadata["program_locations"] = {
+            os.path.relpath(location, path): ids for location, ids in locations.items()
+        }
+        snapshot = {
+            "path": path,
+            "programs": [self._program_record(self.programs[pid]) for pid in changed_ids],
+            "metadata": metadata,
+        }
+        return snapshot
+
+    def finish_checkpoint(self, snapshot: Dict[str, Any], written: bool = True) -> None:
+        """
+        Record the outcome of writing a snapshot created by prepare_checkpoint
+
+        Programs of a written checkpoint directory can be referenced by later
+        incremental checkpoints. Those of a failed write are marked changed
+        again, so the next checkpoint serializes them. Safe to call from the
+        thread that wrote the snapshot.
+
+        Args:
+            snapshot: Snapshot passed to write_checkpoint
+            written: Whether the snapshot was written successfully
+        """
+        if is_store_path(snapshot["path"]):
+            return
+
+        with self._checkpoint_lock:
+            for program_data in snapshot["programs"]:
+                pid = program_data["id"]
+                remaining = self._unwritten_program_ids.get(pid, 0) - 1
+                if remaining > 0:
+                    self._unwritten_program_ids[pid] = remaining
+                else:
+                    self._unwritten_program_ids.pop(pid, None)
 
-        # Save metadata
-        metadata = {
-            "feature_map": self.feature_map,
-            "islands": [list(island) for island in self.islands],
-            "archive": list(self.archive),
+                if pid not in self.programs:
+                    continue
+                if written:
+                    self._checkpoint_locations[pid] = snapshot["path"]
+                else:
+                    self._dirty_program_ids.add(pid)
+
+    def _metadata(self, iteration: int = 0) -> Dict[str, Any]:
+        """Database state other than programs and islands, as stored in checkpoints"""
+        archive_heap = self._compact_archive_heap()
+        return {
+            "feature_map": self.feature_grid.to_dict(),
+            # Archive in heap order, so loading restores the heap without sorting
+            "archive": [entry[2] for entry in archive_heap],
+            "archive_fitness": [entry[0] for entry in archive_heap],
             "best_program_id": self.best_program_id,
             "last_iteration": iteration or self.last_iteration,
+            "pending_candidates": list(self.pending_candidates),
         }
 
+    def _state_changes(self) -> Dict[str, Any]:
+        """Database state changed since the last call, as written to a db_path store"""
+        changes = {
+            "feature_map": {
+                cell_key(cell): self.feature_grid.get(cell)
+                for cell in self.feature_grid.changed_cells
+            },
+            "archive": {
+                pid: self._archive_entries[pid][0] if pid in self.archive else None
+                for pid in self._changed_archive
+            },
+            "best_program_id": self.best_program_id,
+            "last_iteration": self.last_iteration,
+        }
+        if self.pending_candidates != self._stored_pending:
+            changes["pending_candidates"] = list(self.pending_candidates)
+            self._stored_pending = list(self.pending_candidates)
+
+        self.feature_grid.changed_cells.clear()
+        self._changed_archive.clear()
+        return changes
+
+    def _program_record(self, program: Program) -> Dict[str, Any]:
+        """Serialize a program, with its fitness for the SQLite fitness index"""
+        record = program.to_dict()
+        record["fitness"] = self._archive_fitness(program)
+        return record
+
+    @staticmethod
+    def write_checkpoint(snapshot: Dict[str, Any]) -> None:
+        """
+        Write a snapshot created by prepare_checkpoint to disk
+
+        Only touches the snapshot, so it is safe to call from a background thread.
+
+        Args:
+            snapshot: Snapshot to write
+        """
+        save_path = snapshot["path"]
+        if is_store_path(save_path):
+            store = open_store(save_path)
+            try:
+                store.write_snapshot(snapshot["programs"], snapshot["metadata"])
+            finally:
+                store.close()
+            logger.info(f"Saved database with {len(snapshot['programs'])} programs to {save_path}")
+            return
+
+        programs_dir = os.path.join(save_path, "programs")
+        os.makedirs(programs_dir, exist_ok=True)
+
+        # Save each changed program, leaving out the fitness that only the stores keep
+        index = []
+        for program_data in snapshot["programs"]:
+            program_data = {key: value for key, value in program_data.items() if key != "fitness"}
+            program_path = os.path.join(programs_dir, f"{program_data['id']}.json")
+            with open(program_path, "w") as f:
+                json.dump(program_data, f)
+            index.append({key: value for key, value in program_data.items() if key != "code"})
+
+        with open(os.path.join(save_path, PROGRAM_INDEX), "w") as f:
+            json.dump(index, f)
+
+        # Save metadata last so a checkpoint is only complete once it exists
         with open(os.path.join(save_path, "metadata.json"), "w") as f:
-            json.dump(metadata, f)
+            json.dump(snapshot["metadata"], f)
 
-        logger.info(f"Saved database with {len(self.programs)} programs to {save_path}")
+        num_referenced = sum(len(ids) for ids in snapshot["metadata"]["program_locations"].values())
+        logger.info(
+            f"Saved database with {len(snapshot['programs'])} new programs "
+            f"and {num_referenced} referenced programs to {save_path}"
+        )
 
     def load(self, path: str) -> None:
         """
         Load the database from disk
 
+        With in_memory disabled, programs of checkpoint directories are loaded
+        from their index without code, which is read when first accessed.
+
         Args:
             path: Path to load from
         """
@@ -309,37 +1119,202 @@ class ProgramDatabase:
             logger.warning(f"Database path {path} does not exist, skipping load")
             return
 
+        path = os.path.abspath(path)
+        if is_store_path(path):
+            store = open_store(path)
+            try:
+                self._load_store(path, store)
+            finally:
+                store.close()
+            return
+
+        metadata: Dict[str, Any] = {}
+
         # Load metadata
         metadata_path = os.path.join(path, "metadata.json")
         if os.path.exists(metadata_path):
             with open(metadata_path, "r") as f:
                 metadata = json.load(f)
-
-            self.feature_map = metadata.get("feature_map", {})
-            self.islands = [set(island) for island in metadata.get("islands", [])]
-            self.archive = set(metadata.get("archive", []))
-            self.best_program_id = metadata.get("best_program_id")
-            self.last_iteration = metadata.get("last_iteration", 0)
-
-            logger.info(f"Loaded database metadata with last_iteration={self.last_iteration}")
+            self._apply_metadata(metadata)
 
         # Load programs
         programs_dir = os.path.join(path, "programs")
-        if os.path.exists(programs_dir):
+        if self._has_index(path):
+            self._load_index(path)
+        elif os.path.exists(programs_dir):
             for program_file in os.listdir(programs_dir):
                 if program_file.endswith(".json"):
-                    program_path = os.path.join(programs_dir, program_file)
-                    try:
-                        with open(program_path, "r") as f:
-                            program_data = json.load(f)
+                    self._load_program(os.path.join(programs_dir, program_file), path)
+
+        # Load unchanged programs referenced from earlier incremental checkpoints
+        for relative_location, program_ids in metadata.get("program_locations", {}).items():
+            location = os.path.normpath(os.path.join(path, relative_location))
+            if self._has_index(location):
+                self._load_index(location, set(program_ids))
+                continue
+            for program_id in program_ids:
+                program_path = os.path.join(location, "programs", f"{program_id}.json")
+                self._load_program(program_path, location)
+
+        self._finish_load(path, metadata.get("feature_map", {}))
+
+    def _load_store(self, path: str, store: ProgramStore) -> None:
+        """
+        Load the database from a SQLite file or segment log
 
-                        program = Program.from_dict(program_data)
-                        self.programs[program.id] = program
-                    except Exception as e:
-                        logger.warning(f"Error loading program {program_file}: {str(e)}")
+        Args:
+            path: Path of the store
+            store: Store reading the path
+        """
+        records, metadata = store.read()
+        self._apply_metadata(metadata)
+
+        for record in records:
+            program = Program.from_dict(record)
+            self.programs[program.id] = program
+            self._index_program(program)
+
+        self._finish_load(path, metadata.get("feature_map", {}))
+
+    def _apply_metadata(self, metadata: Dict[str, Any]) -> None:
+        """Restore the database state stored in checkpoint metadata"""
+        self.islands = [set(island) for island in metadata.get("islands", [])]
+        self._restore_archive(metadata.get("archive", []), metadata.get("archive_fitness"))
+        self.best_program_id = metadata.get("best_program_id")
+        self.last_iteration = metadata.get("last_iteration", 0)
+        self.pending_candidates = metadata.get("pending_candidates", [])
+
+        logger.info(f"Loaded database metadata with last_iteration={self.last_iteration}")
+
+    def _finish_load(self, path: str, feature_map: Dict[str, str]) -> None:
+        """Rebuild the derived structures once the programs of a checkpoint are loaded"""
+        self._dirty_program_ids.clear()
+        self._stored_pending = list(self.pending_candidates)
+
+        # Every program belongs to an island, even if the checkpoint had fewer islands
+        while len(self.islands) < self.config.num_islands:
+            self.islands.append(set())
+
+        if len(self._archive_entries) != len(self.archive):
+            self._rebuild_archive_heap()
+
+        self.feature_grid = FeatureGrid(len(self.config.feature_dimensions), self.feature_bins)
+        self.feature_grid.load_dict(
+            feature_map,
+            {
+                pid: self._archive_fitness(self.programs[pid])
+                for pid in feature_map.values()
+                if pid in self.programs
+            },
+        )
+
+        # Keep programs in the order they were found, which oldest-first eviction relies on
+        self.programs = dict(
+            sorted(self.programs.items(), key=lambda item: item[1].iteration_found)
+        )
+        self._enforce_population_size()
+
+        # The store of db_path only needs the loaded state if it was loaded from elsewhere
+        self.feature_grid.changed_cells.clear()
+        self._changed_archive.clear()
+        if self._store is not None and os.path.abspath(path) != os.path.abspath(
+            self.config.db_path
+        ):
+            self._store.write_snapshot(
+                [self._program_record(program) for program in self.programs.values()],
+                dict(self._metadata(), islands=[list(island) for island in self.islands]),
+            )
 
         logger.info(f"Loaded database with {len(self.programs)} programs from {path}")
 
+    def _store_code(self, program: Program) -> None:
+        """
+        Move the code of a program into the code store, as a delta against its parent
+
+        Programs loaded from a checkpoint keep their code as loaded until they
+        get a child, so loading does not compress every program.
+        """
+        if self._code_store is None or not isinstance(program._code, str):
+            return
+
+        parent = self.programs.get(program.parent_id) if program.parent_id else None
+        if parent is not None and type(parent) is Program and isinstance(parent._code, str):
+            # Stored whole, without going further up its lineage
+            parent.code = self._code_store.put(parent._code)
+        base = parent._code if parent is not None else None
+        program.code = self._code_store.put(
+            program._code, base if isinstance(base, CodeEntry) else None
+        )
+
+    def _has_index(self, location: str) -> bool:
+        """Whether programs of a checkpoint directory are to be loaded lazily from its index"""
+        return not self.config.in_memory and os.path.exists(os.path.join(location, PROGRAM_INDEX))
+
+    def _load_index(self, location: str, program_ids: Optional[Set[str]] = None) -> None:
+        """
+        Load programs of a checkpoint directory from its index, leaving their code on disk
+
+        Args:
+            location: Checkpoint directory
+            program_ids: Programs to load (all programs of the index if None)
+        """
+        with open(os.path.join(location, PROGRAM_INDEX), "r") as f:
+            index = json.load(f)
+
+        for program_data in index:
+            if program_ids is not None and program_data["id"] not in program_ids:
+                continue
+            program_path = os.path.join(location, "programs", f"{program_data['id']}.json")
+            program = LazyProgram(program_path, self._code_cache, **program_data)
+            self.programs[program.id] = program
+            self._index_program(program)
+            self._checkpoint_locations[program.id] = location
+
+    def _load_program(self, program_path: str, location: str) -> None:
+        """
+        Load a single program file
+
+        Args:
+            program_path: Path to the program JSON file
+            location: Checkpoint directory holding the file
+        """
+        try:
+            with open(program_path, "r") as f:
+                program_data = json.load(f)
+
+            program = Program.from_dict(program_data)
+            self.programs[program.id] = program
+            self._index_program(program)
+            self._checkpoint_locations[program.id] = location
+        except Exception as e:
+            logger.warning(f"Error loading program {os.path.basename(program_path)}: {str(e)}")
+
+    def _persist(self, programs: List[Program]) -> None:
+        """Write added programs to db_path, if configured"""
+        if self._store is not None:
+            islands = {
+                program.id: island_idx
+                for island_idx, island in enumerate(self.islands)
+                for program in programs
+                if program.id in island
+            }
+            self._store.save_programs(
+                [self._program_record(program) for program in programs],
+                islands,
+                self._state_changes(),
+            )
+        elif self.config.db_path and not is_store_path(self.config.db_path):
+            for program in programs:
+                self._save_program(program)
+
+    def _compact_store(self) -> None:
+        """Compact the segment log of db_path once it is mostly superseded records"""
+        if isinstance(self._store, SegmentLogStore) and self._store.needs_compaction:
+            self._store.compact(
+                [self._program_record(program) for program in self.programs.values()],
+                dict(self._metadata(), islands=[list(island) for island in self.islands]),
+            )
+
     def _save_program(self, program: Program, base_path: Optional[str] = None) -> None:
         """
         Save a program to disk
@@ -414,17 +1389,23 @@ class ProgramDatabase:
 
         return coords
 
-    def _feature_coords_to_key(self, coords: List[int]) -> str:
-        """
-        Convert feature coordinates to a string key
-
-        Args:
-            coords: Feature coordinates
-
-        Returns:
-            String key
-        """
-        return "-".join(str(c) for c in coords)
+    @property
+    def feature_map(self) -> Dict[str, str]:
+        """MAP-Elites occupants keyed by "-"-joined feature coordinates"""
+        return self.feature_grid.to_dict()
+
+    def _place_in_grid(self, program: Program) -> None:
+        """Make a program the occupant of its MAP-Elites cell if it beats the current one"""
+        cell = tuple(self._calculate_feature_coords(program))
+        self._assign_cell(program.id, cell)
+
+        occupant = self.feature_grid.get(cell)
+        if (
+            occupant is None
+            or occupant == program.id
+            or self._is_better(program, self.programs[occupant])
+        ):
+            self.feature_grid.place(cell, program.id, self._archive_fitness(program))
 
     def _is_better(self, program1: Program, program2: Program) -> bool:
         """
@@ -461,24 +1442,107 @@ class ProgramDatabase:
         """
         Update the archive of elite programs
 
+        Programs are ranked by calculate_fitness, like in is_dominated. Once the
+        archive is full, a program replaces the worst archived program if its
+        fitness is higher, in O(log archive_size) time.
+
         Args:
             program: Program to consider for archive
         """
-        # If archive not full, add program
-        if len(self.archive) < self.config.archive_size:
-            self.archive.add(program.id)
+        # Re-adding an archived program updates its fitness
+        if program.id in self.archive or len(self.archive) < self.config.archive_size:
+            self._push_archive(program.id, self._archive_fitness(program))
             return
 
-        # Otherwise, find worst program in archive
-        archive_programs = [self.programs[pid] for pid in self.archive]
-        worst_program = min(
-            archive_programs, key=lambda p: sum(p.metrics.values()) / max(1, len(p.metrics))
-        )
+        worst = self._archive_worst()
+        fitness = self._archive_fitness(program)
+        if worst is None or fitness > worst[0]:
+            if worst is not None:
+                heapq.heappop(self._archive_heap)
+                self.archive.discard(worst[2])
+                del self._archive_entries[worst[2]]
+                if self._store is not None:
+                    self._changed_archive.add(worst[2])
+            self._push_archive(program.id, fitness)
+
+    @staticmethod
+    def _archive_fitness(program: Program) -> float:
+        fitness = calculate_fitness(program.metrics)
+        return float("-inf") if math.isnan(fitness) else fitness
+
+    def _push_archive(self, program_id: str, fitness: float) -> None:
+        """Add a program to the archive and its heap"""
+        entry = (fitness, self._archive_sequence, program_id)
+        self._archive_sequence += 1
+        heapq.heappush(self._archive_heap, entry)
+        self._archive_entries[program_id] = entry
+        self.archive.add(program_id)
+        if self._store is not None:
+            self._changed_archive.add(program_id)
+
+        # Drop stale entries once they make up most of the heap
+        if len(self._archive_heap) > 2 * len(self.archive) + 16:
+            self._compact_archive_heap()
+
+    def _is_archived(self, entry: Tuple[float, int, str]) -> bool:
+        """Check whether a heap entry belongs to a program that is still archived"""
+        return entry[2] in self.archive and self._archive_entries.get(entry[2]) is entry
+
+    def _archive_worst(self) -> Optional[Tuple[float, int, str]]:
+        """Heap entry of the worst archived program, or None if the archive is empty"""
+        heap = self._archive_heap
+        while heap and not self._is_archived(heap[0]):
+            heapq.heappop(heap)
+        return heap[0] if heap else None
+
+    def _compact_archive_heap(self) -> List[Tuple[float, int, str]]:
+        """Remove the entries of programs no longer archived from the heap"""
+        heap = [entry for entry in self._archive_heap if self._is_archived(entry)]
+        if len(heap) < len(self._archive_heap):
+            heapq.heapify(heap)
+            self._archive_heap = heap
+        return self._archive_heap
+
+    def _restore_archive(
+        self, program_ids: List[str], fitness: Optional[List[float]] = None
+    ) -> None:
+        """
+        Restore the archive from checkpoint metadata
+
+        Checkpoints store the archive in heap order along with each program's
+        fitness, so the heap is restored as is. Older checkpoints only store the
+        program IDs; their heap is rebuilt once the programs are loaded.
+        """
+        self.archive = set(program_ids)
+        self._archive_heap = []
+        self._archive_entries = {}
+        self._archive_sequence = 0
+
+        if fitness is None or len(fitness) != len(program_ids):
+            return
 
-        # Replace if new program is better
-        if self._is_better(program, worst_program):
-            self.archive.remove(worst_program.id)
-            self.archive.add(program.id)
+        # Sequence numbers follow heap positions, so ties keep the heap invariant
+        for value, program_id in zip(fitness, program_ids):
+            entry = (value, self._archive_sequence, program_id)
+            self._archive_sequence += 1
+            self._archive_heap.append(entry)
+            self._archive_entries[program_id] = entry
+        # Stores keep the archive unordered; heapify leaves a checkpoint's heap order as is
+        heapq.heapify(self._archive_heap)
+
+    def _rebuild_archive_heap(self) -> None:
+        """Build the archive heap from the archived programs"""
+        self._archive_heap = []
+        self._archive_entries = {}
+        for program_id in self.archive:
+            program = self.programs.get(program_id)
+            if program is None:
+                continue
+            entry = (self._archive_fitness(program), self._archive_sequence, program_id)
+            self._archive_sequence += 1
+            self._archive_heap.append(entry)
+            self._archive_entries[program_id] = entry
+        heapq.heapify(self._archive_heap)
 
     def _update_best_program(self, program: Program) -> None:
         """
@@ -512,6 +1576,107 @@ class ProgramDatabase:
             else:
                 logger.info(f"New best program {program.id} replaces {old_id}")
 
+    def _assign_cell(self, program_id: str, cell: Cell) -> None:
+        """Record the MAP-Elites cell a program falls into"""
+        previous = self._program_cells.get(program_id)
+        if previous is not None:
+            self._cell_members[previous].discard(program_id)
+        self._program_cells[program_id] = cell
+        self._cell_members.setdefault(cell, set()).add(program_id)
+
+    def _enforce_population_size(self) -> None:
+        """Evict programs until the population fits population_size"""
+        excess = len(self.programs) - self.config.population_size
+        if excess <= 0:
+            return
+
+        # The best program, the archive and the elite of each cell are never evicted
+        protected = set(self.archive)
+        protected.update(self.feature_grid.program_ids())
+        if self.best_program_id is not None:
+            protected.add(self.best_program_id)
+
+        # Stop as soon as every evictable program is taken, and skip the scan
+        # entirely when the protected programs make up the whole population
+        evictable = len(self.programs) - len(protected.intersection(self.programs))
+        limit = min(excess, evictable)
+        if limit <= 0:
+            return
+
+        policy = self.config.eviction_policy
+        if policy == "worst":
+            candidates = self._fitness_index.worst_first()
+        elif policy == "oldest":
+            candidates = iter(self.programs)
+        elif policy == "crowding":
+            candidates = self._crowded_first(protected)
+        else:
+            raise ValueError(f"Unknown eviction policy: {policy}")
+
+        evicted = []
+        for program_id in candidates:
+            if len(evicted) >= limit:
+                break
+            if program_id not in protected:
+                evicted.append(program_id)
+
+        for program_id in evicted:
+            self._remove_program(program_id)
+        if evicted and self._store is not None:
+            self._store.delete_programs(evicted)
+
+        if evicted:
+            logger.debug(f"Evicted {len(evicted)} programs ({policy} policy)")
+
+    def _crowded_first(self, protected: Set[str]) -> Iterator[str]:
+        """
+        Iterate over programs to evict for crowding, taking the weakest program
+        of the currently most crowded MAP-Elites cell each time
+        """
+        # Programs loaded from a checkpoint have no recorded cell yet
+        for program in self.programs.values():
+            if program.id not in self._program_cells:
+                self._assign_cell(program.id, tuple(self._calculate_feature_coords(program)))
+
+        sizes = {cell: len(members) for cell, members in self._cell_members.items() if members}
+        taken: Set[str] = set()
+        while sizes:
+            cell = max(sizes, key=sizes.get)
+            candidates = [
+                pid for pid in self._cell_members[cell] if pid not in protected and pid not in taken
+            ]
+            if not candidates:
+                del sizes[cell]
+                continue
+
+            program_id = min(candidates, key=self._fitness_index.score)
+            taken.add(program_id)
+            sizes[cell] -= 1
+            yield program_id
+
+    def _remove_program(self, program_id: str) -> None:
+        """Remove a program from the population and every structure referencing it"""
+        self.programs.pop(program_id, None)
+        for island in self.islands:
+            island.discard(program_id)
+
+        self._average_index.remove(program_id)
+        self._fitness_index.remove(program_id)
+        for index in self._metric_indexes.values():
+            index.remove(program_id)
+
+        cell = self._program_cells.pop(program_id, None)
+        if cell is not None:
+            self._cell_members[cell].discard(program_id)
+
+        self._dirty_program_ids.discard(program_id)
+        self._checkpoint_locations.pop(program_id, None)
+
+        if self.config.db_path and not is_store_path(self.config.db_path):
+            program_path = os.path.join(self.config.db_path, "programs", f"{program_id}.json")
+            if os.path.exists(program_path):
+                os.remove(program_path)
+
     def _sample_parent(self) -> Program:
         """
         Sample a parent program for the next evolution step
@@ -564,23 +1729,19 @@ class ProgramDatabase:
         # Add diverse programs
         if len(self.programs) > n and len(inspirations) < n:
             # Sample from different feature cells
-            feature_coords = self._calculate_feature_coords(parent)
-
-            # Get programs from nearby feature cells
-            nearby_programs = []
-            for _ in range(n - len(inspirations)):
-                # Perturb coordinates
-                perturbed_coords = [
-                    max(0, min(self.feature_bins - 1, c + random.randint(-1, 1)))
-                    for c in feature_coords
-                ]
-
-                # Try to get program from this cell
-                cell_key = self._feature_coords_to_key(perturbed_coords)
-                if cell_key in self.feature_map:
-                    program_id = self.feature_map[cell_key]
-                    if program_id != parent.id and program_id not in [p.id for p in inspirations]:
-                        nearby_programs.append(self.programs[program_id])
+            cell = self._program_cells.get(parent.id)
+            if cell is None:
+                cell = tuple(self._calculate_feature_coords(parent))
+
+            # Get the elites of the feature cells next to the parent's
+            excluded_ids = {parent.id}.union(p.id for p in inspirations)
+            neighbour_ids = [
+                pid for pid in self.feature_grid.neighbours(cell) if pid not in excluded_ids
+            ]
+            nearby_ids = random.sample(
+                neighbour_ids, min(n - len(inspirations), len(neighbour_ids))
+            )
+            nearby_programs = [self.programs[pid] for pid in nearby_ids]
 
             # If we need more, add random programs
             if len(inspirations) + len(nearby_programs) < n:
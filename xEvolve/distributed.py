@@ -0,0 +1,470 @@
+"""
+Distributed evaluation for xEvolve
+
+The coordinator runs inside the controller process and hands out
+``(program_id, code)`` jobs to worker processes over TCP. Workers may run on
+other hosts; each one loads the evaluation file locally, evaluates one program
+at a time and sends the metrics back.
+
+Messages are JSON objects, each prefixed with its length as a 4-byte
+big-endian integer:
+
+- worker -> coordinator: ``{"type": "hello", "worker": name, "token": token}``
+- coordinator -> worker: ``{"type": "config", "evaluator": {...}}``
+- coordinator -> worker: ``{"type": "job", "program_id": id, "code": code}``
+- worker -> coordinator: ``{"type": "result", "program_id": id, "metrics": {...}}``
+
+Start a worker with::
+
+    python -m xEvolve.distributed path/to/evaluator.py --host HOST --port PORT
+
+Workers receive program code and report metrics that drive the evolution, so
+a coordinator reachable from other hosts should set ``coordinator_token``.
+Workers then have to present the same token, passed with ``--token`` or the
+``XEVOLVE_WORKER_TOKEN`` environment variable; local workers get it from the
+coordinator.
+"""
+
+import argparse
+import asyncio
+import functools
+import hmac
+import itertools
+import json
+import logging
+import os
+import socket
+import struct
+import subprocess
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Optional
+
+from xEvolve.config import EvaluatorConfig
+from xEvolve.utils.async_utils import TaskDropped
+
+logger = logging.getLogger(__name__)
+
+_HEADER = struct.Struct(">I")
+
+# Environment variable holding the token workers present to the coordinator
+TOKEN_ENV = "XEVOLVE_WORKER_TOKEN"
+
+_LOOPBACK_HOSTS = ("127.0.0.1", "::1", "localhost")
+
+
+async def send_message(writer: asyncio.StreamWriter, message: Dict[str, Any]) -> None:
+    """
+    Send a length-prefixed JSON message
+
+    Args:
+        writer: Stream to write to
+        message: Message to send
+    """
+    payload = json.dumps(message).encode("utf-8")
+    writer.write(_HEADER.pack(len(payload)) + payload)
+    await writer.drain()
+
+
+async def read_message(reader: asyncio.StreamReader) -> Dict[str, Any]:
+    """
+    Read a length-prefixed JSON message
+
+    Args:
+        reader: Stream to read from
+
+    Returns:
+        Decoded message
+
+    Raises:
+        asyncio.IncompleteReadError: If the connection is closed
+    """
+    header = await reader.readexactly(_HEADER.size)
+    (length,) = _HEADER.unpack(header)
+    payload = await reader.readexactly(length)
+    return json.loads(payload.decode("utf-8"))
+
+
+@dataclass(order=True)
+class _Job:
+    """An evaluation waiting for or running on a worker, ordered by priority then submission"""
+
+    sort_priority: float
+    sequence: int
+    program_id: str = field(compare=False)
+    code: str = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+    timeouts: int = field(default=0, compare=False)
+
+
+class EvaluationCoordinator:
+    """
+    Dispatches evaluation jobs to connected worker processes
+
+    Jobs wait in a queue until a worker is free, highest priority first. A job
+    whose worker disconnects, or takes longer than the evaluation timeout, is
+    put back in the queue for another worker. A worker that timed out is
+    disconnected, and restarted if it is a local worker; a job that timed out
+    ``max_retries`` times fails. Jobs also fail once no worker has been
+    connected for the evaluation timeout, rather than waiting forever.
+    """
+
+    def __init__(self, config: EvaluatorConfig, evaluation_file: str):
+        self.config = config
+        self.evaluation_file = evaluation_file
+
+        self.host = config.coordinator_host
+        self.port = config.coordinator_port
+        self.token = config.coordinator_token
+        self.num_workers = 0
+
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._jobs: Optional[asyncio.PriorityQueue] = None
+        self._sequence = itertools.count()
+        self._worker_connected: Optional[asyncio.Condition] = None
+        self._start_lock: Optional[asyncio.Lock] = None
+        # Local worker processes by worker name
+        self._processes: Dict[str, subprocess.Popen] = {}
+        # Since when no worker has been connected, or None while any is
+        self._idle_since: Optional[float] = None
+
+    async def start(self) -> None:
+        """Start listening for workers and spawn the configured local workers"""
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+
+        async with self._start_lock:
+            if self._server is not None:
+                return
+
+            self._jobs = asyncio.PriorityQueue()
+            self._worker_connected = asyncio.Condition()
+            self._server = await asyncio.start_server(self._handle_worker, self.host, self.port)
+            self.port = self._server.sockets[0].getsockname()[1]
+
+            logger.info(f"Evaluation coordinator listening on {self.host}:{self.port}")
+            if self.token is None and self.host not in _LOOPBACK_HOSTS:
+                logger.warning(
+                    f"Evaluation coordinator on {self.host} accepts workers without a token; "
+                    f"any peer can receive program code and report metrics. "
+                    f"Set evaluator.coordinator_token to require one"
+                )
+
+            for i in range(self.config.num_local_workers):
+                name = f"local-{i}"
+                self._processes[name] = self._spawn_local_worker(name)
+
+            # Wait for the local workers so the first jobs are spread across all of them
+            if self._processes:
+                try:
+                    await asyncio.wait_for(
+                        self._wait_for_workers(len(self._processes)),
+                        timeout=self.config.timeout,
+                    )
+                except asyncio.TimeoutError:
+                    logger.warning(
+                        f"Only {self.num_workers}/{len(self._processes)} local workers connected"
+                    )
+            if self.num_workers == 0:
+                self._idle_since = time.monotonic()
+
+    async def evaluate(
+        self, program_code: str, program_id: str = "", priority: float = 0.0
+    ) -> Dict[str, float]:
+        """
+        Evaluate a program on the next free worker
+
+        Args:
+            program_code: Code to evaluate
+            program_id: Program ID
+            priority: Priority of the job (higher is handed out first)
+
+        Returns:
+            Dictionary of metric name to score
+
+        Raises:
+            TaskDropped: If the job was dropped while waiting for a worker
+        """
+        await self.start()
+
+        future = asyncio.get_running_loop().create_future()
+        await self._jobs.put(
+            _Job(-priority, next(self._sequence), program_id, program_code, future)
+        )
+
+        try:
+            while True:
+                done, _ = await asyncio.wait({future}, timeout=self.config.timeout)
+                if done:
+                    return future.result()
+
+                idle_since = self._idle_since
+                if idle_since is not None and time.monotonic() - idle_since >= self.config.timeout:
+                    # Workers skip jobs that are already done, so the job leaves the queue
+                    logger.error(
+                        f"No evaluation worker connected for {self.config.timeout}s, "
+                        f"failing program {program_id}"
+                    )
+                    future.set_result({"error": 0.0})
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+
+    def drop_pending(self, keep: int = 0) -> int:
+        """
+        Drop jobs still waiting for a worker, keeping only the highest-priority ones
+
+        Dropped jobs raise TaskDropped; jobs running on workers are not affected.
+
+        Args:
+            keep: Number of waiting jobs to keep
+
+        Returns:
+            Number of jobs dropped
+        """
+        if self._jobs is None:
+            return 0
+
+        waiting = []
+        while not self._jobs.empty():
+            job = self._jobs.get_nowait()
+            if not job.future.done():
+                waiting.append(job)
+        waiting.sort()
+
+        for job in waiting[keep:]:
+            job.future.set_exception(TaskDropped())
+        for job in waiting[:keep]:
+            self._jobs.put_nowait(job)
+        return len(waiting[keep:])
+
+    async def close(self) -> None:
+        """Stop accepting workers and terminate local worker processes"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+        processes = list(self._processes.values())
+        self._processes = {}
+        for process in processes:
+            if process.poll() is None:
+                process.terminate()
+        loop = asyncio.get_running_loop()
+        for process in processes:
+            try:
+                await loop.run_in_executor(None, functools.partial(process.wait, timeout=5))
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    async def _wait_for_workers(self, count: int) -> None:
+        """Wait until at least count workers are connected"""
+        async with self._worker_connected:
+            await self._worker_connected.wait_for(lambda: self.num_workers >= count)
+
+    async def _restart_local_worker(self, name: str) -> None:
+        """Replace the process of a stuck local worker with a new one"""
+        process = self._processes.get(name)
+        if process is None:
+            return
+
+        process.kill()
+        await asyncio.get_running_loop().run_in_executor(None, process.wait)
+        # Unless the coordinator was closed in the meantime
+        if self._processes.get(name) is process:
+            self._processes[name] = self._spawn_local_worker(name)
+            logger.info(f"Restarted local evaluation worker {name}")
+
+    def _spawn_local_worker(self, name: str) -> subprocess.Popen:
+        """Start a worker process on this host"""
+        host = self.host if self.host not in ("0.0.0.0", "") else "127.0.0.1"
+
+        # Make sure the worker can import this package even if it is not installed
+        package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(
+            path for path in (package_root, env.get("PYTHONPATH")) if path
+        )
+        # Passed in the environment rather than the command line, which other users can see
+        if self.token is not None:
+            env[TOKEN_ENV] = self.token
+
+        return subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "xEvolve.distributed",
+                self.evaluation_file,
+                "--host",
+                host,
+                "--port",
+                str(self.port),
+                "--name",
+                name,
+            ],
+            env=env,
+        )
+
+    async def _handle_worker(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Serve jobs to a single connected worker"""
+        job: Optional[_Job] = None
+        worker_name = "unknown"
+        registered = False
+        stuck = False
+
+        try:
+            hello = await read_message(reader)
+            worker_name = hello.get("worker", worker_name)
+            if self.token is not None and not hmac.compare_digest(
+                str(hello.get("token", "")).encode("utf-8"), self.token.encode("utf-8")
+            ):
+                logger.warning(f"Rejected evaluation worker {worker_name}: invalid token")
+                return
+
+            # Workers run the evaluation locally and without LLM feedback
+            worker_config = asdict(self.config)
+            worker_config.update(
+                distributed=False,
+                parallel_evaluations=1,
+                use_llm_feedback=False,
+                coordinator_token=None,
+            )
+            await send_message(writer, {"type": "config", "evaluator": worker_config})
+
+            async with self._worker_connected:
+                self.num_workers += 1
+                registered = True
+                self._idle_since = None
+                self._worker_connected.notify_all()
+            logger.info(f"Evaluation worker {worker_name} connected ({self.num_workers} total)")
+
+            while True:
+                job = await self._jobs.get()
+                if job.future.done():
+                    job = None
+                    continue
+
+                await send_message(
+                    writer, {"type": "job", "program_id": job.program_id, "code": job.code}
+                )
+                result = await asyncio.wait_for(read_message(reader), timeout=self.config.timeout)
+
+                if not job.future.done():
+                    job.future.set_result(result.get("metrics", {"error": 0.0}))
+                job = None
+
+        except asyncio.TimeoutError:
+            # The worker is stuck, so it gets no more jobs
+            stuck = True
+            job.timeouts += 1
+            logger.warning(
+                f"Evaluation worker {worker_name} timed out on program {job.program_id} "
+                f"({job.timeouts}/{self.config.max_retries}), disconnecting it"
+            )
+            if job.timeouts >= self.config.max_retries and not job.future.done():
+                job.future.set_result({"error": 0.0})
+        except (ConnectionError, asyncio.IncompleteReadError) as e:
+            logger.warning(f"Evaluation worker {worker_name} disconnected: {str(e)}")
+        finally:
+            if job is not None and not job.future.done():
+                # Hand the job to another worker
+                self._jobs.put_nowait(job)
+
+            if registered:
+                self.num_workers -= 1
+                if self.num_workers == 0:
+                    self._idle_since = time.monotonic()
+
+            writer.close()
+
+            if stuck:
+                await self._restart_local_worker(worker_name)
+
+
+async def run_worker(
+    evaluation_file: str, host: str, port: int, name: str, token: Optional[str] = None
+) -> None:
+    """
+    Connect to a coordinator and evaluate jobs until the connection closes
+
+    Args:
+        evaluation_file: Path to the evaluation file
+        host: Coordinator host
+        port: Coordinator port
+        name: Worker name used in logs
+        token: Token the coordinator requires, if any
+    """
+    from xEvolve.evaluator import Evaluator
+
+    reader, writer = await asyncio.open_connection(host, port)
+    await send_message(writer, {"type": "hello", "worker": name, "token": token})
+
+    try:
+        config_message = await read_message(reader)
+    except (ConnectionError, asyncio.IncompleteReadError):
+        logger.error(f"Worker {name} was rejected by the coordinator, check its token")
+        writer.close()
+        return
+    evaluator = Evaluator(EvaluatorConfig(**config_message["evaluator"]), evaluation_file)
+    logger.info(f"Worker {name} connected to coordinator at {host}:{port}")
+
+    try:
+        while True:
+            job = await read_message(reader)
+            if job.get("type") != "job":
+                continue
+
+            metrics = await evaluator.evaluate_program(job["code"], job["program_id"])
+            await send_message(
+                writer,
+                {"type": "result", "program_id": job["program_id"], "metrics": metrics},
+            )
+    except (ConnectionError, asyncio.IncompleteReadError):
+        logger.info(f"Worker {name} lost connection to coordinator, exiting")
+    finally:
+        writer.close()
+
+
+def main() -> int:
+    """
+    Entry point for evaluation worker processes
+
+    Returns:
+        Exit code
+    """
+    parser = argparse.ArgumentParser(description="xEvolve distributed evaluation worker")
+    parser.add_argument(
+        "evaluation_file", help="Path to the evaluation file containing an 'evaluate' function"
+    )
+    parser.add_argument("--host", help="Coordinator host", default="127.0.0.1")
+    parser.add_argument("--port", help="Coordinator port", type=int, required=True)
+    parser.add_argument(
+        "--name", help="Worker name", default=f"{socket.gethostname()}-{os.getpid()}"
+    )
+    parser.add_argument(
+        "--token",
+        help=f"Token the coordinator requires (defaults to the {TOKEN_ENV} environment variable)",
+        default=os.environ.get(TOKEN_ENV),
+    )
+    parser.add_argument(
+        "--log-level",
+        help="Logging level",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"],
+        default="INFO",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=getattr(logging, args.log_level),
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    asyncio.run(run_worker(args.evaluation_file, args.host, args.port, args.name, args.token))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
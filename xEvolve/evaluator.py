@@ -12,15 +12,44 @@ import sys
 import tempfile
 import time
 import uuid
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar, Union
 
+from xEvolve.cache import EvaluationCache, evaluation_key, file_hash
 from xEvolve.config import EvaluatorConfig
+from xEvolve.distributed import EvaluationCoordinator
 from xEvolve.llm.ensemble import LLMEnsemble
-from xEvolve.utils.async_utils import TaskPool, run_in_executor
+from xEvolve.utils.async_utils import PriorityTaskPool, TaskDropped, run_in_executor
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+# Called as should_continue(program_id, stage, metrics) after each cascade stage that
+# has a successor; returning False skips the remaining stages
+StageCallback = Callable[[str, int, Dict[str, float]], bool]
+
+
+@dataclass
+class _SharedEvaluation:
+    """An evaluation in flight and the callers waiting for it"""
+
+    program_id: str
+    future: Optional[asyncio.Future] = None
+    waiters: int = 0
+    # Programs of later callers with identical code, which get the evaluation's records too
+    coalesced_ids: List[str] = field(default_factory=list)
+    # Program and should_continue callback of every caller waiting for the evaluation
+    callbacks: List[Tuple[str, Optional[StageCallback]]] = field(default_factory=list)
+
+    def should_continue(self, program_id: str, stage: int, metrics: Dict[str, float]) -> bool:
+        """Continue the cascade unless the callback of every waiting caller says stop"""
+        return any(
+            callback is None or callback(waiter_id, stage, metrics)
+            for waiter_id, callback in self.callbacks
+        )
+
 
 class Evaluator:
     """
@@ -35,16 +64,46 @@ class Evaluator:
         config: EvaluatorConfig,
         evaluation_file: str,
         llm_ensemble: Optional[LLMEnsemble] = None,
+        task_pool: Optional[PriorityTaskPool] = None,
+        cache: Optional[EvaluationCache] = None,
+        random_seed: Optional[int] = None,
     ):
         self.config = config
         self.evaluation_file = evaluation_file
         self.llm_ensemble = llm_ensemble
 
-        # Create a task pool for parallel evaluation
-        self.task_pool = TaskPool(max_concurrency=config.parallel_evaluations)
+        # Results of earlier evaluations, keyed by program code, evaluator and seed
+        self.cache = cache
+        self.random_seed = random_seed
+
+        # Evaluations in flight by key, shared by callers evaluating identical code
+        self._in_flight: Dict[str, _SharedEvaluation] = {}
+        self.coalesced_evaluations = 0
+
+        # Create a task pool for parallel evaluation unless a shared one is given; pending
+        # evaluations get free slots in order of priority
+        self.task_pool = task_pool or PriorityTaskPool(max_concurrency=config.parallel_evaluations)
+
+        # Number of evaluations stopped early by a should_continue callback, and the
+        # stage each stopped program got to
+        self.cancelled_evaluations = 0
+        self._stopped_stages: Dict[str, int] = {}
+
+        # Seconds spent evaluating, summed over concurrent evaluations
+        self.total_evaluation_time = 0.0
+
+        # Per-program time spent in each evaluation phase, collected when enabled
+        self.record_timings = False
+        self._timings: Dict[str, Dict[str, float]] = {}
 
         # Set up evaluation function if file exists
         self._load_evaluation_function()
+        self._evaluator_hash = file_hash(evaluation_file)
+
+        # Hand evaluations to worker processes if configured
+        self.coordinator: Optional[EvaluationCoordinator] = None
+        if config.distributed:
+            self.coordinator = EvaluationCoordinator(config, evaluation_file)
 
         logger.info(f"Initialized evaluator with {evaluation_file}")
 
@@ -77,42 +136,193 @@ class Evaluator:
         self,
         program_code: str,
         program_id: str = "",
-    ) -> Dict[str, float]:
+        should_continue: Optional[StageCallback] = None,
+        priority: Optional[float] = None,
+    ) -> Optional[Dict[str, float]]:
         """
         Evaluate a program and return scores
 
+        Evaluations are limited to ``parallel_evaluations`` concurrent runs, or
+        with distributed evaluation to one per connected worker, so callers can
+        issue as many requests as they like. Waiting evaluations start in order
+        of priority, then in order of submission. With an
+        evaluation cache, programs evaluated before return their stored metrics
+        without taking a slot. A program whose identical code is already being
+        evaluated waits for that evaluation instead of starting another one, which
+        then only stops its cascade early if every waiting caller's should_continue
+        says so.
+
+        Args:
+            program_code: Code to evaluate
+            program_id: Optional ID for logging
+            should_continue: Optional callback deciding after each cascade stage
+                whether the remaining stages are worth running
+            priority: Optional priority of the evaluation (higher starts first)
+
+        Returns:
+            Dictionary of metric name to score, or None if the evaluation was
+            dropped from the queue before it started
+        """
+        program_id_str = f" {program_id}" if program_id else ""
+        key = evaluation_key(program_code, self._evaluator_hash, self.random_seed)
+
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                logger.info(f"Using cached evaluation of program{program_id_str}")
+                return cached
+
+        callback = (program_id, should_continue)
+        shared = self._in_flight.get(key)
+        if shared is None or shared.future.done():
+            shared = _SharedEvaluation(program_id, callbacks=[callback])
+            stage_callback = shared.should_continue if should_continue is not None else None
+            shared.future = asyncio.ensure_future(
+                self._evaluate_and_cache(key, program_code, program_id, stage_callback, priority)
+            )
+            self._in_flight[key] = shared
+            shared.future.add_done_callback(lambda _: self._finish_in_flight(key, shared))
+        else:
+            self.coalesced_evaluations += 1
+            shared.coalesced_ids.append(program_id)
+            shared.callbacks.append(callback)
+            logger.info(f"Program{program_id_str} waits for an identical evaluation in flight")
+
+        # The evaluation is only cancelled once every caller waiting for it is cancelled
+        shared.waiters += 1
+        try:
+            return await asyncio.shield(shared.future)
+        except asyncio.CancelledError:
+            if shared.waiters == 1:
+                shared.future.cancel()
+            if program_id in shared.coalesced_ids:
+                shared.coalesced_ids.remove(program_id)
+            shared.callbacks.remove(callback)
+            raise
+        finally:
+            shared.waiters -= 1
+
+    def _finish_in_flight(self, key: str, shared: _SharedEvaluation) -> None:
+        """
+        Remove a finished evaluation from the in-flight map
+
+        Runs before any waiting caller resumes, so the stage the evaluation
+        stopped at and its timings are recorded for every waiting program
+        before the first caller collects its own.
+        """
+        if self._in_flight.get(key) is shared:
+            del self._in_flight[key]
+        if shared.future.cancelled():
+            return
+
+        stage = self._stopped_stages.get(shared.program_id)
+        timings = self._timings.get(shared.program_id)
+        for program_id in shared.coalesced_ids:
+            if not program_id or program_id == shared.program_id:
+                continue
+            if stage is not None:
+                self._stopped_stages[program_id] = stage
+            if timings:
+                self._timings[program_id] = dict(timings)
+
+    async def _evaluate_and_cache(
+        self,
+        key: str,
+        program_code: str,
+        program_id: str,
+        should_continue: Optional[StageCallback],
+        priority: Optional[float],
+    ) -> Optional[Dict[str, float]]:
+        """Evaluate a program in the task pool and store its metrics in the cache"""
+        try:
+            if self.coordinator is not None:
+                # The coordinator queues remote jobs until a worker is free
+                metrics = await self._evaluate_program(
+                    program_code, program_id, should_continue, priority or 0.0
+                )
+            else:
+                metrics = await self.task_pool.run_with_priority(
+                    priority or 0.0,
+                    self._evaluate_program,
+                    program_code,
+                    program_id,
+                    should_continue,
+                )
+        except TaskDropped:
+            logger.info(f"Dropped pending evaluation of program {program_id}")
+            return None
+
+        # Failed evaluations may be transient and stopped ones are incomplete, so neither is kept
+        stopped = program_id in self._stopped_stages
+        if self.cache is not None and not stopped and "error" not in metrics:
+            self.cache.put(key, metrics)
+
+        return metrics
+
+    def drop_pending(self, keep: int = 0) -> int:
+        """
+        Drop evaluations that are still waiting for a slot, keeping the highest-priority ones
+
+        With distributed evaluation, jobs waiting for a worker are dropped the same way.
+
+        Args:
+            keep: Number of waiting evaluations to keep
+
+        Returns:
+            Number of evaluations dropped
+        """
+        dropped = self.task_pool.drop_pending(keep)
+        if self.coordinator is not None:
+            dropped += self.coordinator.drop_pending(keep)
+        return dropped
+
+    async def _evaluate_program(
+        self,
+        program_code: str,
+        program_id: str = "",
+        should_continue: Optional[StageCallback] = None,
+        priority: float = 0.0,
+    ) -> Dict[str, float]:
+        """
+        Evaluate a program without acquiring a slot in the task pool
+
         Args:
             program_code: Code to evaluate
             program_id: Optional ID for logging
+            should_continue: Optional callback deciding whether to run later cascade stages
+            priority: Priority of the job when evaluating on distributed workers
 
         Returns:
             Dictionary of metric name to score
+
+        Raises:
+            TaskDropped: If a distributed job was dropped while waiting for a worker
         """
         start_time = time.time()
 
-        # Create a temporary file for the program
-        with tempfile.NamedTemporaryFile(suffix=".py", delete=False) as temp_file:
-            temp_file.write(program_code.encode("utf-8"))
-            temp_file_path = temp_file.name
-
         try:
             # Run evaluation
-            if self.config.cascade_evaluation:
-                # Run cascade evaluation
-                metrics = await self._cascade_evaluate(temp_file_path)
+            if self.coordinator is not None:
+                metrics = await self._timed(
+                    program_id,
+                    "remote",
+                    self.coordinator.evaluate(program_code, program_id, priority),
+                )
             else:
-                # Run direct evaluation
-                metrics = await self._direct_evaluate(temp_file_path)
+                metrics = await self._evaluate_locally(program_code, program_id, should_continue)
 
             # Add LLM feedback if configured
             if self.config.use_llm_feedback and self.llm_ensemble:
-                feedback_metrics = await self._llm_evaluate(program_code)
+                feedback_metrics = await self._timed(
+                    program_id, "llm_feedback", self._llm_evaluate(program_code)
+                )
 
                 # Combine metrics
                 for name, value in feedback_metrics.items():
                     metrics[f"llm_{name}"] = value * self.config.llm_feedback_weight
 
             elapsed = time.time() - start_time
+            self.total_evaluation_time += elapsed
             program_id_str = f" {program_id}" if program_id else ""
             logger.info(
                 f"Evaluated program{program_id_str} in {elapsed:.2f}s: "
@@ -121,15 +331,94 @@ class Evaluator:
 
             return metrics
 
+        except TaskDropped:
+            raise
         except Exception as e:
+            self.total_evaluation_time += time.time() - start_time
             logger.error(f"Error evaluating program: {str(e)}")
             return {"error": 0.0}
 
+    async def _evaluate_locally(
+        self,
+        program_code: str,
+        program_id: str = "",
+        should_continue: Optional[StageCallback] = None,
+    ) -> Dict[str, float]:
+        """
+        Evaluate a program in this process using the evaluation file
+
+        Args:
+            program_code: Code to evaluate
+            program_id: Optional ID passed to should_continue
+            should_continue: Optional callback deciding whether to run later cascade stages
+
+        Returns:
+            Dictionary of metric name to score
+        """
+        # Create a temporary file for the program
+        with tempfile.NamedTemporaryFile(suffix=".py", delete=False) as temp_file:
+            temp_file.write(program_code.encode("utf-8"))
+            temp_file_path = temp_file.name
+
+        try:
+            if self.config.cascade_evaluation:
+                # Run cascade evaluation
+                return await self._cascade_evaluate(temp_file_path, program_id, should_continue)
+            else:
+                # Run direct evaluation
+                return await self._timed(
+                    program_id, "direct", self._direct_evaluate(temp_file_path)
+                )
+
         finally:
             # Clean up temporary file
             if os.path.exists(temp_file_path):
                 os.unlink(temp_file_path)
 
+    def pop_stopped_stage(self, program_id: str) -> Optional[int]:
+        """
+        Get and forget the cascade stage after which a program's evaluation was stopped
+
+        Args:
+            program_id: Program ID
+
+        Returns:
+            Number of the last stage run, or None if the evaluation was not stopped early
+        """
+        return self._stopped_stages.pop(program_id, None)
+
+    def pop_timings(self, program_id: str) -> Dict[str, float]:
+        """
+        Get and forget the time spent in each evaluation phase of a program
+
+        Phases are ``direct``, ``stage1`` to ``stage3``, ``remote`` and ``llm_feedback``.
+        Timings are only collected while ``record_timings`` is set.
+
+        Args:
+            program_id: Program ID
+
+        Returns:
+            Dictionary of phase name to seconds
+        """
+        return self._timings.pop(program_id, {})
+
+    async def _timed(self, program_id: str, phase: str, awaitable: Awaitable[T]) -> T:
+        """Await an evaluation phase and record how long it took"""
+        start_time = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            if self.record_timings and program_id:
+                phases = self._timings.setdefault(program_id, {})
+                phases[phase] = phases.get(phase, 0.0) + time.perf_counter() - start_time
+
+    async def close(self) -> None:
+        """Release evaluation resources such as distributed workers"""
+        if self.coordinator is not None:
+            await self.coordinator.close()
+        if self.cache is not None:
+            self.cache.close()
+
     @run_in_executor
     def _direct_evaluate(self, program_path: str) -> Dict[str, float]:
         """
@@ -156,12 +445,19 @@ class Evaluator:
             logger.error(f"Error in direct evaluation: {str(e)}")
             return {"error": 0.0}
 
-    async def _cascade_evaluate(self, program_path: str) -> Dict[str, float]:
+    async def _cascade_evaluate(
+        self,
+        program_path: str,
+        program_id: str = "",
+        should_continue: Optional[StageCallback] = None,
+    ) -> Dict[str, float]:
         """
         Run cascade evaluation with increasingly challenging test cases
 
         Args:
             program_path: Path to the program file
+            program_id: Optional ID passed to should_continue
+            should_continue: Optional callback deciding whether to run later stages
 
         Returns:
             Dictionary of metric name to score
@@ -181,7 +477,9 @@ class Evaluator:
 
             # Run first stage
             try:
-                stage1_result = await run_in_executor(module.evaluate_stage1)(program_path)
+                stage1_result = await self._timed(
+                    program_id, "stage1", run_in_executor(module.evaluate_stage1)(program_path)
+                )
                 if not isinstance(stage1_result, dict):
                     logger.warning(
                         f"Stage 1 evaluation returned non-dictionary result: {stage1_result}"
@@ -199,9 +497,14 @@ class Evaluator:
             if not hasattr(module, "evaluate_stage2"):
                 return stage1_result
 
+            if self._should_stop(should_continue, program_id, 1, stage1_result):
+                return stage1_result
+
             # Run second stage
             try:
-                stage2_result = await run_in_executor(module.evaluate_stage2)(program_path)
+                stage2_result = await self._timed(
+                    program_id, "stage2", run_in_executor(module.evaluate_stage2)(program_path)
+                )
                 if not isinstance(stage2_result, dict):
                     logger.warning(
                         f"Stage 2 evaluation returned non-dictionary result: {stage2_result}"
@@ -232,9 +535,14 @@ class Evaluator:
             if not hasattr(module, "evaluate_stage3"):
                 return result
 
+            if self._should_stop(should_continue, program_id, 2, result):
+                return result
+
             # Run third stage
             try:
-                stage3_result = await run_in_executor(module.evaluate_stage3)(program_path)
+                stage3_result = await self._timed(
+                    program_id, "stage3", run_in_executor(module.evaluate_stage3)(program_path)
+                )
                 if not isinstance(stage3_result, dict):
                     logger.warning(
                         f"Stage 3 evaluation returned non-dictionary result: {stage3_result}"
@@ -255,6 +563,41 @@ class Evaluator:
             logger.error(f"Error in cascade evaluation: {str(e)}")
             return {"error": 0.0}
 
+    def _should_stop(
+        self,
+        should_continue: Optional[StageCallback],
+        program_id: str,
+        stage: int,
+        metrics: Dict[str, float],
+    ) -> bool:
+        """
+        Ask the caller whether an evaluation should stop after a cascade stage
+
+        Args:
+            should_continue: Callback provided by the caller, if any
+            program_id: ID of the program being evaluated
+            stage: Number of the stage that just finished
+            metrics: Metrics collected so far
+
+        Returns:
+            True if the remaining stages should be skipped
+        """
+        if should_continue is None:
+            return False
+
+        try:
+            if should_continue(program_id, stage, metrics):
+                return False
+        except Exception as e:
+            logger.warning(f"Error in should_continue callback: {str(e)}")
+            return False
+
+        self.cancelled_evaluations += 1
+        self._stopped_stages[program_id] = stage
+        program_id_str = f" {program_id}" if program_id else ""
+        logger.info(f"Stopped evaluation of program{program_id_str} after stage {stage}")
+        return True
+
     async def _llm_evaluate(self, program_code: str) -> Dict[str, float]:
         """
         Use LLM to evaluate code quality
@@ -367,19 +710,24 @@ class Evaluator:
     async def evaluate_multiple(
         self,
         programs: List[Tuple[str, str]],
-    ) -> List[Dict[str, float]]:
+        should_continue: Optional[StageCallback] = None,
+        priorities: Optional[List[float]] = None,
+    ) -> List[Optional[Dict[str, float]]]:
         """
         Evaluate multiple programs in parallel
 
         Args:
             programs: List of (program_code, program_id) tuples
+            should_continue: Optional callback deciding whether to run later cascade stages
+            priorities: Optional priority of each program (higher starts first)
 
         Returns:
-            List of metric dictionaries
+            List of metric dictionaries, with None for evaluations that were dropped
         """
-        tasks = [
-            self.task_pool.create_task(self.evaluate_program, program_code, program_id)
-            for program_code, program_id in programs
-        ]
-
-        return await asyncio.gather(*tasks)
+        priorities = priorities or [None] * len(programs)
+        return await asyncio.gather(
+            *(
+                self.evaluate_program(program_code, program_id, should_continue, priority)
+                for (program_code, program_id), priority in zip(programs, priorities)
+            )
+        )
@@ -5,5 +5,6 @@ LLM module initialization
 from xEvolve.llm.base import LLMInterface
 from xEvolve.llm.ensemble import LLMEnsemble
 from xEvolve.llm.openai import OpenAILLM
+from xEvolve.llm.replay import LLMRecorder, RecordingLLM, ReplayLLM
 
-__all__ = ["LLMInterface", "OpenAILLM", "LLMEnsemble"]
+__all__ = ["LLMInterface", "OpenAILLM", "LLMEnsemble", "LLMRecorder", "RecordingLLM", "ReplayLLM"]
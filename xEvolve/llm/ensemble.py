@@ -10,6 +10,8 @@ from typing import Dict, List, Optional, Tuple
 from xEvolve.config import LLMConfig
 from xEvolve.llm.base import LLMInterface
 from xEvolve.llm.openai import OpenAILLM
+from xEvolve.llm.replay import LLMRecorder, RecordingLLM, ReplayLLM
+from xEvolve.utils.async_utils import TaskPool
 
 logger = logging.getLogger(__name__)
 
@@ -21,8 +23,20 @@ class LLMEnsemble:
         self.config = config
 
         # Initialize primary and secondary models
-        self.primary_model = OpenAILLM(config, model=config.primary_model)
-        self.secondary_model = OpenAILLM(config, model=config.secondary_model)
+        self.primary_model: LLMInterface
+        self.secondary_model: LLMInterface
+        if config.replay_path:
+            # Serve recorded responses offline; both models draw from the same log
+            self.primary_model = ReplayLLM(config.replay_path, config.replay_latency)
+            self.secondary_model = self.primary_model
+        else:
+            self.primary_model = OpenAILLM(config, model=config.primary_model)
+            self.secondary_model = OpenAILLM(config, model=config.secondary_model)
+
+            if config.record_path:
+                recorder = LLMRecorder(config.record_path)
+                self.primary_model = RecordingLLM(self.primary_model, recorder)
+                self.secondary_model = RecordingLLM(self.secondary_model, recorder)
 
         # Model weights for sampling
         self._weights = [
@@ -34,6 +48,15 @@ class LLMEnsemble:
         total = sum(self._weights)
         self._weights = [w / total for w in self._weights]
 
+        # Limit the number of concurrent in-flight requests across all models; with adaptive
+        # concurrency each model sizes its own window and this is only the upper bound
+        max_concurrency = (
+            config.max_parallel_requests
+            if config.adaptive_concurrency
+            else config.parallel_requests
+        )
+        self.task_pool = TaskPool(max_concurrency=max_concurrency)
+
         logger.info(
             f"Initialized LLM ensemble with models: "
             f"{config.primary_model} (weight: {self._weights[0]:.2f}), "
@@ -43,14 +66,49 @@ class LLMEnsemble:
     async def generate(self, prompt: str, **kwargs) -> str:
         """Generate text using a randomly selected model based on weights"""
         model = self._sample_model()
-        return await model.generate(prompt, **kwargs)
+        return await self.task_pool.run(model.generate, prompt, **kwargs)
 
     async def generate_with_context(
         self, system_message: str, messages: List[Dict[str, str]], **kwargs
     ) -> str:
         """Generate text using a system message and conversational context"""
         model = self._sample_model()
-        return await model.generate_with_context(system_message, messages, **kwargs)
+        return await self.task_pool.run(
+            model.generate_with_context, system_message, messages, **kwargs
+        )
+
+    async def generate_multiple_with_context(
+        self, system_message: str, messages: List[Dict[str, str]], n: int, **kwargs
+    ) -> List[str]:
+        """Generate n completions for the same context from a single sampled model"""
+        model = self._sample_model()
+        return await self.task_pool.run(
+            model.generate_multiple_with_context, system_message, messages, n, **kwargs
+        )
+
+    @property
+    def total_tokens(self) -> int:
+        """Total number of tokens used by all models of the ensemble"""
+        if self.secondary_model is self.primary_model:
+            return self.primary_model.total_tokens
+        return self.primary_model.total_tokens + self.secondary_model.total_tokens
+
+    @property
+    def concurrency_windows(self) -> Dict[str, float]:
+        """
+        Current adaptive concurrency window of each model (empty if not adaptive)
+
+        Windows are keyed by slot, ``primary`` and ``secondary``, since both
+        slots may use the same model name with separate windows.
+        """
+        windows = {}
+        for slot, model in (("primary", self.primary_model), ("secondary", self.secondary_model)):
+            if slot == "secondary" and model is self.primary_model:
+                break
+            window = getattr(model, "concurrency_window", None)
+            if window is not None:
+                windows[slot] = window
+        return windows
 
     def _sample_model(self) -> LLMInterface:
         """Sample a model from the ensemble based on weights"""
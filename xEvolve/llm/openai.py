@@ -3,6 +3,7 @@ OpenAI API interface for LLMs
 """
 
 import asyncio
+import contextvars
 import logging
 import time
 from typing import Any, Dict, List, Optional, Union
@@ -11,6 +12,7 @@ import openai
 
 from xEvolve.config import LLMConfig
 from xEvolve.llm.base import LLMInterface
+from xEvolve.utils.async_utils import AdaptiveConcurrencyLimiter
 
 logger = logging.getLogger(__name__)
 
@@ -26,12 +28,26 @@ class OpenAILLM(LLMInterface):
         self.config = config
         self.model = model or config.primary_model
 
-        # Set up API client
+        # Set up API client. Retries are made by generate_with_context, so that rate limit
+        # errors reach the adaptive concurrency limiter instead of being retried by the client
         self.client = openai.OpenAI(
             api_key=config.api_key,
             base_url=config.api_base,
+            max_retries=0,
         )
 
+        # Token usage reported by the API
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+        # Adapt the number of concurrent requests to this model to how the provider copes
+        self.limiter: Optional[AdaptiveConcurrencyLimiter] = None
+        if config.adaptive_concurrency:
+            self.limiter = AdaptiveConcurrencyLimiter(
+                initial=config.parallel_requests,
+                maximum=config.max_parallel_requests,
+            )
+
         logger.info(f"Initialized OpenAI LLM with model: {self.model}")
 
     async def generate(self, prompt: str, **kwargs) -> str:
@@ -46,6 +62,31 @@ class OpenAILLM(LLMInterface):
         self, system_message: str, messages: List[Dict[str, str]], **kwargs
     ) -> str:
         """Generate text using a system message and conversational context"""
+        responses = await self._generate(system_message, messages, n=1, **kwargs)
+        return responses[0]
+
+    async def generate_multiple_with_context(
+        self, system_message: str, messages: List[Dict[str, str]], n: int, **kwargs
+    ) -> List[str]:
+        """
+        Generate n completions for the same context
+
+        The completions are requested with the API's ``n`` parameter, so the
+        prompt is only sent (and billed) once. Providers that ignore ``n`` are
+        topped up with additional requests.
+        """
+        responses: List[str] = []
+        while len(responses) < n:
+            batch = await self._generate(system_message, messages, n=n - len(responses), **kwargs)
+            if not batch:
+                break
+            responses.extend(batch)
+        return responses[:n]
+
+    async def _generate(
+        self, system_message: str, messages: List[Dict[str, str]], n: int = 1, **kwargs
+    ) -> List[str]:
+        """Request up to n completions for a context, retrying on failure"""
         # Prepare messages with system message
         formatted_messages = [{"role": "system", "content": system_message}]
         formatted_messages.extend(messages)
@@ -69,6 +110,9 @@ class OpenAILLM(LLMInterface):
                 "max_tokens": kwargs.get("max_tokens", self.config.max_tokens),
             }
 
+        if n > 1:
+            params["n"] = n
+
         # Attempt the API call with retries
         retries = kwargs.get("retries", self.config.retries)
         retry_delay = kwargs.get("retry_delay", self.config.retry_delay)
@@ -76,7 +120,7 @@ class OpenAILLM(LLMInterface):
 
         for attempt in range(retries + 1):
             try:
-                response = await asyncio.wait_for(self._call_api(params), timeout=timeout)
+                response = await self._call_api_limited(params, timeout)
                 return response
             except asyncio.TimeoutError:
                 if attempt < retries:
@@ -95,13 +139,46 @@ class OpenAILLM(LLMInterface):
                     logger.error(f"All {retries + 1} attempts failed with error: {str(e)}")
                     raise
 
-    async def _call_api(self, params: Dict[str, Any]) -> str:
-        """Make the actual API call"""
+    @property
+    def concurrency_window(self) -> Optional[float]:
+        """Current adaptive concurrency window, or None if concurrency is not adaptive"""
+        return self.limiter.window if self.limiter is not None else None
+
+    async def _call_api_limited(self, params: Dict[str, Any], timeout: float) -> List[str]:
+        """Make the API call within the adaptive concurrency window, if enabled"""
+        if self.limiter is None:
+            return await asyncio.wait_for(self._call_api(params), timeout=timeout)
+
+        async with self.limiter.slot() as slot:
+            start_time = time.monotonic()
+            try:
+                response = await asyncio.wait_for(self._call_api(params), timeout=timeout)
+            except (asyncio.TimeoutError, openai.RateLimitError, openai.APITimeoutError):
+                slot.overload()
+                raise
+            slot.succeeded(time.monotonic() - start_time)
+            return response
+
+    @property
+    def total_tokens(self) -> int:
+        """Total number of tokens used by this model"""
+        return self.prompt_tokens + self.completion_tokens
+
+    async def _call_api(self, params: Dict[str, Any]) -> List[str]:
+        """Make the actual API call and return the content of every choice"""
         # Use asyncio to run the blocking API call in a thread pool
         loop = asyncio.get_event_loop()
+        # Log records of the client (retries, errors) keep the run they belong to
+        context = contextvars.copy_context()
         response = await loop.run_in_executor(
-            None, lambda: self.client.chat.completions.create(**params)
+            None, lambda: context.run(self.client.chat.completions.create, **params)
         )
 
+        # Track token usage if the provider reports it
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            self.prompt_tokens += usage.prompt_tokens or 0
+            self.completion_tokens += usage.completion_tokens or 0
+
         # Extract the response content
-        return response.choices[0].message.content
+        return [choice.message.content for choice in response.choices]
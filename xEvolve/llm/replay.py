@@ -0,0 +1,231 @@
+"""
+Record and replay of LLM responses
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import defaultdict, deque
+from typing import Any, Deque, Dict, List, Optional
+
+from xEvolve.llm.base import LLMInterface
+
+logger = logging.getLogger(__name__)
+
+
+def prompt_key(system_message: str, messages: List[Dict[str, str]]) -> str:
+    """
+    Hash a prompt so recorded responses can be found again
+
+    The model is not part of the key, since the ensemble samples models at
+    random and a replayed run may pick a different one for the same prompt.
+
+    Args:
+        system_message: System message
+        messages: Conversation messages
+
+    Returns:
+        Hex digest identifying the prompt
+    """
+    payload = json.dumps({"system": system_message, "messages": messages}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMRecorder:
+    """
+    Appends prompt/response pairs to a JSONL log
+
+    Only a hash of each prompt is stored, which keeps the log small. Each line
+    looks like::
+
+        {"seq": 0, "key": "3f1c...", "model": "gpt-4o", "latency": 2.4, "responses": ["..."]}
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._seq = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+    def record(
+        self,
+        system_message: str,
+        messages: List[Dict[str, str]],
+        model: Optional[str],
+        responses: List[str],
+        latency: float,
+    ) -> None:
+        """
+        Append the responses to a prompt to the log
+
+        Args:
+            system_message: System message of the prompt
+            messages: Conversation messages of the prompt
+            model: Name of the model that answered
+            responses: Responses returned for the prompt
+            latency: Seconds the request took
+        """
+        entry = {
+            "seq": self._seq,
+            "key": prompt_key(system_message, messages),
+            "model": model,
+            "latency": latency,
+            "responses": responses,
+        }
+        self._seq += 1
+
+        with open(self.path, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+
+
+class RecordingLLM(LLMInterface):
+    """Wraps a model and records every response it returns"""
+
+    def __init__(self, model: LLMInterface, recorder: LLMRecorder):
+        self.model = model
+        self.recorder = recorder
+
+    async def generate(self, prompt: str, **kwargs) -> str:
+        """Generate text from a prompt"""
+        return await self.generate_with_context(
+            system_message="", messages=[{"role": "user", "content": prompt}], **kwargs
+        )
+
+    async def generate_with_context(
+        self, system_message: str, messages: List[Dict[str, str]], **kwargs
+    ) -> str:
+        """Generate text using a system message and conversational context"""
+        start_time = time.time()
+        response = await self.model.generate_with_context(system_message, messages, **kwargs)
+        self._record(system_message, messages, [response], time.time() - start_time)
+        return response
+
+    async def generate_multiple_with_context(
+        self, system_message: str, messages: List[Dict[str, str]], n: int, **kwargs
+    ) -> List[str]:
+        """Generate n completions for the same context"""
+        start_time = time.time()
+        responses = await self.model.generate_multiple_with_context(
+            system_message, messages, n, **kwargs
+        )
+        self._record(system_message, messages, responses, time.time() - start_time)
+        return responses
+
+    @property
+    def concurrency_window(self) -> Optional[float]:
+        """Adaptive concurrency window of the wrapped model, if any"""
+        return getattr(self.model, "concurrency_window", None)
+
+    @property
+    def total_tokens(self) -> int:
+        """Total number of tokens used by the wrapped model"""
+        return getattr(self.model, "total_tokens", 0)
+
+    def _record(
+        self,
+        system_message: str,
+        messages: List[Dict[str, str]],
+        responses: List[str],
+        latency: float,
+    ) -> None:
+        try:
+            self.recorder.record(
+                system_message, messages, getattr(self.model, "model", None), responses, latency
+            )
+        except OSError as e:
+            logger.warning(f"Failed to record LLM response: {str(e)}")
+
+
+class ReplayLLM(LLMInterface):
+    """
+    Serves responses from a log written by LLMRecorder, without any network access
+
+    A prompt is answered with the next unused response recorded for the same
+    prompt hash. Prompts that were never recorded, e.g. because the run took a
+    different path, fall back to the next unused response in recording order.
+    """
+
+    def __init__(self, path: str, replay_latency: bool = False):
+        self.path = path
+        self.replay_latency = replay_latency
+
+        self._entries: List[Dict[str, Any]] = []
+        self._by_key: Dict[str, Deque[int]] = defaultdict(deque)
+        self._used: List[bool] = []
+        self._next_seq = 0
+
+        self.hits = 0
+        self.misses = 0
+
+        with open(path, "r") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                entry = json.loads(line)
+                self._by_key[entry["key"]].append(len(self._entries))
+                self._entries.append(entry)
+                self._used.append(False)
+
+        logger.info(f"Loaded {len(self._entries)} recorded LLM responses from {path}")
+
+    async def generate(self, prompt: str, **kwargs) -> str:
+        """Generate text from a prompt"""
+        return await self.generate_with_context(
+            system_message="", messages=[{"role": "user", "content": prompt}], **kwargs
+        )
+
+    async def generate_with_context(
+        self, system_message: str, messages: List[Dict[str, str]], **kwargs
+    ) -> str:
+        """Replay the response recorded for a prompt"""
+        responses = await self.generate_multiple_with_context(system_message, messages, 1)
+        return responses[0]
+
+    async def generate_multiple_with_context(
+        self, system_message: str, messages: List[Dict[str, str]], n: int, **kwargs
+    ) -> List[str]:
+        """Replay n responses recorded for a prompt"""
+        key = prompt_key(system_message, messages)
+
+        responses: List[str] = []
+        latency = 0.0
+        while len(responses) < n:
+            entry = self._take(key)
+            responses.extend(entry["responses"])
+            latency = max(latency, entry.get("latency", 0.0))
+
+        if self.replay_latency and latency > 0:
+            await asyncio.sleep(latency)
+
+        return responses[:n]
+
+    @property
+    def total_tokens(self) -> int:
+        """Replayed responses use no tokens"""
+        return 0
+
+    def _take(self, key: str) -> Dict[str, Any]:
+        """Take the next unused entry for a key, or the next unused entry overall"""
+        candidates = self._by_key.get(key)
+        while candidates:
+            index = candidates.popleft()
+            if not self._used[index]:
+                self.hits += 1
+                return self._use(index)
+
+        while self._next_seq < len(self._entries) and self._used[self._next_seq]:
+            self._next_seq += 1
+        if self._next_seq >= len(self._entries):
+            raise RuntimeError(f"Replay log {self.path} has no responses left")
+
+        self.misses += 1
+        return self._use(self._next_seq)
+
+    def _use(self, index: int) -> Dict[str, Any]:
+        self._used[index] = True
+        return self._entries[index]
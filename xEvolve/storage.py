@@ -0,0 +1,689 @@
+"""
+Storage backends for the program database
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+from xEvolve.utils.async_utils import BackgroundWriter
+
+logger = logging.getLogger(__name__)
+
+SQLITE_EXTENSIONS = (".sqlite", ".sqlite3", ".db")
+SEGMENT_LOG_EXTENSION = ".log"
+
+# Segment logs open in this process; a second store appending to one would corrupt it
+_open_segment_logs: Set[str] = set()
+_open_segment_logs_lock = threading.Lock()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS programs (
+    id TEXT PRIMARY KEY,
+    code TEXT NOT NULL,
+    language TEXT,
+    parent_id TEXT,
+    generation INTEGER,
+    timestamp REAL,
+    iteration_found INTEGER,
+    complexity REAL,
+    diversity REAL,
+    metadata TEXT,
+    fitness REAL
+);
+CREATE INDEX IF NOT EXISTS programs_fitness ON programs (fitness);
+CREATE INDEX IF NOT EXISTS programs_iteration ON programs (iteration_found);
+CREATE INDEX IF NOT EXISTS programs_parent ON programs (parent_id);
+
+CREATE TABLE IF NOT EXISTS metrics (
+    program_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    value REAL,
+    PRIMARY KEY (program_id, name)
+);
+
+CREATE TABLE IF NOT EXISTS islands (
+    program_id TEXT PRIMARY KEY,
+    island INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS archive (
+    program_id TEXT PRIMARY KEY,
+    fitness REAL
+);
+
+CREATE TABLE IF NOT EXISTS feature_map (
+    cell TEXT PRIMARY KEY,
+    program_id TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+PROGRAM_COLUMNS = (
+    "id",
+    "code",
+    "language",
+    "parent_id",
+    "generation",
+    "timestamp",
+    "iteration_found",
+    "complexity",
+    "diversity",
+)
+
+# Database state stored as JSON in the state table
+STATE_KEYS = ("best_program_id", "last_iteration", "pending_candidates")
+
+
+def is_sqlite_path(path: str) -> bool:
+    """Check whether a database path names a SQLite file rather than a directory"""
+    return path.lower().endswith(SQLITE_EXTENSIONS)
+
+
+def is_segment_log_path(path: str) -> bool:
+    """Check whether a database path names a segment log directory"""
+    return path.rstrip("/\\").lower().endswith(SEGMENT_LOG_EXTENSION)
+
+
+def snapshot_changes(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Express a full database state as state changes, as passed to save_programs
+
+    Args:
+        metadata: Database state, as stored in checkpoint metadata
+
+    Returns:
+        Changes setting every feature map cell and archive member of the state
+    """
+    changes = {key: metadata[key] for key in STATE_KEYS if key in metadata}
+    changes["feature_map"] = dict(metadata.get("feature_map", {}))
+    changes["archive"] = dict(zip(metadata.get("archive", []), metadata.get("archive_fitness", [])))
+    return changes
+
+
+def is_store_path(path: str) -> bool:
+    """Check whether a database path is kept by a store rather than as JSON files"""
+    return is_sqlite_path(path) or is_segment_log_path(path)
+
+
+def open_store(path: str, **kwargs: Any) -> "ProgramStore":
+    """
+    Open the store for a database path
+
+    Args:
+        path: Path for which is_store_path is true
+        **kwargs: Options of the segment log store
+
+    Returns:
+        Store keeping the path
+    """
+    if is_sqlite_path(path):
+        return SQLiteProgramStore(path)
+    return SegmentLogStore(path, **kwargs)
+
+
+class SQLiteProgramStore:
+    """
+    Stores the programs and state of a ProgramDatabase in a SQLite file
+
+    Programs, their metrics, island membership, the archive and the
+    MAP-Elites feature map each get a table. Only the rows a change touches
+    are written. Programs are indexed by
+    fitness, iteration and parent, so the file can be queried without loading
+    it. The file is in WAL mode, so other processes can read it safely while
+    a run writes to it, e.g.::
+
+        SELECT id, fitness FROM programs ORDER BY fitness DESC LIMIT 10
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def save_programs(
+        self,
+        programs: List[Dict[str, Any]],
+        islands: Dict[str, int],
+        changes: Dict[str, Any],
+    ) -> None:
+        """
+        Store new or updated programs together with the changes to the database state
+
+        Args:
+            programs: Program dictionaries (as from Program.to_dict) with a "fitness" key
+            islands: Island index of each program
+            changes: Changed feature map cells (cell key to program ID, None once
+                emptied), changed archive members (program ID to fitness, None once
+                removed) and the values of the other state keys that changed
+        """
+        with self._transaction():
+            self._insert_programs(programs)
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO islands (program_id, island) VALUES (?, ?)",
+                islands.items(),
+            )
+            self._apply_changes(changes)
+
+    def delete_programs(self, program_ids: Iterable[str]) -> None:
+        """Delete programs and everything referencing them"""
+        rows = [(program_id,) for program_id in program_ids]
+        with self._transaction():
+            self._conn.executemany("DELETE FROM programs WHERE id = ?", rows)
+            self._conn.executemany("DELETE FROM metrics WHERE program_id = ?", rows)
+            self._conn.executemany("DELETE FROM islands WHERE program_id = ?", rows)
+            self._conn.executemany("DELETE FROM archive WHERE program_id = ?", rows)
+            self._conn.executemany("DELETE FROM feature_map WHERE program_id = ?", rows)
+
+    def write_snapshot(self, programs: List[Dict[str, Any]], metadata: Dict[str, Any]) -> None:
+        """
+        Replace the whole contents of the file with a database snapshot
+
+        Args:
+            programs: Program dictionaries with a "fitness" key
+            metadata: Database state, as stored in checkpoint metadata
+        """
+        islands = {
+            program_id: island_idx
+            for island_idx, island in enumerate(metadata.get("islands", []))
+            for program_id in island
+        }
+        with self._transaction():
+            for table in ("programs", "metrics", "islands", "archive", "feature_map"):
+                self._conn.execute(f"DELETE FROM {table}")
+            self._insert_programs(programs)
+            self._conn.executemany(
+                "INSERT INTO islands (program_id, island) VALUES (?, ?)", islands.items()
+            )
+            self._apply_changes(snapshot_changes(metadata))
+
+    def read(self) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Read every program and the database state
+
+        Returns:
+            Tuple of (program dictionaries, metadata in the checkpoint metadata format)
+        """
+        metrics: Dict[str, Dict[str, float]] = {}
+        for program_id, name, value in self._conn.execute(
+            "SELECT program_id, name, value FROM metrics"
+        ):
+            metrics.setdefault(program_id, {})[name] = value
+
+        programs = []
+        for row in self._conn.execute(
+            f"SELECT {', '.join(PROGRAM_COLUMNS)}, metadata FROM programs"
+        ):
+            program = dict(zip(PROGRAM_COLUMNS, row))
+            program["metadata"] = json.loads(row[-1]) if row[-1] else {}
+            program["metrics"] = metrics.get(program["id"], {})
+            programs.append(program)
+
+        islands: List[List[str]] = []
+        for program_id, island_idx in self._conn.execute("SELECT program_id, island FROM islands"):
+            while len(islands) <= island_idx:
+                islands.append([])
+            islands[island_idx].append(program_id)
+
+        archive = self._conn.execute("SELECT program_id, fitness FROM archive").fetchall()
+
+        metadata: Dict[str, Any] = {
+            "feature_map": dict(self._conn.execute("SELECT cell, program_id FROM feature_map")),
+            "islands": islands,
+            "archive": [program_id for program_id, _ in archive],
+            "archive_fitness": [fitness for _, fitness in archive],
+        }
+        for key, value in self._conn.execute("SELECT key, value FROM state"):
+            metadata[key] = json.loads(value)
+
+        return programs, metadata
+
+    def close(self) -> None:
+        """Close the file"""
+        self._conn.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        """Run a block of statements as one transaction"""
+        self._conn.execute("BEGIN")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def _insert_programs(self, programs: List[Dict[str, Any]]) -> None:
+        placeholders = ", ".join("?" * (len(PROGRAM_COLUMNS) + 2))
+        self._conn.executemany(
+            f"INSERT OR REPLACE INTO programs ({', '.join(PROGRAM_COLUMNS)}, metadata, fitness) "
+            f"VALUES ({placeholders})",
+            (
+                [program[column] for column in PROGRAM_COLUMNS]
+                + [json.dumps(program.get("metadata") or {}), program.get("fitness")]
+                for program in programs
+            ),
+        )
+
+        rows = [(program["id"],) for program in programs]
+        self._conn.executemany("DELETE FROM metrics WHERE program_id = ?", rows)
+        self._conn.executemany(
+            "INSERT INTO metrics (program_id, name, value) VALUES (?, ?, ?)",
+            (
+                (program["id"], name, value)
+                for program in programs
+                for name, value in program["metrics"].items()
+            ),
+        )
+
+    def _apply_changes(self, changes: Dict[str, Any]) -> None:
+        """Upsert and delete the changed rows of the archive, feature map and state tables"""
+        cells = changes.get("feature_map", {})
+        self._conn.executemany(
+            "INSERT INTO feature_map (cell, program_id) VALUES (?, ?) "
+            "ON CONFLICT (cell) DO UPDATE SET program_id = excluded.program_id",
+            ((cell, program_id) for cell, program_id in cells.items() if program_id is not None),
+        )
+        self._conn.executemany(
+            "DELETE FROM feature_map WHERE cell = ?",
+            ((cell,) for cell, program_id in cells.items() if program_id is None),
+        )
+
+        archive = changes.get("archive", {})
+        self._conn.executemany(
+            "INSERT INTO archive (program_id, fitness) VALUES (?, ?) "
+            "ON CONFLICT (program_id) DO UPDATE SET fitness = excluded.fitness",
+            (
+                (program_id, fitness)
+                for program_id, fitness in archive.items()
+                if fitness is not None
+            ),
+        )
+        self._conn.executemany(
+            "DELETE FROM archive WHERE program_id = ?",
+            ((program_id,) for program_id, fitness in archive.items() if fitness is None),
+        )
+
+        self._conn.executemany(
+            "INSERT INTO state (key, value) VALUES (?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+            ((key, json.dumps(changes[key])) for key in STATE_KEYS if key in changes),
+        )
+
+
+class SegmentLogStore:
+    """
+    Stores the programs and state of a ProgramDatabase in an append-only log
+
+    The log is a directory of numbered segment files. Each change is appended
+    as a record: a 4-byte length and a 4-byte CRC32, both big-endian, followed
+    by the record as compact JSON. Records add a program (with its island),
+    delete programs, change the database state (only the feature map cells,
+    archive members and other state keys that changed), or reset everything
+    before them. Appends are flushed to the OS right away and fsynced at most every
+    ``fsync_interval`` seconds, so a process crash loses nothing and a machine
+    crash loses at most the records of that interval. A torn record at the end
+    of the log is truncated when the log is opened.
+
+    Once the log holds more superseded entries than live ones, compact()
+    rewrites the live state into a single segment on a background thread while
+    new records go to a fresh segment.
+    """
+
+    _HEADER = struct.Struct(">II")
+
+    def __init__(
+        self,
+        path: str,
+        segment_size: int = 16 * 1024 * 1024,
+        fsync_interval: float = 1.0,
+        compaction_threshold: int = 1000,
+    ):
+        self.path = path
+        self.segment_size = segment_size
+        self.fsync_interval = fsync_interval
+        self.compaction_threshold = compaction_threshold
+
+        self._real_path = os.path.realpath(path)
+        with _open_segment_logs_lock:
+            if self._real_path in _open_segment_logs:
+                raise RuntimeError(f"Segment log {path} is already open")
+            _open_segment_logs.add(self._real_path)
+
+        os.makedirs(path, exist_ok=True)
+        for name in os.listdir(path):
+            if name.endswith(".tmp"):
+                # Left behind by a compaction that did not finish
+                os.remove(os.path.join(path, name))
+
+        # Entries (programs, cells, archive members and state keys) in the log, how many of
+        # them later entries superseded, and the keys of the live state entries
+        self._record_count = 0
+        self._garbage = 0
+        self._live_keys: Set[str] = set()
+
+        self._compactor: Optional[BackgroundWriter] = None
+        self._compacting = threading.Event()
+
+        segments = self._segments()
+        self._active = segments[-1] if segments else 0
+        if segments:
+            self._recover(self._segment_path(self._active))
+        self._file = open(self._segment_path(self._active), "ab")
+        self._last_sync = time.monotonic()
+
+    @property
+    def needs_compaction(self) -> bool:
+        """Whether superseded entries outnumber live ones enough to compact the log"""
+        live = self._record_count - self._garbage
+        return not self._compacting.is_set() and self._garbage > max(
+            self.compaction_threshold, live
+        )
+
+    def save_programs(
+        self,
+        programs: List[Dict[str, Any]],
+        islands: Dict[str, int],
+        changes: Dict[str, Any],
+    ) -> None:
+        """
+        Append new programs together with the changes to the database state
+
+        Args:
+            programs: Program dictionaries (as from Program.to_dict)
+            islands: Island index of each program
+            changes: State changes, as passed to SQLiteProgramStore.save_programs
+        """
+        records = [
+            {"op": "add", "program": program, "island": islands.get(program["id"])}
+            for program in programs
+        ]
+        records.append({"op": "state", "changes": changes})
+        self._append(records)
+        self._record_count += len(programs)
+        self._count_state(changes)
+
+    def delete_programs(self, program_ids: Iterable[str]) -> None:
+        """Append the deletion of programs"""
+        program_ids = list(program_ids)
+        self._append([{"op": "delete", "ids": program_ids}])
+        # The deletions and the entries adding the programs are now superseded
+        self._record_count += len(program_ids)
+        self._garbage += 2 * len(program_ids)
+
+    def write_snapshot(self, programs: List[Dict[str, Any]], metadata: Dict[str, Any]) -> None:
+        """
+        Replace the whole contents of the log with a database snapshot
+
+        Args:
+            programs: Program dictionaries
+            metadata: Database state, as stored in checkpoint metadata
+        """
+        # A running compaction must not replace segments written after this snapshot
+        if self._compactor is not None:
+            self._compactor.flush()
+        changes = snapshot_changes(metadata)
+        self._write_compacted(self._seal(), programs, metadata, changes)
+        self._reset_counts(programs, changes)
+
+    def compact(self, programs: List[Dict[str, Any]], metadata: Dict[str, Any]) -> None:
+        """
+        Rewrite the log as a snapshot of the live programs on a background thread
+
+        Args:
+            programs: Program dictionaries of every live program
+            metadata: Database state, as stored in checkpoint metadata
+        """
+        if self._compacting.is_set():
+            return
+        self._compacting.set()
+
+        if self._compactor is None:
+            self._compactor = BackgroundWriter(name="segment-log-compactor")
+        changes = snapshot_changes(metadata)
+        self._compactor.submit(self._compact, self._seal(), programs, metadata, changes)
+        self._reset_counts(programs, changes)
+
+    def read(self) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Replay the log
+
+        Returns:
+            Tuple of (program dictionaries, metadata in the checkpoint metadata format)
+        """
+        programs: Dict[str, Dict[str, Any]] = {}
+        islands: Dict[str, int] = {}
+        feature_map: Dict[str, str] = {}
+        archive: Dict[str, float] = {}
+        state: Dict[str, Any] = {}
+        self._record_count = self._garbage = 0
+        self._live_keys = set()
+
+        for segment in self._segments():
+            for record in self._records(self._segment_path(segment)):
+                op = record["op"]
+                if op == "add":
+                    program = record["program"]
+                    self._record_count += 1
+                    self._garbage += program["id"] in programs
+                    programs[program["id"]] = program
+                    if record.get("island") is not None:
+                        islands[program["id"]] = record["island"]
+                elif op == "delete":
+                    for program_id in record["ids"]:
+                        self._record_count += 1
+                        self._garbage += 1 + (programs.pop(program_id, None) is not None)
+                        islands.pop(program_id, None)
+                elif op == "state":
+                    changes = record["changes"]
+                    for target, section in ((feature_map, "feature_map"), (archive, "archive")):
+                        for key, value in changes.get(section, {}).items():
+                            if value is None:
+                                target.pop(key, None)
+                            else:
+                                target[key] = value
+                    state.update((key, changes[key]) for key in STATE_KEYS if key in changes)
+                    self._count_state(changes)
+                elif op == "reset":
+                    self._garbage = self._record_count
+                    self._live_keys.clear()
+                    for collection in (programs, islands, feature_map, archive, state):
+                        collection.clear()
+
+        island_lists: List[List[str]] = []
+        for program_id, island_idx in islands.items():
+            while len(island_lists) <= island_idx:
+                island_lists.append([])
+            island_lists[island_idx].append(program_id)
+
+        metadata = dict(state)
+        metadata["feature_map"] = feature_map
+        metadata["islands"] = island_lists
+        metadata["archive"] = list(archive)
+        metadata["archive_fitness"] = list(archive.values())
+        return [self._program(program) for program in programs.values()], metadata
+
+    def sync(self) -> None:
+        """Force every appended record to disk"""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._last_sync = time.monotonic()
+
+    def close(self) -> None:
+        """
+        Finish any compaction and close the log, so it can be opened again
+
+        The log is released even if the compaction failed, in which case its
+        error is raised once the log is closed. Safe to call more than once.
+        """
+        if self._file.closed:
+            return
+        try:
+            if self._compactor is not None:
+                compactor, self._compactor = self._compactor, None
+                compactor.close()
+        finally:
+            self.sync()
+            self._file.close()
+            with _open_segment_logs_lock:
+                _open_segment_logs.discard(self._real_path)
+
+    def _append(self, records: List[Dict[str, Any]]) -> None:
+        """Append records, rolling over to a new segment once the current one is full"""
+        self._file.write(b"".join(self._encode(record) for record in records))
+        self._file.flush()
+
+        if time.monotonic() - self._last_sync >= self.fsync_interval:
+            self.sync()
+        if self._file.tell() >= self.segment_size:
+            self._seal()
+
+    def _seal(self) -> int:
+        """Close the active segment and start a new one, returning the sealed segment"""
+        self.sync()
+        self._file.close()
+        sealed = self._active
+        self._active += 1
+        self._file = open(self._segment_path(self._active), "ab")
+        return sealed
+
+    def _count_state(self, changes: Dict[str, Any]) -> None:
+        """Count the entries of a state record and the live entries it supersedes"""
+        for section in ("feature_map", "archive"):
+            for key, value in changes.get(section, {}).items():
+                key = f"{section}:{key}"
+                self._record_count += 1
+                self._garbage += key in self._live_keys
+                if value is None:
+                    # A removal is superseded as soon as it is applied
+                    self._garbage += 1
+                    self._live_keys.discard(key)
+                else:
+                    self._live_keys.add(key)
+
+        for key in STATE_KEYS:
+            if key in changes:
+                self._record_count += 1
+                self._garbage += key in self._live_keys
+                self._live_keys.add(key)
+
+    def _reset_counts(self, programs: List[Dict[str, Any]], changes: Dict[str, Any]) -> None:
+        """Count the entries of a snapshot, which supersedes everything before it"""
+        self._record_count = len(programs)
+        self._garbage = 0
+        self._live_keys = set()
+        self._count_state(changes)
+
+    def _compact(
+        self,
+        sealed: int,
+        programs: List[Dict[str, Any]],
+        metadata: Dict[str, Any],
+        changes: Dict[str, Any],
+    ) -> None:
+        try:
+            self._write_compacted(sealed, programs, metadata, changes)
+        finally:
+            self._compacting.clear()
+
+    def _write_compacted(
+        self,
+        sealed: int,
+        programs: List[Dict[str, Any]],
+        metadata: Dict[str, Any],
+        changes: Dict[str, Any],
+    ) -> None:
+        """
+        Replace the segments up to a sealed one with a snapshot
+
+        The snapshot starts with a reset record and takes the place of the
+        sealed segment before older segments are deleted, so the log replays
+        correctly whenever this is interrupted.
+        """
+        islands = {
+            program_id: island_idx
+            for island_idx, island in enumerate(metadata.get("islands", []))
+            for program_id in island
+        }
+        records = [{"op": "reset"}]
+        records.extend(
+            {"op": "add", "program": program, "island": islands.get(program["id"])}
+            for program in programs
+        )
+        records.append({"op": "state", "changes": changes})
+
+        tmp_path = self._segment_path(sealed) + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(b"".join(self._encode(record) for record in records))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._segment_path(sealed))
+
+        for segment in self._segments():
+            if segment < sealed:
+                os.remove(self._segment_path(segment))
+
+        logger.debug(f"Compacted segment log {self.path} to {len(programs)} programs")
+
+    def _recover(self, segment_path: str) -> None:
+        """Truncate a torn record at the end of a segment"""
+        valid = 0
+        for valid in self._records(segment_path, positions=True):
+            pass
+        if valid < os.path.getsize(segment_path):
+            logger.warning(f"Truncating torn record at the end of {segment_path}")
+            with open(segment_path, "r+b") as f:
+                f.truncate(valid)
+
+    def _records(self, segment_path: str, positions: bool = False) -> Iterator[Any]:
+        """Iterate over the valid records of a segment, or the offsets after each"""
+        with open(segment_path, "rb") as f:
+            data = f.read()
+
+        offset = 0
+        while offset + self._HEADER.size <= len(data):
+            length, checksum = self._HEADER.unpack_from(data, offset)
+            start = offset + self._HEADER.size
+            payload = data[start : start + length]
+            if len(payload) < length or zlib.crc32(payload) != checksum:
+                if start + length < len(data):
+                    logger.warning(f"Skipping the rest of {segment_path} after a corrupt record")
+                return
+            offset = start + length
+            yield offset if positions else json.loads(payload)
+
+    def _segments(self) -> List[int]:
+        return sorted(
+            int(name[: -len(".seg")]) for name in os.listdir(self.path) if name.endswith(".seg")
+        )
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.path, f"{segment:08d}.seg")
+
+    def _encode(self, record: Dict[str, Any]) -> bytes:
+        payload = json.dumps(record, separators=(",", ":")).encode("utf-8")
+        return self._HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+    @staticmethod
+    def _program(record: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: value for key, value in record.items() if key != "fitness"}
+
+
+ProgramStore = Union[SQLiteProgramStore, SegmentLogStore]
@@ -0,0 +1,168 @@
+"""
+Per-phase iteration timing telemetry for xEvolve
+"""
+
+import json
+import logging
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PERCENTILES = (50, 90, 99)
+
+
+class Telemetry:
+    """
+    Collects how long each phase of an iteration takes
+
+    Phase timings are accumulated per iteration while it runs and written as
+    one JSON line when the iteration finishes. The most recent ``window``
+    timings of every phase are kept so that rolling percentiles can be
+    reported, which shows whether a run is bound by the LLM, the evaluator or
+    the database.
+
+    Records written to the stream look like::
+
+        {"type": "iteration", "iteration": 12, "timestamp": ..., "elapsed": 8.1,
+         "children": 1, "phases": {"sample": 0.001, "llm": 6.2, ...}}
+        {"type": "summary", "iteration": 50, "timestamp": ..., "window": 1000,
+         "phases": {"llm": {"count": 50, "mean": 6.0, "p50": 5.8, "p90": 9.1, "p99": 12.0}}}
+    """
+
+    def __init__(self, path: Optional[str] = None, window: int = 1000):
+        self.path = path
+        self.window = window
+
+        self._pending: Dict[int, Dict[str, float]] = defaultdict(dict)
+        self._history: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=self.window))
+
+    def add(self, iteration: int, phase: str, seconds: float) -> None:
+        """
+        Add time spent in a phase of an iteration
+
+        Time added to the same phase more than once is summed.
+
+        Args:
+            iteration: Iteration number (zero-based)
+            phase: Phase name
+            seconds: Time spent in the phase
+        """
+        phases = self._pending[iteration]
+        phases[phase] = phases.get(phase, 0.0) + seconds
+
+    @contextmanager
+    def phase(self, iteration: int, phase: str) -> Iterator[None]:
+        """
+        Time a block of code as a phase of an iteration
+
+        Args:
+            iteration: Iteration number (zero-based)
+            phase: Phase name
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(iteration, phase, time.perf_counter() - start)
+
+    def finish(self, iteration: int, elapsed: float, **fields: Any) -> Dict[str, Any]:
+        """
+        Write the record of a finished iteration
+
+        Args:
+            iteration: Iteration number (zero-based)
+            elapsed: Total wall-clock time of the iteration
+            **fields: Extra fields to include in the record
+
+        Returns:
+            The record that was written
+        """
+        phases = self._pending.pop(iteration, {})
+        for phase, seconds in phases.items():
+            self._history[phase].append(seconds)
+        self._history["total"].append(elapsed)
+
+        record = {
+            "type": "iteration",
+            "iteration": iteration + 1,
+            "timestamp": time.time(),
+            "elapsed": elapsed,
+            **fields,
+            "phases": phases,
+        }
+        self._write(record)
+        return record
+
+    def discard(self, iteration: int) -> None:
+        """Drop the timings of an iteration that did not finish"""
+        self._pending.pop(iteration, None)
+
+    def percentiles(self) -> Dict[str, Dict[str, float]]:
+        """
+        Compute rolling statistics of every phase over the recent window
+
+        Returns:
+            Dictionary of phase name to its count, mean and percentiles
+        """
+        stats = {}
+        for phase, values in self._history.items():
+            if not values:
+                continue
+            samples = np.fromiter(values, dtype=float)
+            stats[phase] = {"count": len(samples), "mean": float(samples.mean())}
+            for p, value in zip(PERCENTILES, np.percentile(samples, PERCENTILES)):
+                stats[phase][f"p{p}"] = float(value)
+        return stats
+
+    def report(self, iteration: int) -> Dict[str, Dict[str, float]]:
+        """
+        Log and write the rolling percentiles, e.g. when a checkpoint is saved
+
+        Args:
+            iteration: Current iteration number
+
+        Returns:
+            The statistics that were reported
+        """
+        stats = self.percentiles()
+        if not stats:
+            return stats
+
+        self._write(
+            {
+                "type": "summary",
+                "iteration": iteration,
+                "timestamp": time.time(),
+                "window": self.window,
+                "phases": stats,
+            }
+        )
+
+        # Slowest phases first
+        ordered = sorted(
+            ((phase, s) for phase, s in stats.items() if phase != "total"),
+            key=lambda item: item[1]["mean"],
+            reverse=True,
+        )
+        logger.info(
+            f"Phase timings at iteration {iteration} (p50/p90/p99 seconds): "
+            + ", ".join(
+                f"{phase}={s['p50']:.3f}/{s['p90']:.3f}/{s['p99']:.3f}" for phase, s in ordered
+            )
+        )
+        return stats
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        """Append a record to the JSONL stream"""
+        if self.path is None:
+            return
+        try:
+            with open(self.path, "a") as f:
+                f.write(json.dumps(record) + "\n")
+        except OSError as e:
+            logger.warning(f"Failed to write telemetry record: {str(e)}")
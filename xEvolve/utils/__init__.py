@@ -3,6 +3,10 @@ Utilities module initialization
 """
 
 from xEvolve.utils.async_utils import (
+    AdaptiveConcurrencyLimiter,
+    BackgroundWriter,
+    PriorityTaskPool,
+    TaskDropped,
     TaskPool,
     gather_with_concurrency,
     retry_async,
@@ -19,6 +23,10 @@ from xEvolve.utils.code_utils import (
 )
 
 __all__ = [
+    "AdaptiveConcurrencyLimiter",
+    "BackgroundWriter",
+    "PriorityTaskPool",
+    "TaskDropped",
     "TaskPool",
     "gather_with_concurrency",
     "retry_async",
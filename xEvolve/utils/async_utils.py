@@ -3,10 +3,16 @@ Async utilities for OpenEvolve
 """
 
 import asyncio
+import contextlib
+import contextvars
 import functools
+import heapq
+import itertools
 import logging
+import queue
+import threading
 import time
-from typing import Any, Callable, Dict, List, Optional, TypeVar, Union
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, TypeVar, Union
 
 logger = logging.getLogger(__name__)
 
@@ -27,7 +33,9 @@ def run_in_executor(f: Callable) -> Callable:
     @functools.wraps(f)
     async def wrapper(*args: Any, **kwargs: Any) -> Any:
         loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(None, functools.partial(f, *args, **kwargs))
+        # Keep context variables, such as the run a log record belongs to, in the executor
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(None, functools.partial(context.run, f, *args, **kwargs))
 
     return wrapper
 
@@ -163,3 +171,294 @@ class TaskPool:
 
         if self.tasks:
             await asyncio.gather(*self.tasks, return_exceptions=True)
+
+
+class TaskDropped(Exception):
+    """Raised in a task whose pending run was dropped from a PriorityTaskPool"""
+
+
+class PriorityTaskPool(TaskPool):
+    """
+    A task pool that gives free slots to the highest-priority waiting task
+
+    Tasks with equal priority run in submission order, so a pool used only
+    through ``run`` behaves like a plain TaskPool.
+    """
+
+    def __init__(self, max_concurrency: int = 10):
+        super().__init__(max_concurrency)
+        self.max_concurrency = max_concurrency
+        self.active = 0
+        self._waiters: List[List[Any]] = []  # heap of [-priority, sequence, future]
+        self._sequence = itertools.count()
+
+    @property
+    def pending(self) -> int:
+        """Number of tasks waiting for a slot"""
+        return sum(1 for _, _, future in self._waiters if not future.done())
+
+    async def run(self, coro: Callable, *args: Any, **kwargs: Any) -> Any:
+        """
+        Run a coroutine in the pool with the default priority
+
+        Args:
+            coro: Coroutine function to run
+            *args: Arguments to pass to the coroutine
+            **kwargs: Keyword arguments to pass to the coroutine
+
+        Returns:
+            Result of the coroutine
+        """
+        return await self.run_with_priority(0.0, coro, *args, **kwargs)
+
+    async def run_with_priority(
+        self, priority: float, coro: Callable, *args: Any, **kwargs: Any
+    ) -> Any:
+        """
+        Run a coroutine in the pool once no higher-priority task is waiting
+
+        Args:
+            priority: Priority of the task (higher runs first)
+            coro: Coroutine function to run
+            *args: Arguments to pass to the coroutine
+            **kwargs: Keyword arguments to pass to the coroutine
+
+        Returns:
+            Result of the coroutine
+
+        Raises:
+            TaskDropped: If the task was dropped while waiting for a slot
+        """
+        await self._acquire(priority)
+        try:
+            return await coro(*args, **kwargs)
+        finally:
+            self._release()
+
+    def drop_pending(self, keep: int = 0) -> int:
+        """
+        Drop waiting tasks, keeping only the highest-priority ones
+
+        Dropped tasks raise TaskDropped; running tasks are not affected.
+
+        Args:
+            keep: Number of waiting tasks to keep
+
+        Returns:
+            Number of tasks dropped
+        """
+        waiters = sorted(entry for entry in self._waiters if not entry[2].done())
+        for _, _, future in waiters[keep:]:
+            future.set_exception(TaskDropped())
+
+        self._waiters = waiters[:keep]
+        heapq.heapify(self._waiters)
+        return len(waiters[keep:])
+
+    async def _acquire(self, priority: float) -> None:
+        if self.active < self.max_concurrency and not self._waiters:
+            self.active += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, [-priority, next(self._sequence), future])
+        try:
+            # The releasing task hands its slot over by resolving the future
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled() and future.exception() is None:
+                # The slot was handed over just before the cancellation, pass it on
+                self._release()
+            raise
+
+    def _release(self) -> None:
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Limits concurrent requests with a window adapted by AIMD
+
+    The window grows additively, by about one slot per window's worth of
+    successful requests, as long as request latency stays close to its running
+    average. It is cut multiplicatively when a request reports overload, such
+    as a rate-limit error or a timeout. Cuts are spaced at least one average
+    latency apart, so a burst of failures from the same window cuts it once.
+    """
+
+    def __init__(
+        self,
+        initial: int = 4,
+        minimum: int = 1,
+        maximum: int = 32,
+        increase: float = 1.0,
+        decrease: float = 0.5,
+        latency_tolerance: float = 2.0,
+    ):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.window = float(min(max(initial, self.minimum), self.maximum))
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_tolerance = latency_tolerance
+
+        self.in_flight = 0
+        self.average_latency: Optional[float] = None
+        self._last_decrease = 0.0
+        self._condition: Optional[asyncio.Condition] = None
+
+    @property
+    def limit(self) -> int:
+        """Number of requests currently allowed in flight"""
+        return max(self.minimum, int(self.window))
+
+    async def acquire(self) -> None:
+        """Wait for a free slot in the window"""
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+
+    async def release(self, latency: Optional[float] = None, overloaded: bool = False) -> None:
+        """
+        Free a slot and adapt the window to the outcome of the request
+
+        Args:
+            latency: Duration of a successful request, or None if it failed
+            overloaded: Whether the request failed because the provider is overloaded
+        """
+        if overloaded:
+            self._on_overload()
+        elif latency is not None:
+            self._on_success(latency)
+
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    @contextlib.asynccontextmanager
+    async def slot(self) -> AsyncIterator["_LimiterSlot"]:
+        """
+        Hold a slot for the duration of a request
+
+        The request reports its outcome on the yielded slot; without a report
+        the slot is released without adapting the window.
+        """
+        await self.acquire()
+        slot = _LimiterSlot()
+        try:
+            yield slot
+        finally:
+            await self.release(slot.latency, slot.overloaded)
+
+    def _on_success(self, latency: float) -> None:
+        stable = (
+            self.average_latency is None or latency <= self.average_latency * self.latency_tolerance
+        )
+        if self.average_latency is None:
+            self.average_latency = latency
+        else:
+            self.average_latency = 0.8 * self.average_latency + 0.2 * latency
+
+        if stable and self.window < self.maximum:
+            self.window = min(self.maximum, self.window + self.increase / self.window)
+
+    def _on_overload(self) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease < (self.average_latency or 0.0):
+            return
+
+        self._last_decrease = now
+        previous = self.window
+        self.window = max(float(self.minimum), self.window * self.decrease)
+        logger.info(f"Reduced concurrency window from {previous:.1f} to {self.window:.1f}")
+
+
+class _LimiterSlot:
+    """Outcome of a request holding an AdaptiveConcurrencyLimiter slot"""
+
+    def __init__(self):
+        self.latency: Optional[float] = None
+        self.overloaded = False
+
+    def succeeded(self, latency: float) -> None:
+        self.latency = latency
+
+    def overload(self) -> None:
+        self.overloaded = True
+
+
+class BackgroundWriter:
+    """
+    Runs blocking write jobs one at a time on a background thread
+
+    Jobs are executed in submission order, so later writes never overtake
+    earlier ones. A failed job does not stop the jobs after it, but its
+    exception is raised by the next flush or close. Each job runs in a copy
+    of the context it was submitted from, so context variables such as the
+    run of log records carry over to the writer thread.
+    """
+
+    def __init__(self, name: str = "background-writer"):
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, fn: Callable, *args: Any, **kwargs: Any) -> None:
+        """
+        Queue a function to run on the writer thread
+
+        Args:
+            fn: Function to run
+            *args: Arguments to pass to the function
+            **kwargs: Keyword arguments to pass to the function
+        """
+        self._queue.put((contextvars.copy_context(), fn, args, kwargs))
+
+    def flush(self) -> None:
+        """
+        Block until all submitted jobs have finished
+
+        Raises:
+            Exception: The first error raised by a job since the last flush or close
+        """
+        self._queue.join()
+        self._raise_error()
+
+    def close(self) -> None:
+        """
+        Finish all submitted jobs and stop the writer thread
+
+        Raises:
+            Exception: The first error raised by a job since the last flush
+        """
+        self._queue.put(None)
+        self._thread.join()
+        self._raise_error()
+
+    def _raise_error(self) -> None:
+        error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    def _run(self) -> None:
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                context, fn, args, kwargs = job
+                context.run(fn, *args, **kwargs)
+            except Exception as e:
+                logger.error(f"Error in background write: {str(e)}")
+                if self._error is None:
+                    self._error = e
+            finally:
+                self._queue.task_done()
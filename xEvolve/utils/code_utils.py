@@ -2,6 +2,7 @@
 Utilities for code parsing, diffing, and manipulation
 """
 
+import difflib
 import re
 from typing import Dict, List, Optional, Tuple, Union
 
@@ -179,6 +180,60 @@ def calculate_edit_distance(code1: str, code2: str) -> int:
     return dp[m][n]
 
 
+def line_delta(base_code: str, code: str) -> List[Union[List[int], str]]:
+    """
+    Encode code as a line-based delta against a base
+
+    Args:
+        base_code: Code the delta is taken against
+        code: Code to encode
+
+    Returns:
+        Delta operations: [start, end] copies base lines start to end, a string is inserted as is
+    """
+    base_lines = base_code.splitlines(keepends=True)
+    lines = code.splitlines(keepends=True)
+
+    # Edits are usually local, so only the part between common head and tail lines is matched
+    limit = min(len(base_lines), len(lines))
+    head = 0
+    while head < limit and base_lines[head] == lines[head]:
+        head += 1
+    tail = 0
+    while tail < limit - head and base_lines[-1 - tail] == lines[-1 - tail]:
+        tail += 1
+
+    delta: List[Union[List[int], str]] = [[0, head]] if head else []
+    matcher = difflib.SequenceMatcher(
+        None, base_lines[head : len(base_lines) - tail], lines[head : len(lines) - tail]
+    )
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            delta.append([head + i1, head + i2])
+        elif j2 > j1:
+            delta.append("".join(lines[head + j1 : head + j2]))
+    if tail:
+        delta.append([len(base_lines) - tail, len(base_lines)])
+    return delta
+
+
+def apply_line_delta(base_code: str, delta: List[Union[List[int], str]]) -> str:
+    """
+    Rebuild code from a delta created by line_delta
+
+    Args:
+        base_code: Code the delta was taken against
+        delta: Delta operations
+
+    Returns:
+        Rebuilt code
+    """
+    base_lines = base_code.splitlines(keepends=True)
+    return "".join(
+        op if isinstance(op, str) else "".join(base_lines[op[0] : op[1]]) for op in delta
+    )
+
+
 def extract_code_language(code: str) -> str:
     """
     Try to determine the language of a code snippet
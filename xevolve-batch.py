@@ -0,0 +1,9 @@
+#!/usr/bin/env python
+"""
+Entry point script for running many OpenEvolve problems in one process
+"""
+import sys
+from xEvolve.batch import main
+
+if __name__ == "__main__":
+    sys.exit(main())